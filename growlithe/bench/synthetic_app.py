@@ -0,0 +1,355 @@
+"""
+Module for generating synthetic serverless applications for offline benchmarks.
+
+Applications follow the layout of microbenchmarks/generate_app.py: copies of an S3
+processing Lambda function, chained by a Step Functions state machine in a SAM
+template. Instead of running CodeQL on them, the SARIF output CodeQL would report
+for their flows is generated alongside, so the whole analyze and apply pipeline can
+be run without CodeQL or a deployment.
+"""
+
+import json
+import os
+from dataclasses import dataclass
+
+BUCKET_NAME = "bench-bucket"
+FUNCTION_CODE_HEADER = """import os
+import boto3
+
+
+def lambda_handler(event, context):
+    body = event["body"]
+    s3 = boto3.resource("s3")
+    bucket = s3.Bucket("{bucket_name}")
+    object_key = os.getenv("AWS_LAMBDA_FUNCTION_NAME")
+"""
+FLOW_CODE = """    tempFile{flow} = "/tmp/" + object_key
+    bucket.download_file(object_key, tempFile{flow})
+    output_key{flow} = f"output{flow}/{{object_key}}"
+    bucket.upload_file(tempFile{flow}, output_key{flow})
+"""
+FUNCTION_CODE_FOOTER = """    response = {"statusCode": 200, "body": body}
+    return response
+"""
+FUNCTION_PROPERTIES = """    Properties:
+      CodeUri: src/
+      Environment:
+        Variables:
+          BUCKET_NAME: {bucket_name}
+      Handler: {handler}.lambda_handler
+      Policies:
+      - S3CrudPolicy:
+          BucketName: {bucket_name}
+      Runtime: python3.10
+    Type: AWS::Serverless::Function
+"""
+
+
+@dataclass(frozen=True)
+class AppShape:
+    """
+    Parameters of a synthetic application.
+
+    Attributes:
+        functions (int): Number of Lambda functions.
+        flows (int): Number of S3 to file to S3 flows in each function.
+        fanout (int): Number of functions invoked after each function.
+        depth (int): Number of levels of the chain of functions.
+    """
+
+    functions: int
+    flows: int
+    fanout: int
+    depth: int
+
+    @property
+    def name(self) -> str:
+        return f"Bench_f{self.functions}_fl{self.flows}_fo{self.fanout}_d{self.depth}"
+
+    def get_levels(self):
+        """
+        Split the functions into levels of the chain.
+
+        Returns:
+            list: Lists of function indices, one per level.
+        """
+        depth = max(1, min(self.depth, self.functions))
+        width = -(-self.functions // depth)
+        return [
+            list(range(start, min(start + width, self.functions)))
+            for start in range(0, self.functions, width)
+        ]
+
+    def get_successors(self):
+        """
+        Get the functions each function invokes, in the next level of the chain.
+
+        Returns:
+            dict: Maps each function index to the indices of the functions it invokes.
+        """
+        levels = self.get_levels()
+        successors = {function: [] for level in levels for function in level}
+        for level, next_level in zip(levels, levels[1:]):
+            for position, function in enumerate(level):
+                for offset in range(min(self.fanout, len(next_level))):
+                    successors[function].append(
+                        next_level[(position + offset) % len(next_level)]
+                    )
+        return successors
+
+
+def get_function_name(function):
+    return f"Function{function}"
+
+
+def get_handler_name(function):
+    return f"function_{function}"
+
+
+def generate_function_code(flows):
+    """
+    Generate the code of a function and the lines of its sources and sinks.
+
+    Args:
+        flows (int): Number of S3 to file to S3 flows in the function.
+
+    Returns:
+        tuple: The code, and a dict of the line numbers of the statements of the
+        function referenced by SARIF results.
+    """
+    code = FUNCTION_CODE_HEADER.format(bucket_name=BUCKET_NAME)
+    lines = {"event": 5, "flows": []}
+    for flow in range(flows):
+        first_line = code.count("\n") + 1
+        code += FLOW_CODE.format(flow=flow)
+        lines["flows"].append((first_line + 1, first_line + 3))
+    lines["return"] = code.count("\n") + 2
+    code += FUNCTION_CODE_FOOTER
+    return code, lines
+
+
+def get_location(uri, line, text):
+    return {
+        "physicalLocation": {
+            "artifactLocation": {"uri": uri},
+            "region": {"startLine": line, "startColumn": 5, "endColumn": 30},
+        },
+        "message": {"text": text},
+    }
+
+
+def get_result(uri, flows, related_locations):
+    return {
+        "ruleId": "py/dataFlows",
+        "message": {"text": "\n".join(flows)},
+        "locations": [
+            {
+                "physicalLocation": {
+                    "artifactLocation": {"uri": uri},
+                    "region": {
+                        "startLine": related_locations[0]["physicalLocation"]["region"][
+                            "startLine"
+                        ]
+                    },
+                }
+            }
+        ],
+        "relatedLocations": related_locations,
+    }
+
+
+def generate_function_results(function, lines):
+    """
+    Generate the SARIF results CodeQL reports for the flows of a function.
+
+    Args:
+        function (int): Index of the function.
+        lines (dict): Line numbers returned by generate_function_code.
+
+    Returns:
+        list: SARIF results.
+    """
+    uri = f"src/{get_handler_name(function)}.py"
+    param = "[SOURCE, INVOCATION, PARAM:STATIC:SourceCode, STATIC:event]"
+    results = [
+        get_result(
+            uri,
+            [
+                f"{param}(1)==>[SINK, INVOCATION, RETURN:STATIC:SourceCode, STATIC:response](2)"
+            ],
+            [
+                get_location(uri, lines["event"], "SOURCE param"),
+                get_location(uri, lines["return"], "SINK return"),
+            ],
+        )
+    ]
+    for flow, (download_line, upload_line) in enumerate(lines["flows"]):
+        bucket = f"S3_BUCKET:STATIC:{BUCKET_NAME}"
+        file = f"LOCAL_FILE:STATIC:tempfs, DYNAMIC:tempFile{flow}"
+        results.append(
+            get_result(
+                uri,
+                [
+                    f"[SOURCE, GLOBAL, {bucket}, DYNAMIC:object_key](1)"
+                    f"==>[SINK, CONTAINER, {file}](2)"
+                ],
+                [
+                    get_location(uri, download_line, "SOURCE s3"),
+                    get_location(uri, download_line, "SINK file"),
+                ],
+            )
+        )
+        results.append(
+            get_result(
+                uri,
+                [
+                    f"[SOURCE, CONTAINER, {file}](1)"
+                    f"==>[SINK, GLOBAL, {bucket}, DYNAMIC:output_key{flow}](2)"
+                ],
+                [
+                    get_location(uri, upload_line, "SOURCE file"),
+                    get_location(uri, upload_line, "SINK s3"),
+                ],
+            )
+        )
+    return results
+
+
+def generate_state_machine(shape: AppShape):
+    """
+    Generate the state machine invoking the functions level by level.
+
+    Functions invoking several functions branch with a Choice state.
+
+    Args:
+        shape (AppShape): Parameters of the application.
+
+    Returns:
+        dict: State machine definition.
+    """
+    states = {}
+    for function, successors in shape.get_successors().items():
+        state_name = get_handler_name(function)
+        state = {
+            "Type": "Task",
+            "Resource": "arn:aws:states:::lambda:invoke",
+            "OutputPath": "$.Payload",
+            "Parameters": {
+                "Payload.$": "$",
+                "FunctionName": f"${{{state_name}-arn}}",
+            },
+        }
+        if len(successors) == 1:
+            state["Next"] = get_handler_name(successors[0])
+        elif successors:
+            state["Next"] = f"{state_name}-choice"
+            states[f"{state_name}-choice"] = {
+                "Type": "Choice",
+                "Choices": [
+                    {
+                        "Variable": "$.branch",
+                        "NumericEquals": branch,
+                        "Next": get_handler_name(successor),
+                    }
+                    for branch, successor in enumerate(successors[1:])
+                ],
+                "Default": get_handler_name(successors[0]),
+            }
+        else:
+            state["End"] = True
+        states[state_name] = state
+    return {
+        "Comment": "A synthetic chain of Lambda functions",
+        "StartAt": get_handler_name(0),
+        "States": states,
+    }
+
+
+def generate_sam_template(shape: AppShape):
+    """
+    Generate the SAM template of the application.
+
+    Args:
+        shape (AppShape): Parameters of the application.
+
+    Returns:
+        str: SAM template in YAML.
+    """
+    template = [
+        "AWSTemplateFormatVersion: '2010-09-09'",
+        "Description: Synthetic Growlithe benchmark app",
+        "Resources:",
+        "  BenchBucket:",
+        "    Properties:",
+        f"      BucketName: {BUCKET_NAME}",
+        "    Type: AWS::S3::Bucket",
+    ]
+    for function in range(shape.functions):
+        template.append(f"  {get_function_name(function)}:")
+        template.append(
+            FUNCTION_PROPERTIES.format(
+                bucket_name=BUCKET_NAME, handler=get_handler_name(function)
+            ).rstrip("\n")
+        )
+    template += [
+        "  StateMachine:",
+        "    Properties:",
+        "      DefinitionSubstitutions:",
+        *[
+            f"        {get_handler_name(function)}-arn: !GetAtt '{get_function_name(function)}.Arn'"
+            for function in range(shape.functions)
+        ],
+        "      DefinitionUri: state_machine.asl.json",
+        "      Policies:",
+        "      - LambdaInvokePolicy:",
+        "          FunctionName: '*'",
+        "    Type: AWS::Serverless::StateMachine",
+        "Transform: AWS::Serverless-2016-10-31",
+    ]
+    return "\n".join(template) + "\n"
+
+
+def generate_app(shape: AppShape, app_path, growlithe_path):
+    """
+    Write a synthetic application and the SARIF outputs of its CodeQL queries.
+
+    Args:
+        shape (AppShape): Parameters of the application.
+        app_path (str): Directory to write the application to.
+        growlithe_path (str): Growlithe directory of the application, where the SARIF
+            outputs are written.
+
+    Returns:
+        str: Path of the SAM template.
+    """
+    os.makedirs(os.path.join(app_path, "src"), exist_ok=True)
+    os.makedirs(growlithe_path, exist_ok=True)
+    code, lines = generate_function_code(shape.flows)
+    results = []
+    for function in range(shape.functions):
+        handler_path = os.path.join(app_path, "src", f"{get_handler_name(function)}.py")
+        with open(handler_path, "w") as f:
+            f.write(code)
+        results += generate_function_results(function, lines)
+
+    with open(os.path.join(app_path, "state_machine.asl.json"), "w") as f:
+        json.dump(generate_state_machine(shape), f, indent=2)
+    template_path = os.path.join(app_path, "template.yaml")
+    with open(template_path, "w") as f:
+        f.write(generate_sam_template(shape))
+
+    for query, query_results in [("dataflows", results), ("metadataflows", [])]:
+        with open(os.path.join(growlithe_path, f"{query}_python.sarif"), "w") as f:
+            json.dump(
+                {
+                    "version": "2.1.0",
+                    "runs": [
+                        {
+                            "tool": {"driver": {"name": "CodeQL"}},
+                            "results": query_results,
+                        }
+                    ],
+                },
+                f,
+            )
+    return template_path
@@ -5,21 +5,27 @@ This module provides functionality to analyze applications, generate Application
 and create policy templates based on the analysis results.
 """
 
-import pickle
 import click
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from growlithe.graph.parsers.sam import SAMParser
 from growlithe.graph.parsers.terraform import TerraformParser
 from growlithe.graph.parsers.state_machine_parser import StepFunctionParser
 from growlithe.graph.adg.graph import Graph
-from growlithe.graph.codeql.intra_function_analyzer import Analyzer
+from growlithe.graph.codeql.intra_function_analyzer import (
+    Analyzer,
+    split_codeql_budget,
+)
 from growlithe.graph.adg_generator import GraphGenerator
+from growlithe.graph.graph_store import dump_graph
 from growlithe.common.dev_config import (
+    ANALYZE_LANGUAGES_CONCURRENTLY,
     CREATE_CODEQL_DB,
     GENERATE_EDGE_POLICY,
     RUN_CODEQL_QUERIES,
 )
 from growlithe.common.file_utils import create_dir_if_not_exists, detect_languages
+from growlithe.common.tracer import tracer
 from growlithe.common.utils import profiler_decorator
 from growlithe.config import get_config
 
@@ -43,12 +49,7 @@ def analyze(config):
 
     # Run Static analysis
     create_dir_if_not_exists(path=config.growlithe_path)
-    analyzer = Analyzer(config)
-    for language in languages:
-        if CREATE_CODEQL_DB:
-            analyzer.create_codeql_database(language=language)
-        if RUN_CODEQL_QUERIES:
-            analyzer.run_codeql_queries(language=language)
+    run_static_analysis(config, languages)
 
     # Parse the SAM/cloud template of the application
     if config.app_config_type == "SAM":
@@ -67,15 +68,43 @@ def analyze(config):
     if GENERATE_EDGE_POLICY:
         graph.dump_policy_edges_json(config.policy_spec_path)
 
-    with open(config.graph_dump_path, "wb") as f:
-        pickle.dump(graph, f)
-    with open(config.config_dump_path, "wb") as f:
-        pickle.dump(app_config_parser, f)
+    dump_graph(graph, config.graph_dump_path, app_config_parser)
 
     click.echo("Analysis completed successfully!", color="green")
     return graph
 
 
+@profiler_decorator
+def run_static_analysis(config, languages):
+    """
+    Create the CodeQL database and run the queries for each language of the app.
+
+    The pipelines of different languages run concurrently, splitting the CodeQL
+    memory and thread budgets between them.
+
+    Args:
+        config: Configuration object containing analysis settings.
+        languages (list): Languages detected in the application.
+    """
+    concurrent = ANALYZE_LANGUAGES_CONCURRENTLY and len(languages) > 1
+    memory, threads = split_codeql_budget(len(languages) if concurrent else 1)
+    analyzer = Analyzer(config, memory=memory, threads=threads)
+
+    def analyze_language(language):
+        if CREATE_CODEQL_DB:
+            analyzer.create_codeql_database(language=language)
+        if RUN_CODEQL_QUERIES:
+            analyzer.run_codeql_queries(language=language)
+
+    if not concurrent:
+        for language in languages:
+            analyze_language(language)
+        return
+    with ThreadPoolExecutor(max_workers=len(languages)) as executor:
+        # Consume the results so exceptions of a pipeline are raised here
+        list(executor.map(analyze_language, languages))
+
+
 @profiler_decorator
 def generate_adg(app_config_parser, config):
     """
@@ -96,11 +125,15 @@ def generate_adg(app_config_parser, config):
 
     # Update graph object with required nodes/edges
     graph_generator = GraphGenerator(graph, config)
-    graph_generator.generate_intrafunction_graphs(app_config_parser.get_functions())
-    graph_generator.add_metadata_edges(app_config_parser.get_functions())
-    graph_generator.add_inter_function_edges(app_config_parser.get_resources())
-
-    graph.dump_nodes_json(config.nodes_path)
+    with tracer.span("generate_intrafunction_graphs"):
+        graph_generator.generate_intrafunction_graphs(app_config_parser.get_functions())
+    with tracer.span("add_metadata_edges"):
+        graph_generator.add_metadata_edges(app_config_parser.get_functions())
+    with tracer.span("add_inter_function_edges"):
+        graph_generator.add_inter_function_edges(app_config_parser.get_resources())
+
+    with tracer.span("dump_nodes_json", nodes=len(graph.nodes), edges=len(graph.edges)):
+        graph.dump_nodes_json(config.nodes_path)
 
     return graph
 
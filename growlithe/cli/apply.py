@@ -5,18 +5,24 @@ This module provides functionality to load previously analyzed graph data,
 apply security policies, perform taint tracking, and update the application configuration.
 """
 
-import pickle
-import sys
+import os
+from concurrent.futures import ProcessPoolExecutor
 
 from growlithe.graph.adg.graph import Graph
-from growlithe.common.file_utils import save_files
+from growlithe.common.file_utils import (
+    save_files,
+    save_function,
+    save_predicate_bundles,
+)
+from growlithe.common.logger import logger
+from growlithe.graph.graph_store import GraphStore
 from growlithe.enforcement.taint.taint_tracker import TaintTracker
 from growlithe.config import Config, get_config
 from growlithe.common.utils import profiler_decorator
 
 
 @profiler_decorator
-def apply(config: Config):
+def apply(config: Config, jobs: int = 1):
     """
     Apply security policies and perform taint tracking on the Application Dependency Graph.
 
@@ -25,8 +31,9 @@ def apply(config: Config):
 
     Args:
         config (Config): Configuration object containing application settings.
+        jobs (int, optional): Number of processes used to instrument and save
+            functions. 0 uses all available CPUs. Defaults to 1.
     """
-    sys.setrecursionlimit(3000)  # Increase the recursion limit to avoid RecursionError
     graph, app_config_parser = load_dumps(config)
     graph.get_updated_policy_json(config.policy_spec_path)
 
@@ -37,17 +44,85 @@ def apply(config: Config):
     # Enforcement
     graph.enforce_policy()
 
-    save_files(graph=graph, growlithe_lib_path=config.growlithe_lib_path)
+    # Rewrite each function once with all planned instrumentation and save it
+    instrument_and_save_functions(
+        graph, config.growlithe_lib_path, jobs, config.geoip_database_path
+    )
 
     # Update the application configuration
     app_config_parser.modify_config(graph=graph)
     app_config_parser.save_config()
 
 
+@profiler_decorator
+def instrument_and_save_functions(
+    graph: Graph, growlithe_lib_path: str, jobs: int, geoip_database_path: str = None
+):
+    """
+    Apply the planned instrumentation of each function and write its code.
+
+    Functions are independent once instrumentation is planned, so with more than
+    one job they are sharded across a process pool. Each worker receives only the
+    function's code tree and plan, not the whole graph.
+
+    Args:
+        graph (Graph): Graph with the instrumentation planned for each function.
+        growlithe_lib_path (str): Path to the predicates library copied next to functions.
+        jobs (int): Number of worker processes, 0 uses all available CPUs.
+        geoip_database_path (str, optional): Path to the IP geolocation table
+            shipped with the predicates library.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(graph.functions) <= 1:
+        graph.apply_instrumentation()
+        save_files(
+            graph=graph,
+            growlithe_lib_path=growlithe_lib_path,
+            geoip_database_path=geoip_database_path,
+        )
+        return
+
+    # Bundles cover the functions of a directory, so they are written before sharding
+    save_predicate_bundles(graph.functions, growlithe_lib_path, geoip_database_path)
+    tasks = [
+        (
+            function.name,
+            function.runtime,
+            function.code_tree,
+            getattr(function, "_instrumentation_plan", None),
+            function.growlithe_function_path,
+            growlithe_lib_path,
+        )
+        for function in graph.functions
+    ]
+    jobs = min(jobs, len(tasks))
+    logger.info("Instrumenting %d functions with %d processes", len(tasks), jobs)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        # Larger chunks amortize pickling overhead for applications with many functions
+        chunksize = max(1, len(tasks) // (jobs * 4))
+        # Consume results so exceptions from workers are raised here
+        list(executor.map(instrument_and_save_function, tasks, chunksize=chunksize))
+
+
+def instrument_and_save_function(task):
+    """
+    Worker for instrument_and_save_functions, applies one function's plan and saves it.
+
+    Args:
+        task (tuple): (name, runtime, code_tree, plan, growlithe_function_path,
+            growlithe_lib_path). The code tree and plan are pickled together so the
+            plan still references statements of the received tree.
+    """
+    name, runtime, code_tree, plan, growlithe_function_path, growlithe_lib_path = task
+    if plan is not None:
+        plan.apply()
+    save_function(name, runtime, code_tree, growlithe_function_path, growlithe_lib_path)
+
+
 @profiler_decorator
 def load_dumps(config: Config):
     """
-    Load previously dumped graph and application configuration data.
+    Load the graph stored by analyze and rebuild the application configuration parser.
 
     Args:
         config (Config): Configuration object containing file paths.
@@ -55,13 +130,10 @@ def load_dumps(config: Config):
     Returns:
         tuple: A tuple containing the loaded Graph object and application configuration parser.
     """
-    with open(config.graph_dump_path, "rb") as f:
-        graph: Graph = pickle.load(f)
-
-    # TODO: config values use the config which was used when analyze was run,
-    # Updates to config before running apply is not taken, fix this
-    with open(config.config_dump_path, "rb") as f:
-        app_config_parser = pickle.load(f)
+    store = GraphStore(config.graph_dump_path)
+    graph: Graph = store.load_graph()
+    # The parser re-reads the application template with the current config
+    app_config_parser = store.load_app_config_parser(config)
 
     return graph, app_config_parser
 
@@ -0,0 +1,264 @@
+"""
+Module for benchmarking the scalability of Growlithe offline.
+
+This module generates synthetic applications of different shapes, runs the analyze
+and apply pipelines on them from synthetic SARIF, without CodeQL or a deployment,
+and times each phase. Results are saved as JSON so runs on different commits can be
+compared.
+"""
+
+import click
+import itertools
+import json
+import logging
+import os
+import platform
+import subprocess
+import tempfile
+import time
+
+from growlithe.bench.synthetic_app import AppShape, generate_app
+from growlithe.cli.analyze import generate_adg
+from growlithe.common.file_utils import save_files
+from growlithe.common.logger import logger
+from growlithe.common.tracer import tracer
+from growlithe.config import Config
+from growlithe.enforcement.taint.taint_tracker import TaintTracker
+from growlithe.graph.graph_store import dump_graph
+from growlithe.graph.parsers.sam import SAMParser
+
+# Policies set on the edges of the synthetic applications, so that policy parsing
+# and compilation have predicates to work on
+READ_POLICY = "eq(InstRegion, 'us-west-2') or isPrefix(SessionEndRegion, 'C')"
+WRITE_POLICY = "eq(ResourceRegion, 'us-west-1') & lt(InstTime, 99999999999)"
+
+# Benchmarked phases, and the spans timing them
+PHASES = {
+    "parse_template": "parse_template",
+    "sarif_parsing": "generate_intrafunction_graphs",
+    "adg_build": "add_inter_function_edges",
+    "dump_graph": "dump_graph",
+    "policy_parsing": "policy_parsing",
+    "taint_tracking": "taint_tracking",
+    "ancestors": "populate_ancestors",
+    "policy_compilation": "generate_assertions",
+    "instrumentation": "instrumentation",
+    "save": "save",
+}
+
+
+def bench(config: Config, shapes, repeat=1, output_path=None, baseline_path=None):
+    """
+    Benchmark the analyze and apply pipelines on synthetic applications.
+
+    Args:
+        config (Config): Configuration object, pointed to each synthetic application
+            in turn and restored afterwards.
+        shapes (list): AppShape of each application to benchmark.
+        repeat (int, optional): Number of runs per application, the fastest time of
+            each phase is kept.
+        output_path (str, optional): Path to save the JSON results to.
+        baseline_path (str, optional): Path of previous JSON results to compare to.
+
+    Returns:
+        dict: The benchmark results.
+    """
+    saved_config = dict(config.__dict__)
+    tracer_enabled = tracer.enabled
+    console_level = logger.level
+    # Per statement debug logs would dominate the measured times
+    logger.setLevel(logging.WARNING)
+    tracer.enabled = True
+    try:
+        scenarios = []
+        for shape in shapes:
+            runs = [run_scenario(config, shape) for _ in range(repeat)]
+            scenario = runs[0]
+            scenario["phases"] = {
+                phase: min(run["phases"][phase] for run in runs) for phase in PHASES
+            }
+            scenario["total"] = sum(scenario["phases"].values())
+            scenarios.append(scenario)
+    finally:
+        tracer.enabled = tracer_enabled
+        tracer.reset()
+        logger.setLevel(console_level)
+        config.__dict__.clear()
+        config.__dict__.update(saved_config)
+
+    results = {
+        "commit": get_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "repeat": repeat,
+        "scenarios": scenarios,
+    }
+    baseline = None
+    if baseline_path:
+        with open(baseline_path, "r") as f:
+            baseline = json.load(f)
+    click.echo(format_results(results, baseline))
+    if output_path:
+        with open(output_path, "w") as f:
+            json.dump(results, f, indent=2)
+        logger.warning(f"Saved benchmark results to {output_path}")
+    return results
+
+
+def get_shapes(functions, flows, fanouts, depths):
+    """
+    Get the shapes of all combinations of the given parameters.
+
+    Returns:
+        list: AppShape for each combination.
+    """
+    return [
+        AppShape(functions=n, flows=f, fanout=o, depth=d)
+        for n, f, o, d in itertools.product(functions, flows, fanouts, depths)
+    ]
+
+
+def run_scenario(config: Config, shape: AppShape):
+    """
+    Generate an application and time each phase of analyzing and applying it.
+
+    Args:
+        config (Config): Configuration object to point to the application.
+        shape (AppShape): Parameters of the application.
+
+    Returns:
+        dict: Parameters of the application, size of its graph and time in seconds
+        of each phase.
+    """
+    tracer.reset()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        app_path = os.path.join(tmp_dir, shape.name)
+        configure_app(config, shape.name, app_path)
+        generate_app(shape, config.app_path, config.growlithe_path)
+
+        # Analyze
+        with tracer.span("parse_template"):
+            app_config_parser = SAMParser(config.app_config_path, config)
+        graph = generate_adg(app_config_parser, config)
+        graph.dump_policy_edges_json(config.policy_spec_path)
+        dump_graph(graph, config.graph_dump_path, app_config_parser)
+        set_policies(config.policy_spec_path)
+
+        # Apply
+        with tracer.span("policy_parsing"):
+            graph.get_updated_policy_json(config.policy_spec_path)
+        with tracer.span("taint_tracking"):
+            TaintTracker(graph=graph, config=config).run_taint_tracking()
+        graph.enforce_policy()
+        with tracer.span("instrumentation"):
+            graph.apply_instrumentation()
+        with tracer.span("save"):
+            save_files(graph=graph, growlithe_lib_path=config.growlithe_lib_path)
+            app_config_parser.modify_config(graph=graph)
+            app_config_parser.save_config()
+
+    durations = {}
+    for event in tracer.events:
+        durations[event["name"]] = durations.get(event["name"], 0) + event["dur"] / 1e6
+    return {
+        "shape": {
+            "functions": shape.functions,
+            "flows": shape.flows,
+            "fanout": shape.fanout,
+            "depth": shape.depth,
+        },
+        "nodes": len(graph.nodes),
+        "edges": len(graph.edges),
+        "phases": {phase: durations.get(span, 0.0) for phase, span in PHASES.items()},
+    }
+
+
+def configure_app(config: Config, app_name, app_path):
+    """
+    Point the configuration to a synthetic application.
+
+    Args:
+        config (Config): Configuration object to update.
+        app_name (str): Name of the application.
+        app_path (str): Directory of the application.
+    """
+    config.app_name = app_name
+    config.src_dir = "src"
+    config.app_config_type = "SAM"
+    config.app_config_path = os.path.join(app_path, "template.yaml")
+    # Avoid the special cases of the evaluation benchmarks
+    config.benchmark_name = app_name
+    config.set_derived_paths()
+
+
+def set_policies(policy_spec_path):
+    """
+    Set the same read and write policies on every edge of a policy specification.
+
+    Args:
+        policy_spec_path (str): Path of the policy specification to update.
+    """
+    with open(policy_spec_path, "r") as f:
+        policy_edges = json.load(f)
+    for policy_edge in policy_edges:
+        policy_edge["read"] = READ_POLICY
+        policy_edge["write"] = WRITE_POLICY
+    with open(policy_spec_path, "w") as f:
+        json.dump(policy_edges, f)
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except OSError:
+        return ""
+
+
+def format_results(results, baseline=None):
+    """
+    Format benchmark results as a table, with ratios to a baseline if given.
+
+    Args:
+        results (dict): Results returned by bench.
+        baseline (dict, optional): Previous results, matched by application shape.
+
+    Returns:
+        str: The table.
+    """
+    baseline_scenarios = {}
+    if baseline:
+        baseline_scenarios = {
+            json.dumps(scenario["shape"], sort_keys=True): scenario
+            for scenario in baseline["scenarios"]
+        }
+    lines = []
+    for scenario in results["scenarios"]:
+        shape = scenario["shape"]
+        lines.append(
+            f"functions={shape['functions']} flows={shape['flows']} "
+            f"fanout={shape['fanout']} depth={shape['depth']}: "
+            f"{scenario['nodes']} nodes, {scenario['edges']} edges"
+        )
+        previous = baseline_scenarios.get(json.dumps(shape, sort_keys=True))
+        for phase, seconds in [
+            *scenario["phases"].items(),
+            ("total", scenario["total"]),
+        ]:
+            line = f"  {phase:<20} {seconds:>10.4f}s"
+            if previous:
+                previous_seconds = (
+                    previous["total"]
+                    if phase == "total"
+                    else previous["phases"].get(phase)
+                )
+                if previous_seconds:
+                    line += f" {seconds / previous_seconds:>8.2f}x"
+            lines.append(line)
+    if baseline:
+        lines.append(f"Ratios are relative to commit {baseline.get('commit')}")
+    return "\n".join(lines)
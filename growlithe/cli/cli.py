@@ -11,6 +11,8 @@ from growlithe.cli.build import build as build_command
 from growlithe.cli.deploy import deploy as deploy_command
 from growlithe.cli.analyze import analyze as analyze_command
 from growlithe.cli.apply import apply as apply_command
+from growlithe.cli.bench import bench as bench_command, get_shapes
+from growlithe.common.tracer import tracer
 from growlithe.config import get_config
 
 
@@ -81,11 +83,19 @@ def analyze(config):
         f"Analyzing the application {config.app_name} with Growlithe path {config.growlithe_path}."
     )
     analyze_command(config)
+    tracer.export_chrome_trace(config.analyze_trace_path)
 
 
 @cli.command()
+@click.option(
+    "--jobs",
+    "-j",
+    default=1,
+    type=click.IntRange(min=0),
+    help="Number of processes used to instrument functions (0 uses all CPUs)",
+)
 @click.pass_obj
-def apply(config):
+def apply(config, jobs):
     """
     Apply Growlithe policies to the application.
 
@@ -93,9 +103,79 @@ def apply(config):
 
     Args:
         config: The configuration object passed from the parent command.
+        jobs (int): Number of processes used to instrument and save functions.
     """
     click.echo("Applying Growlithe policies...")
-    apply_command(config)
+    apply_command(config, jobs=jobs)
+    tracer.export_chrome_trace(config.apply_trace_path)
+
+
+@cli.command()
+@click.option(
+    "--functions",
+    multiple=True,
+    default=[10, 50, 100],
+    type=click.IntRange(min=1),
+    help="Number of functions of the synthetic applications",
+)
+@click.option(
+    "--flows",
+    multiple=True,
+    default=[5],
+    type=click.IntRange(min=0),
+    help="Number of S3 to file to S3 flows in each function",
+)
+@click.option(
+    "--fanout",
+    multiple=True,
+    default=[2],
+    type=click.IntRange(min=1),
+    help="Number of functions invoked after each function",
+)
+@click.option(
+    "--depth",
+    multiple=True,
+    default=[5],
+    type=click.IntRange(min=1),
+    help="Number of levels of the chain of functions",
+)
+@click.option(
+    "--repeat",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Number of runs per application, the fastest is kept",
+)
+@click.option(
+    "--output", default="growlithe_bench.json", help="Path to save the results to"
+)
+@click.option("--baseline", help="Path of previous results to compare to")
+@click.pass_obj
+def bench(config, functions, flows, fanout, depth, repeat, output, baseline):
+    """
+    Benchmark analyze and apply on synthetic applications, without CodeQL.
+
+    This command generates applications for every combination of the given
+    parameters, times each phase of Growlithe on them and saves the results.
+
+    Args:
+        config: The configuration object passed from the parent command.
+        functions (tuple): Numbers of functions to benchmark.
+        flows (tuple): Numbers of flows per function to benchmark.
+        fanout (tuple): Fanouts of the chain of functions to benchmark.
+        depth (tuple): Depths of the chain of functions to benchmark.
+        repeat (int): Number of runs per application.
+        output (str): Path to save the results to.
+        baseline (str): Path of previous results to compare to.
+    """
+    shapes = get_shapes(functions, flows, fanout, depth)
+    click.echo(f"Benchmarking {len(shapes)} synthetic applications...")
+    bench_command(
+        config,
+        shapes,
+        repeat=repeat,
+        output_path=output,
+        baseline_path=baseline,
+    )
 
 
 if __name__ == "__main__":
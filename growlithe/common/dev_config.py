@@ -17,12 +17,34 @@ RUN_CODEQL_QUERIES = True
 # Flag to control generation of edge policies
 GENERATE_EDGE_POLICY = True
 
-# Flag to enable profiling of Growlithe runs
+# Flag to enable profiling of Growlithe runs, saving a trace of each run to growlithe_path
 PROFILE_GROWLITHE_RUNS = True
 
+# Flag to record the peak memory of each profiled span with tracemalloc (slow)
+TRACE_MEMORY = False
+
+# Flag to log the most expensive CodeQL predicates of each query to the profiler log,
+# from the evaluator log of codeql database analyze
+PROFILE_CODEQL_EVALUATION = True
+
+# Number of CodeQL predicates logged per query
+PROFILE_CODEQL_TOP_PREDICATES = 10
+
 # Flag to enable hybrid enforcement mode
 HYBRID_ENFORCEMENT_MODE = True
 
+# Flag to compile runtime policy checks to Python instead of asking pyDatalog, which is
+# only kept for predicates that need unification
+COMPILE_POLICIES = True
+
+# Flag to ship each function only the runtime library definitions its instrumented code
+# uses, and the pyDatalog layer only to functions asking pyDatalog
+MINIMIZE_RUNTIME_LIBRARY = True
+
+# Flag to resolve, at function init, the runtime resource properties of statically
+# known resources checked by its policies, so the first invocation finds them cached
+PREWARM_RESOURCE_PROPS = False
+
 # Logging level for console output
 CONSOLE_LOG_LEVEL = "DEBUG"
 
@@ -32,6 +54,36 @@ FILE_LOG_LEVEL = "INFO"
 # List of CodeQL queries to be executed
 codeql_queries = ["dataflows", "metadataflows"]
 
+# Flag to create databases and run queries for each language of an app concurrently
+ANALYZE_LANGUAGES_CONCURRENTLY = True
+
+# Memory (MB) and threads (0 for all CPUs) shared by the concurrent CodeQL processes
+CODEQL_MEMORY_BUDGET = 4096
+CODEQL_THREAD_BUDGET = 0
+
+# Maximum number of functions analyzed by one CodeQL evaluation, 0 disables sharding
+CODEQL_SHARD_SIZE = 0
+
+# Number of shards evaluated in parallel, 0 for one per CPU
+CODEQL_PARALLEL_SHARDS = 4
+
+# Flag to evaluate all CodeQL queries in one run, sharing their common predicates
+COMBINE_CODEQL_QUERIES = True
+
+# Backend evaluating CodeQL queries: "cli" starts codeql database analyze for every
+# run, "query-server" keeps a codeql query server running for the whole process
+CODEQL_BACKEND = "cli"
+
+# Flag to reuse SARIF outputs when the CodeQL database, queries and functions are unchanged
+CACHE_CODEQL_RESULTS = True
+
+# Maximum number of SARIF outputs kept in the result cache, besides those used by the
+# current run
+CODEQL_RESULT_CACHE_SIZE = 16
+
+# Flag to keep CodeQL's own evaluation cache in the database across runs
+KEEP_CODEQL_DISK_CACHE = False
+
 # Default policy config to generate
 # TODO: Set to allow for ease of testing, can be set to default deny
 DEFAULT_POLICY = "allow"
@@ -1,11 +1,16 @@
 import os
 import ast
+import hashlib
 import json
 import shutil
 import subprocess
+import tempfile
 
+from growlithe.common.dev_config import MINIMIZE_RUNTIME_LIBRARY
 from growlithe.common.logger import logger
+from growlithe.common.tracer import tracer
 from growlithe.common.utils import profiler_decorator
+from growlithe.enforcement.policy.geoip_table import compile_cidr_table
 
 
 def create_dir_if_not_exists(path):
@@ -57,6 +62,27 @@ def get_language_files(root, language, src_dir, growlithe_path):
     return result
 
 
+def hash_files(root, relative_paths):
+    """
+    Computes the SHA-256 content hash of each file.
+
+    Parameters:
+        root (str): The directory the paths are relative to.
+        relative_paths (list): Paths of the files, as returned by get_language_files.
+
+    Returns:
+        dict: Mapping of each relative path to the hex digest of its content, sorted by path.
+    """
+    hashes = {}
+    for relative_path in sorted(relative_paths):
+        digest = hashlib.sha256()
+        with open(os.path.join(root, relative_path), "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        hashes[relative_path] = digest.hexdigest()
+    return hashes
+
+
 # Define a mapping of file extensions to programming languages
 EXTENSION_LANGUAGE_MAP = {
     ".py": "python",
@@ -110,53 +136,132 @@ def get_file_extension(runtime):
 
 
 @profiler_decorator
-def save_files(graph, growlithe_lib_path):
+def save_files(graph, growlithe_lib_path, geoip_database_path=None):
     """
     Save the files associated with each function in the graph.
 
     Parameters:
     - graph: The graph containing the functions.
+    - growlithe_lib_path: Path to the predicates library.
+    - geoip_database_path: Path to the IP geolocation table shipped with the library.
 
     Returns:
     None
     """
+    save_predicate_bundles(graph.functions, growlithe_lib_path, geoip_database_path)
     for function in graph.functions:
-        logger.info(
-            "Saving function %s to %s", function.name, function.growlithe_function_path
-        )
-        if function.runtime.startswith("python"):
-            os.makedirs(
-                os.path.dirname(function.growlithe_function_path), exist_ok=True
+        with tracer.span("save_function", function=function.name):
+            save_function(
+                function.name,
+                function.runtime,
+                function.code_tree,
+                function.growlithe_function_path,
+                growlithe_lib_path,
             )
-            with open(function.growlithe_function_path, "w") as f:
-                f.write(ast.unparse(ast.fix_missing_locations(function.code_tree)))
-            local_lib_path = os.path.join(
-                os.path.dirname(function.growlithe_function_path),
-                "growlithe_predicates.py",
+
+
+@profiler_decorator
+def save_predicate_bundles(functions, growlithe_lib_path, geoip_database_path=None):
+    """
+    Write the Growlithe predicates library next to the Python functions.
+
+    Only the definitions referenced by the instrumented code of the functions are
+    kept, unless MINIMIZE_RUNTIME_LIBRARY is disabled. Functions sharing a directory
+    share the library, with the definitions referenced by any of them. The IP
+    geolocation table is compiled once, and shipped next to libraries resolving IP
+    addresses.
+
+    Parameters:
+    - functions: The functions of the graph, instrumented or with pending plans.
+    - growlithe_lib_path: Path to the predicates library.
+    - geoip_database_path: Path to the CSV IP geolocation table, if any.
+
+    Returns:
+    None
+    """
+    names_by_directory = {}
+    for function in functions:
+        if function.runtime.startswith("python"):
+            names = names_by_directory.setdefault(
+                os.path.dirname(function.growlithe_function_path), set()
             )
+            if MINIMIZE_RUNTIME_LIBRARY:
+                names.update(function.get_referenced_names())
+    geoip_table_path = None
+    for directory, names in names_by_directory.items():
+        os.makedirs(directory, exist_ok=True)
+        local_lib_path = os.path.join(directory, "growlithe_predicates.py")
+        if not MINIMIZE_RUNTIME_LIBRARY:
             shutil.copy(growlithe_lib_path, local_lib_path)
-        elif function.runtime.startswith("nodejs"):
-            os.makedirs(
-                os.path.dirname(function.growlithe_function_path), exist_ok=True
+            resolves_ips = True
+        else:
+            # Imported lazily, the predicates library is loaded by the policy enforcer
+            from growlithe.enforcement.policy.predicate_bundle import (
+                bundle_library,
+                get_required_names,
+            )
+
+            with open(local_lib_path, "w") as f:
+                f.write(bundle_library(growlithe_lib_path, names))
+            resolves_ips = "ipToCountryHelper" in get_required_names(
+                growlithe_lib_path, names
             )
-            with open("tmp.json", "w", encoding="utf-8") as f:
-                json.dump(function.code_tree, f, ensure_ascii=False, indent=4)
+        if geoip_database_path and resolves_ips:
+            local_table_path = os.path.join(directory, "growlithe_geoip.bin")
+            if geoip_table_path is None:
+                compile_cidr_table(geoip_database_path, local_table_path)
+                geoip_table_path = local_table_path
+            else:
+                shutil.copy(geoip_table_path, local_table_path)
+
+
+def save_function(
+    name, runtime, code_tree, growlithe_function_path, growlithe_lib_path
+):
+    """
+    Write the code of a single function. The Growlithe predicates library is written
+    next to Python functions by save_predicate_bundles, and copied next to others.
+
+    Parameters:
+    - name: Name of the function.
+    - runtime: Runtime of the function.
+    - code_tree: AST of the function's code.
+    - growlithe_function_path: Path where the function's code is written.
+    - growlithe_lib_path: Path to the predicates library copied next to the function.
+
+    Returns:
+    None
+    """
+    logger.info("Saving function %s to %s", name, growlithe_function_path)
+    if runtime.startswith("python"):
+        os.makedirs(os.path.dirname(growlithe_function_path), exist_ok=True)
+        with open(growlithe_function_path, "w") as f:
+            f.write(ast.unparse(ast.fix_missing_locations(code_tree)))
+    elif runtime.startswith("nodejs"):
+        os.makedirs(os.path.dirname(growlithe_function_path), exist_ok=True)
+        # Unique per function, as functions may be saved concurrently
+        with tempfile.NamedTemporaryFile(
+            "w", suffix=".json", encoding="utf-8", delete=False
+        ) as f:
+            json.dump(code_tree, f, ensure_ascii=False, indent=4)
+        try:
             subprocess.run(
                 [
                     "node",
                     "growlithe/graph/adg/js/ast2file.js",
-                    "tmp.json",
-                    function.growlithe_function_path,
+                    f.name,
+                    growlithe_function_path,
                 ],
                 check=True,
             )
-            os.remove("tmp.json")
-            # TODO: add the predicates file for nodejs
-            local_lib_path = os.path.join(
-                os.path.dirname(function.growlithe_function_path),
-                "growlithe_predicates.js",
-            )
-            shutil.copy(growlithe_lib_path, local_lib_path)
-        else:
-            logger.error("Unsupported runtime %s", function.runtime)
-            raise NotImplementedError
+        finally:
+            os.remove(f.name)
+        # TODO: add the predicates file for nodejs
+        local_lib_path = os.path.join(
+            os.path.dirname(growlithe_function_path),
+            "growlithe_predicates.js",
+        )
+        shutil.copy(growlithe_lib_path, local_lib_path)
+    else:
+        logger.error("Unsupported runtime %s", runtime)
+        raise NotImplementedError
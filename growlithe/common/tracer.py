@@ -0,0 +1,160 @@
+"""
+Span based tracing module for Growlithe.
+
+Spans time nested phases of a Growlithe run with perf_counter_ns, optionally with the
+peak memory traced by tracemalloc while they were open. Completed spans are kept in
+memory and exported as a Chrome trace (JSON Trace Event Format), which can be opened
+in Perfetto or chrome://tracing.
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+import tracemalloc
+from typing import List
+
+from growlithe.common.dev_config import PROFILE_GROWLITHE_RUNS, TRACE_MEMORY
+from growlithe.common.logger import logger
+
+
+class Span:
+    """
+    A timed phase of a run, possibly nested in another span of the same thread.
+    """
+
+    __slots__ = ("name", "args", "start_ns", "end_ns", "peak_memory")
+
+    def __init__(self, name: str, args: dict):
+        self.name = name
+        self.args = args
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns = None
+        self.peak_memory = 0
+
+    @property
+    def duration_ns(self) -> int:
+        return (self.end_ns or time.perf_counter_ns()) - self.start_ns
+
+
+class Tracer:
+    """
+    Collects the spans of all threads of the process.
+    """
+
+    def __init__(self, enabled=True, trace_memory=False):
+        """
+        Initialize the tracer.
+
+        Args:
+            enabled (bool, optional): Whether spans are recorded.
+            trace_memory (bool, optional): Whether to record the peak memory of spans
+                with tracemalloc, which slows down allocations.
+        """
+        self.enabled = enabled
+        self.trace_memory = trace_memory
+        self.events: List[dict] = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.memory_spans = 0  # Open spans of all threads tracing memory
+
+    @property
+    def stack(self) -> List[Span]:
+        if not hasattr(self.local, "stack"):
+            self.local.stack = []
+        return self.local.stack
+
+    def reset(self):
+        """
+        Discard the recorded spans.
+        """
+        with self.lock:
+            self.events = []
+
+    def start_memory_tracing(self, stack):
+        with self.lock:
+            self.memory_spans += 1
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif stack:
+            # The peak is global, fold it into the parent before measuring the child
+            stack[-1].peak_memory = max(
+                stack[-1].peak_memory, tracemalloc.get_traced_memory()[1]
+            )
+        tracemalloc.reset_peak()
+
+    def stop_memory_tracing(self, span, stack):
+        span.peak_memory = max(span.peak_memory, tracemalloc.get_traced_memory()[1])
+        if stack:
+            stack[-1].peak_memory = max(stack[-1].peak_memory, span.peak_memory)
+            tracemalloc.reset_peak()
+        with self.lock:
+            self.memory_spans -= 1
+            if self.memory_spans == 0:
+                tracemalloc.stop()
+
+    @contextlib.contextmanager
+    def span(self, name: str, **args):
+        """
+        Record the time spent in a block as a span nested in the current span.
+
+        Args:
+            name (str): Name of the span.
+            **args: Attributes of the span, shown in the trace viewer.
+
+        Yields:
+            Span: The open span, or None if tracing is disabled.
+        """
+        if not self.enabled:
+            yield None
+            return
+        stack = self.stack
+        if self.trace_memory:
+            self.start_memory_tracing(stack)
+        span = Span(name, args)
+        stack.append(span)
+        try:
+            yield span
+        finally:
+            span.end_ns = time.perf_counter_ns()
+            stack.pop()
+            if self.trace_memory:
+                self.stop_memory_tracing(span, stack)
+            self.record(span)
+
+    def record(self, span: Span):
+        args = dict(span.args)
+        if self.trace_memory:
+            args["peak_memory_bytes"] = span.peak_memory
+        event = {
+            "name": span.name,
+            "cat": "growlithe",
+            "ph": "X",
+            "ts": span.start_ns / 1000,
+            "dur": span.duration_ns / 1000,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": args,
+        }
+        with self.lock:
+            self.events.append(event)
+
+    def export_chrome_trace(self, trace_path: str):
+        """
+        Write the recorded spans to a Chrome trace file.
+
+        Args:
+            trace_path (str): Path of the JSON trace file.
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            events = sorted(self.events, key=lambda event: event["ts"])
+        with open(trace_path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        logger.info(f"Saved trace of {len(events)} spans to {trace_path}")
+
+
+# Get the tracer
+tracer = Tracer(enabled=PROFILE_GROWLITHE_RUNS, trace_memory=TRACE_MEMORY)
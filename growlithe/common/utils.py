@@ -5,17 +5,18 @@ This module provides utility functions and decorators used across the Growlithe
 primarily for performance profiling and timing of function executions.
 """
 
-import time
 import functools
 import subprocess
 from growlithe.common.logger import profiler_logger
+from growlithe.common.tracer import tracer
 
 
 def profiler_decorator(func):
     """
     Decorator for profiling function execution time.
 
-    This decorator wraps a function and logs its execution time using the profiler_logger.
+    This decorator records each call of a function as a span of the tracer, nested in
+    the spans of its callers, and logs its execution time using the profiler_logger.
     It's useful for performance monitoring and optimization.
 
     Args:
@@ -33,10 +34,11 @@ def profiler_decorator(func):
 
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        start_time = time.time()
-        result = func(*args, **kwargs)
-        execution_time = time.time() - start_time
-        profiler_logger.info(f"{func.__name__} took {execution_time} seconds")
+        with tracer.span(func.__qualname__) as span:
+            result = func(*args, **kwargs)
+        if span is not None:
+            execution_time = span.duration_ns / 1e9
+            profiler_logger.info(f"{func.__name__} took {execution_time} seconds")
         return result
 
     return wrapper
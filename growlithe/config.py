@@ -104,6 +104,8 @@ class Config:
                 "platform_predicates",
                 "pydatalog.zip",
             ),
+            # Table of "network,country" rows to resolve IP addresses offline at runtime
+            "geoip_database_path": "",
             "benchmark_name": "Benchmark2",
             "app_name": "ImageProcessing",
             "src_dir": "src",
@@ -147,14 +149,19 @@ class Config:
             os.path.dirname(self.app_path), f"growlithe_{self.app_name}"
         )
 
-        self.graph_dump_path = os.path.join(self.growlithe_path, "graph_dump.pkl")
-        self.config_dump_path = os.path.join(self.growlithe_path, "config_dump.pkl")
+        self.graph_dump_path = os.path.join(self.growlithe_path, "graph_store.zip")
         self.new_app_path = os.path.join(
             self.growlithe_path, f"{self.app_name}_growlithe"
         )
         self.profiler_log_path = os.path.join(
             self.growlithe_path, "growlithe_profiler.log"
         )
+        self.analyze_trace_path = os.path.join(
+            self.growlithe_path, "growlithe_trace_analyze.json"
+        )
+        self.apply_trace_path = os.path.join(
+            self.growlithe_path, "growlithe_trace_apply.json"
+        )
         self.nodes_path = os.path.join(self.growlithe_path, "nodes.json")
         self.policy_spec_path = os.path.join(self.growlithe_path, "policy_spec.json")
 
@@ -171,13 +178,18 @@ class Config:
             "app_path",
             "src_path",
             "graph_dump_path",
-            "config_dump_path",
             "new_app_path",
             "growlithe_path",
             "profiler_log_path",
+            "analyze_trace_path",
+            "apply_trace_path",
             "nodes_path",
             "policy_spec_path",
         ]
+        # Paths that are left empty when not configured
+        path_attributes += [
+            attr for attr in ["geoip_database_path"] if getattr(self, attr, None)
+        ]
 
         for attr in path_attributes:
             if hasattr(self, attr):
@@ -0,0 +1,80 @@
+"""
+Module for compiling IP geolocation tables shipped with the Growlithe runtime library.
+
+Tables are written as CSV "network,country" rows, e.g. "203.0.113.0/24,CA", and are
+compiled when policies are applied into a binary table that functions memory-map, so
+cold starts do not parse the whole table. The binary table starts with a header of
+GEOIP_TABLE_HEADER (magic, number of IPv4 ranges, number of IPv6 ranges), followed by
+the IPv4 then the IPv6 ranges sorted by start address. Each range is a fixed-width
+record of its big-endian start and end addresses and its two-letter country code.
+The runtime library reads this layout in CidrTableResolver.
+"""
+
+import ipaddress
+import struct
+
+GEOIP_TABLE_MAGIC = b"GRWLGEO1"
+GEOIP_TABLE_HEADER = struct.Struct("<8sII")
+
+
+def read_cidr_table(csv_path):
+    """
+    Read the ranges of a CSV IP geolocation table.
+
+    Empty lines and text after a "#" are ignored.
+
+    Args:
+        csv_path (str): Path of the CSV table of "network,country" rows.
+
+    Returns:
+        dict: Maps each IP version to its (start, end, country) ranges, sorted.
+
+    Raises:
+        ValueError: If a row is not a network and a two-letter country code, or if
+            networks overlap.
+    """
+    ranges = {4: [], 6: []}
+    with open(csv_path, "r") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            network, country = [value.strip() for value in line.split(",")[:2]]
+            network = ipaddress.ip_network(network, strict=False)
+            if len(country) != 2 or not country.isascii():
+                raise ValueError(
+                    f"Invalid country {country!r} on line {line_number} of {csv_path}"
+                )
+            ranges[network.version].append(
+                (
+                    network.network_address.packed,
+                    network.broadcast_address.packed,
+                    country,
+                )
+            )
+    for rows in ranges.values():
+        rows.sort()
+        for previous, row in zip(rows, rows[1:]):
+            if row[0] <= previous[1]:
+                raise ValueError(
+                    f"Overlapping networks in {csv_path} for country {row[2]}"
+                )
+    return ranges
+
+
+def compile_cidr_table(csv_path, table_path):
+    """
+    Compile a CSV IP geolocation table into the binary table read by the runtime library.
+
+    Args:
+        csv_path (str): Path of the CSV table of "network,country" rows.
+        table_path (str): Path of the binary table to write.
+    """
+    ranges = read_cidr_table(csv_path)
+    with open(table_path, "wb") as f:
+        f.write(
+            GEOIP_TABLE_HEADER.pack(GEOIP_TABLE_MAGIC, len(ranges[4]), len(ranges[6]))
+        )
+        for version in (4, 6):
+            for start, end, country in ranges[version]:
+                f.write(start + end + country.encode("ascii"))
@@ -1,118 +1,270 @@
-from pyDatalog import pyDatalog
-from collections import defaultdict
-import os, time, boto3, json
-import urllib.request
-
-s3_client = boto3.client("s3")
-dynamo_client = boto3.client("dynamodb")
+from collections import OrderedDict, defaultdict
+import functools, os, time, json
+
+# boto3 clients, pyDatalog and urllib are loaded on first use, as most functions only
+# need a few of them and importing them dominates the cold start of the library
+_clients = {}
+_pydatalog = None
+
+# Resource properties looked up through control plane APIs rarely change, so they are
+# cached across the warm invocations of a container, for a bounded time and number of
+# resources. Values are stored with their expiry time, least recently used first.
+RESOURCE_PROP_TTL = float(os.environ.get("GROWLITHE_RESOURCE_PROP_TTL", 3600))
+RESOURCE_PROP_CACHE_SIZE = int(
+    os.environ.get("GROWLITHE_RESOURCE_PROP_CACHE_SIZE", 256)
+)
+_resource_props = OrderedDict()
 
 default_value = lambda: {os.environ["AWS_LAMBDA_FUNCTION_NAME"]}
 GROWLITHE_TAINTS = defaultdict(default_value)
 GROWLITHE_INVOCATION_ID = ""
 GROWLITHE_FILE_TAINTS = defaultdict(default_value)
 
+
 ##==================================================================#
-# Arithemtic predicates for numerical operations
-pyDatalog.load(
+# pyDatalog rules, for policy checks that need unification
+def load_pydatalog():
     """
-    add(X, Y, Z) <= (X == Y + Z)
-    sub(X, Y, Z) <= (X == Y - Z)
-
-    mul(X, Y, Z) <= (X == Y * Z)
-    div(X, Y, Z) <= (X == Y / Z)
-"""
-)
+    Import pyDatalog and load the Growlithe rules and predicates, once.
 
-# Comparison predicates for numerical operations
-pyDatalog.load(
+    Returns:
+        The pyDatalog module.
+    """
+    global _pydatalog
+    if _pydatalog is not None:
+        return _pydatalog
+    from pyDatalog import pyDatalog as datalog
+
+    ##==================================================================#
+    # Arithemtic predicates for numerical operations
+    datalog.load("""
+        add(X, Y, Z) <= (X == Y + Z)
+        sub(X, Y, Z) <= (X == Y - Z)
+
+        mul(X, Y, Z) <= (X == Y * Z)
+        div(X, Y, Z) <= (X == Y / Z)
+    """)
+
+    # Comparison predicates for numerical operations
+    datalog.load("""
+        eq(X, Y) <= (X == Y)
+        lt(X, Y) <= (X < Y)
+        le(X, Y) <= (X <= Y)
+        gt(X, Y) <= (X > Y)
+        ge(X, Y) <= (X >= Y)
+    """)
+
+    # Binary not where Y == not(X)
+    @datalog.predicate()
+    def not_2(X, Y):
+        if X.is_const():
+            yield (X.id, not (X.id))
+        elif Y.is_const():
+            yield (not (Y.id), Y.id)
+
+    ##==================================================================#
+    # String predicates
+    @datalog.predicate()
+    def isPrefix2(str, pre):
+        if str.id.startswith(pre.id):
+            yield (str, pre)
+
+    @datalog.predicate()
+    def isSuffix2(str, suf):
+        if str.id.endswith(suf.id):
+            yield (str, suf)
+
+    @datalog.predicate()
+    def hasSubstr2(str, substr):
+        if substr.id in str.id:
+            yield (str, substr)
+
+    @datalog.predicate()
+    def concat3(concatenated_string, str1, str2):
+        yield (str1.id + str2.id, str1, str2)
+
+    ##==================================================================#
+    # """Taint predicates"""
+    @datalog.predicate()
+    def taintSetIncludes(node_id, label):
+        global GROWLITHE_TAINTS
+        if node_id.id in GROWLITHE_TAINTS and label.id in GROWLITHE_TAINTS[node_id.id]:
+            yield True
+
+    @datalog.predicate()
+    def taintSetExcludes(node_id, label):
+        global GROWLITHE_TAINTS
+        if node_id.id in GROWLITHE_TAINTS:
+            if label.id in GROWLITHE_TAINTS[node_id.id]:
+                yield False
+            yield True
+
+    @datalog.predicate()
+    def getItemVal5(val, table_name, key_name, key, prop):
+        import boto3
+
+        dynamodb = boto3.resource("dynamodb")
+        table = dynamodb.Table(table_name.id)
+        response = table.get_item(Key={f"{key_name.id}": key.id})["Item"]
+        yield (response[prop.id], table_name, key_name, key, prop)
+
+    @datalog.predicate()
+    def ipToCountry(ip, out):
+        country = ipToCountryHelper(ip.id)
+        yield (ip, country)
+
+    _pydatalog = datalog
+    return datalog
+
+
+class LazyPyDatalog:
+    """
+    Stands in for the pyDatalog module in instrumented functions. pyDatalog is only
+    imported and its rules loaded when a policy check that could not be compiled
+    to Python asks a query.
     """
-    eq(X, Y) <= (X == Y)
-    lt(X, Y) <= (X < Y)
-    le(X, Y) <= (X <= Y)
-    gt(X, Y) <= (X > Y)
-    ge(X, Y) <= (X >= Y)
-"""
-)
-
 
-# Binary not where Y == not(X)
-@pyDatalog.predicate()
-def not_2(X, Y):
-    if X.is_const():
-        yield (X.id, not (X.id))
-    elif Y.is_const():
-        yield (not (Y.id), Y.id)
+    def __getattr__(self, name):
+        # pyDatalog.load probes module globals for private attributes
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(load_pydatalog(), name)
 
 
-##==================================================================#
-# String predicates
-@pyDatalog.predicate()
-def isPrefix2(str, pre):
-    if str.id.startswith(pre.id):
-        yield (str, pre)
+pyDatalog = LazyPyDatalog()
 
 
-@pyDatalog.predicate()
-def isSuffix2(str, suf):
-    if str.id.endswith(suf.id):
-        yield (str, suf)
+##==================================================================#
+# Taint predicates of policies compiled to Python checks
+def growlithe_taint_set_includes(node_id, label):
+    return node_id in GROWLITHE_TAINTS and label in GROWLITHE_TAINTS[node_id]
 
 
-@pyDatalog.predicate()
-def hasSubstr2(str, substr):
-    if str.id.startswith(substr.id):
-        yield (str, substr)
+def growlithe_taint_set_excludes(node_id, label):
+    return node_id in GROWLITHE_TAINTS and label not in GROWLITHE_TAINTS[node_id]
 
 
-@pyDatalog.predicate()
-def concat3(concatenated_string, str1, str2):
-    yield (str1.id + str2.id, str1, str2)
+def getDictNestedKeyVal(dictionary, nestedKeys):
+    inner = dictionary
+    for key in nestedKeys:
+        inner = inner[key]
+    return inner
 
 
-##==================================================================#
-# """Taint predicates"""
-@pyDatalog.predicate()
-def taintSetIncludes(node_id, label):
-    global GROWLITHE_TAINTS
-    if node_id.id in GROWLITHE_TAINTS and label.id in GROWLITHE_TAINTS[node_id.id]:
-        yield True
+def get_client(service_name):
+    if service_name not in _clients:
+        import boto3
 
+        _clients[service_name] = boto3.client(service_name)
+    return _clients[service_name]
 
-@pyDatalog.predicate()
-def taintSetExcludes(node_id, label):
-    global GROWLITHE_TAINTS
-    if node_id.id in GROWLITHE_TAINTS:
-        if label.id in GROWLITHE_TAINTS[node_id.id]:
-            yield False
-        yield True
 
+##==================================================================#
+# IP geolocation, resolved offline from a table of CIDR ranges shipped next to the
+# library, or through ipinfo.io if there is none. Results are cached per container.
+GEOIP_DATABASE_PATH = os.environ.get(
+    "GROWLITHE_GEOIP_DATABASE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "growlithe_geoip.bin"),
+)
+GEOIP_CACHE_SIZE = int(os.environ.get("GROWLITHE_GEOIP_CACHE_SIZE", 1024))
+_ip_resolver = None
 
-@pyDatalog.predicate()
-def getItemVal5(val, table_name, key_name, key, prop):
-    dynamodb = boto3.resource("dynamodb")
-    table = dynamodb.Table(table_name.id)
-    response = table.get_item(Key={f"{key_name.id}": key.id})["Item"]
-    yield (response[prop.id], table_name, key_name, key, prop)
 
+class CidrTableResolver:
+    """
+    Resolves IP addresses to countries from the binary table compiled by growlithe
+    apply from a CSV table of "network,country" rows. The table is memory-mapped and
+    searched in place, so only the pages of the ranges compared are read. It holds
+    fixed-width records of big-endian start and end addresses and a two-letter country
+    code, sorted by start, IPv4 ranges then IPv6 ranges, after a header with their
+    numbers.
+    """
 
-def ipToCountryHelper(ip):
-    endpoint = f"https://ipinfo.io/{ip.id}/json"
+    MAGIC = b"GRWLGEO1"
+    HEADER_FORMAT = "<8sII"
+
+    class Starts:
+        """Start addresses of the ranges of an IP version, read from the table."""
+
+        def __init__(self, table, offset, count, width):
+            self.table = table
+            self.offset = offset
+            self.count = count
+            self.width = width
+
+        def __len__(self):
+            return self.count
+
+        def __getitem__(self, position):
+            start = self.offset + position * (2 * self.width + 2)
+            return self.table[start : start + self.width]
+
+    def __init__(self, path):
+        import mmap
+        import struct
+
+        with open(path, "rb") as f:
+            self.table = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header_size = struct.calcsize(self.HEADER_FORMAT)
+        magic, count_v4, count_v6 = struct.unpack_from(self.HEADER_FORMAT, self.table)
+        if magic != self.MAGIC:
+            raise ValueError(f"{path} is not a compiled Growlithe IP geolocation table")
+        # Offset, number and address width of the ranges of each IP version
+        self.ranges = {
+            4: (header_size, count_v4, 4),
+            6: (header_size + count_v4 * 10, count_v6, 16),
+        }
+
+    def __call__(self, ip):
+        import bisect
+        import ipaddress
+
+        address = ipaddress.ip_address(ip)
+        offset, count, width = self.ranges[address.version]
+        key = address.packed
+        # Last range starting at or before the address
+        starts = self.Starts(self.table, offset, count, width)
+        position = bisect.bisect_right(starts, key) - 1
+        if position < 0:
+            return None
+        start = offset + position * (2 * width + 2) + width
+        if key <= self.table[start : start + width]:
+            return self.table[start + width : start + width + 2].decode("ascii")
+        return None
+
+
+def ipinfo_country(ip):
+    import urllib.request
+
+    endpoint = f"https://ipinfo.io/{ip}/json"
     with urllib.request.urlopen(endpoint) as response:
         data = json.load(response)
         return data["country"]
 
 
-@pyDatalog.predicate()
-def ipToCountry(ip, out):
-    country = ipToCountryHelper(ip.id)
-    yield (ip, country)
+def get_ip_resolver():
+    global _ip_resolver
+    if _ip_resolver is None:
+        if os.path.exists(GEOIP_DATABASE_PATH):
+            _ip_resolver = CidrTableResolver(GEOIP_DATABASE_PATH)
+        else:
+            _ip_resolver = ipinfo_country
+    return _ip_resolver
 
 
-def getDictNestedKeyVal(dictionary, nestedKeys):
-    inner = dictionary
-    for key in nestedKeys:
-        inner = inner[key]
-    return inner
+def set_ip_resolver(resolver):
+    """
+    Resolve IP addresses with resolver, a callable from an address to a country code,
+    or with the default resolver if None.
+    """
+    global _ip_resolver
+    _ip_resolver = resolver
+    ipToCountryHelper.cache_clear()
+
+
+@functools.lru_cache(maxsize=GEOIP_CACHE_SIZE)
+def ipToCountryHelper(ip):
+    return get_ip_resolver()(ip)
 
 
 ##==================================================================#
@@ -125,15 +277,42 @@ def getInstProp(prop):
 
 
 def getResourceProp(prop, resource_type, resource_name):
+    key = (prop, resource_type, resource_name)
+    now = time.monotonic()
+    if key in _resource_props:
+        value, expiry = _resource_props[key]
+        if now < expiry:
+            _resource_props.move_to_end(key)
+            return value
+    value = lookupResourceProp(prop, resource_type, resource_name)
+    _resource_props[key] = (value, now + RESOURCE_PROP_TTL)
+    _resource_props.move_to_end(key)
+    while len(_resource_props) > RESOURCE_PROP_CACHE_SIZE:
+        _resource_props.popitem(last=False)
+    return value
+
+
+def growlithe_prewarm_resource_props(resources):
+    for resource in resources:
+        try:
+            getResourceProp(*resource)
+        except Exception:
+            # Looked up again when checked, where errors fail the check
+            pass
+
+
+def lookupResourceProp(prop, resource_type, resource_name):
     if prop == "ResourceRegion":
         if resource_type == "S3_BUCKET":
-            return s3_client.get_bucket_location(Bucket=resource_name)[
+            return get_client("s3").get_bucket_location(Bucket=resource_name)[
                 "LocationConstraint"
             ]
         elif resource_type == "DYNAMODB_TABLE":
-            return dynamo_client.describe_table(TableName=resource_name)["Table"][
-                "TableArn"
-            ].split(":")[3]
+            return (
+                get_client("dynamodb")
+                .describe_table(TableName=resource_name)["Table"]["TableArn"]
+                .split(":")[3]
+            )
 
     elif prop == "ResourceName":
         return resource_name
@@ -1,89 +1,129 @@
-from pyDatalog import pyDatalog
 from collections import defaultdict
-import os, time, json
-from firebase_admin import auth
-import urllib.request
+import functools, os, time, json
+
+# pyDatalog, firebase_admin and urllib are loaded on first use, as importing them
+# dominates the cold start of the library
+_pydatalog = None
 
 default_value = lambda: {"GCP_FUNCTION_NAME"}
 GROWLITHE_TAINTS = defaultdict(default_value)
 GROWLITHE_INVOCATION_ID = ""
 GROWLITHE_FILE_TAINTS = defaultdict(default_value)
 
+
 ##==================================================================#
-# Arithmetic predicates for numerical operations
-pyDatalog.load(
+# pyDatalog rules, for policy checks that need unification
+def load_pydatalog():
     """
-    add(X, Y, Z) <= (X == Y + Z)
-    sub(X, Y, Z) <= (X == Y - Z)
-               
-    mul(X, Y, Z) <= (X == Y * Z)
-    div(X, Y, Z) <= (X == Y / Z)
-"""
-)
+    Import pyDatalog and load the Growlithe rules and predicates, once.
 
-# Comparison predicates for numerical operations
-pyDatalog.load(
+    Returns:
+        The pyDatalog module.
+    """
+    global _pydatalog
+    if _pydatalog is not None:
+        return _pydatalog
+    from pyDatalog import pyDatalog as datalog
+
+    ##==================================================================#
+    # Arithmetic predicates for numerical operations
+    datalog.load("""
+        add(X, Y, Z) <= (X == Y + Z)
+        sub(X, Y, Z) <= (X == Y - Z)
+               
+        mul(X, Y, Z) <= (X == Y * Z)
+        div(X, Y, Z) <= (X == Y / Z)
+    """)
+
+    # Comparison predicates for numerical operations
+    datalog.load("""
+        eq(X, Y) <= (X == Y)
+        lt(X, Y) <= (X < Y)
+        le(X, Y) <= (X <= Y)
+        gt(X, Y) <= (X > Y)
+        ge(X, Y) <= (X >= Y)
+    """)
+
+    # Binary not where Y == not(X)
+    @datalog.predicate()
+    def not_2(X, Y):
+        if X.is_const():
+            yield (X.id, not (X.id))
+        elif Y.is_const():
+            yield (not (Y.id), Y.id)
+
+    ##==================================================================#
+    # String predicates
+    @datalog.predicate()
+    def isPrefix2(str, pre):
+        if str.id.startswith(pre.id):
+            yield (str, pre)
+
+    @datalog.predicate()
+    def isSuffix2(str, suf):
+        if str.id.endswith(suf.id):
+            yield (str, suf)
+
+    @datalog.predicate()
+    def hasSubstr2(str, substr):
+        if substr.id in str.id:
+            yield (str, substr)
+
+    @datalog.predicate()
+    def concat3(concatenated_string, str1, str2):
+        yield (str1.id + str2.id, str1, str2)
+
+    ##==================================================================#
+    # """Taint predicates"""
+    @datalog.predicate()
+    def taintSetIncludes(node_id, label):
+        global GROWLITHE_TAINTS
+        if node_id.id in GROWLITHE_TAINTS and label.id in GROWLITHE_TAINTS[node_id.id]:
+            yield True
+
+    @datalog.predicate()
+    def taintSetExcludes(node_id, label):
+        global GROWLITHE_TAINTS
+        if node_id.id in GROWLITHE_TAINTS:
+            if label.id in GROWLITHE_TAINTS[node_id.id]:
+                yield False
+            yield True
+        # FIXME: Decide what to do if node id not in taint set, so cannot check label
+
+    @datalog.predicate()
+    def ipToCountry(ip, out):
+        country = ipToCountryHelper(ip.id)
+        yield (ip, country)
+
+    _pydatalog = datalog
+    return datalog
+
+
+class LazyPyDatalog:
+    """
+    Stands in for the pyDatalog module in instrumented functions. pyDatalog is only
+    imported and its rules loaded when a policy check that could not be compiled
+    to Python asks a query.
     """
-    eq(X, Y) <= (X == Y)
-    lt(X, Y) <= (X < Y)
-    le(X, Y) <= (X <= Y)
-    gt(X, Y) <= (X > Y)
-    ge(X, Y) <= (X >= Y)
-"""
-)
-
-
-# Binary not where Y == not(X)
-@pyDatalog.predicate()
-def not_2(X, Y):
-    if X.is_const():
-        yield (X.id, not (X.id))
-    elif Y.is_const():
-        yield (not (Y.id), Y.id)
-
-
-##==================================================================#
-# String predicates
-@pyDatalog.predicate()
-def isPrefix2(str, pre):
-    if str.id.startswith(pre.id):
-        yield (str, pre)
-
-
-@pyDatalog.predicate()
-def isSuffix2(str, suf):
-    if str.id.endswith(suf.id):
-        yield (str, suf)
-
 
-@pyDatalog.predicate()
-def hasSubstr2(str, substr):
-    if str.id.startswith(substr.id):
-        yield (str, substr)
+    def __getattr__(self, name):
+        # pyDatalog.load probes module globals for private attributes
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(load_pydatalog(), name)
 
 
-@pyDatalog.predicate()
-def concat3(concatenated_string, str1, str2):
-    yield (str1.id + str2.id, str1, str2)
+pyDatalog = LazyPyDatalog()
 
 
 ##==================================================================#
-# """Taint predicates"""
-@pyDatalog.predicate()
-def taintSetIncludes(node_id, label):
-    global GROWLITHE_TAINTS
-    if node_id.id in GROWLITHE_TAINTS and label.id in GROWLITHE_TAINTS[node_id.id]:
-        yield True
+# Taint predicates of policies compiled to Python checks
+def growlithe_taint_set_includes(node_id, label):
+    return node_id in GROWLITHE_TAINTS and label in GROWLITHE_TAINTS[node_id]
 
 
-@pyDatalog.predicate()
-def taintSetExcludes(node_id, label):
-    global GROWLITHE_TAINTS
-    if node_id.id in GROWLITHE_TAINTS:
-        if label.id in GROWLITHE_TAINTS[node_id.id]:
-            yield False
-        yield True
-    # FIXME: Decide what to do if node id not in taint set, so cannot check label
+def growlithe_taint_set_excludes(node_id, label):
+    return node_id in GROWLITHE_TAINTS and label not in GROWLITHE_TAINTS[node_id]
 
 
 ##==================================================================#
@@ -107,8 +147,15 @@ def getResourceProp(prop, resource_type, resource_name):
         return "Unsupported property"
 
 
+def growlithe_prewarm_resource_props(resources):
+    # Resource properties are not looked up through APIs, nothing to resolve ahead
+    pass
+
+
 def getSessionProp(request, prop):
     if prop == "SessionProfileRegion":
+        from firebase_admin import auth
+
         return auth.verify_id_token(request.args.get("authtoken"))["region"]
     elif prop == "SessionEndRegion":
         return ipToCountryHelper(request.remote_addr)
@@ -117,19 +164,111 @@ def getSessionProp(request, prop):
 
 
 ##==================================================================#
+# IP geolocation, resolved offline from a table of CIDR ranges shipped next to the
+# library, or through ipinfo.io if there is none. Results are cached per container.
+GEOIP_DATABASE_PATH = os.environ.get(
+    "GROWLITHE_GEOIP_DATABASE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "growlithe_geoip.bin"),
+)
+GEOIP_CACHE_SIZE = int(os.environ.get("GROWLITHE_GEOIP_CACHE_SIZE", 1024))
+_ip_resolver = None
 
 
-def ipToCountryHelper(ip):
-    endpoint = f"https://ipinfo.io/{ip.id}/json"
+class CidrTableResolver:
+    """
+    Resolves IP addresses to countries from the binary table compiled by growlithe
+    apply from a CSV table of "network,country" rows. The table is memory-mapped and
+    searched in place, so only the pages of the ranges compared are read. It holds
+    fixed-width records of big-endian start and end addresses and a two-letter country
+    code, sorted by start, IPv4 ranges then IPv6 ranges, after a header with their
+    numbers.
+    """
+
+    MAGIC = b"GRWLGEO1"
+    HEADER_FORMAT = "<8sII"
+
+    class Starts:
+        """Start addresses of the ranges of an IP version, read from the table."""
+
+        def __init__(self, table, offset, count, width):
+            self.table = table
+            self.offset = offset
+            self.count = count
+            self.width = width
+
+        def __len__(self):
+            return self.count
+
+        def __getitem__(self, position):
+            start = self.offset + position * (2 * self.width + 2)
+            return self.table[start : start + self.width]
+
+    def __init__(self, path):
+        import mmap
+        import struct
+
+        with open(path, "rb") as f:
+            self.table = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header_size = struct.calcsize(self.HEADER_FORMAT)
+        magic, count_v4, count_v6 = struct.unpack_from(self.HEADER_FORMAT, self.table)
+        if magic != self.MAGIC:
+            raise ValueError(f"{path} is not a compiled Growlithe IP geolocation table")
+        # Offset, number and address width of the ranges of each IP version
+        self.ranges = {
+            4: (header_size, count_v4, 4),
+            6: (header_size + count_v4 * 10, count_v6, 16),
+        }
+
+    def __call__(self, ip):
+        import bisect
+        import ipaddress
+
+        address = ipaddress.ip_address(ip)
+        offset, count, width = self.ranges[address.version]
+        key = address.packed
+        # Last range starting at or before the address
+        starts = self.Starts(self.table, offset, count, width)
+        position = bisect.bisect_right(starts, key) - 1
+        if position < 0:
+            return None
+        start = offset + position * (2 * width + 2) + width
+        if key <= self.table[start : start + width]:
+            return self.table[start + width : start + width + 2].decode("ascii")
+        return None
+
+
+def ipinfo_country(ip):
+    import urllib.request
+
+    endpoint = f"https://ipinfo.io/{ip}/json"
     with urllib.request.urlopen(endpoint) as response:
         data = json.load(response)
         return data["country"]
 
 
-@pyDatalog.predicate()
-def ipToCountry(ip, out):
-    country = ipToCountryHelper(ip.id)
-    yield (ip, country)
+def get_ip_resolver():
+    global _ip_resolver
+    if _ip_resolver is None:
+        if os.path.exists(GEOIP_DATABASE_PATH):
+            _ip_resolver = CidrTableResolver(GEOIP_DATABASE_PATH)
+        else:
+            _ip_resolver = ipinfo_country
+    return _ip_resolver
+
+
+def set_ip_resolver(resolver):
+    """
+    Resolve IP addresses with resolver, a callable from an address to a country code,
+    or with the default resolver if None.
+    """
+    global _ip_resolver
+    _ip_resolver = resolver
+    ipToCountryHelper.cache_clear()
+
+
+@functools.lru_cache(maxsize=GEOIP_CACHE_SIZE)
+def ipToCountryHelper(ip):
+    return get_ip_resolver()(ip)
 
 
 def getDictNestedKeyVal(dictionary, nestedKeys):
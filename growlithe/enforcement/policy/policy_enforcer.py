@@ -1,19 +1,179 @@
 """
 Module for representing a given policy object, and policy enforcement.
 Defines class methods to resolve policies statically, and generate runtime assertions to be instrumented when necessary.
+
+Runtime assertions are compiled to plain Python checks where possible: each variable
+of a predicate set is bound once to the value it is resolved to at runtime, and the
+predicates on it become comparisons and calls to the Growlithe runtime library.
+Predicate sets that need unification are still asked to pyDatalog at runtime.
 """
 
 from __future__ import annotations
+import ast
+import operator
 import re
-from typing import List, Set
+from itertools import chain
+from typing import Dict, List, Optional, Set
 from growlithe.common.logger import logger
-from growlithe.common.dev_config import HYBRID_ENFORCEMENT_MODE
-from pyDatalog import pyDatalog
+from growlithe.common.dev_config import COMPILE_POLICIES, HYBRID_ENFORCEMENT_MODE
 from growlithe.enforcement.taint.taint_utils import online_taint_label, offline_match
 from growlithe.graph.adg.node import Node
 from growlithe.graph.adg.types import ReferenceType
 from growlithe.config import get_config
 
+# Predicates compiled to Python operators
+COMPARISON_OPERATORS = {"eq": "==", "lt": "<", "le": "<=", "gt": ">", "ge": ">="}
+COMPARISON_FUNCTIONS = {
+    "eq": operator.eq,
+    "lt": operator.lt,
+    "le": operator.le,
+    "gt": operator.gt,
+    "ge": operator.ge,
+}
+# Predicates compiled to str methods of their first argument
+STRING_METHODS = {"isPrefix": "startswith", "isSuffix": "endswith"}
+# Predicates compiled to calls of the Growlithe runtime library
+RUNTIME_FUNCTIONS = {
+    "taintSetIncludes": "growlithe_taint_set_includes",
+    "taintSetExcludes": "growlithe_taint_set_excludes",
+}
+
+
+def split_arguments(arguments_str: str) -> List[str]:
+    """
+    Split the arguments of a predicate on commas outside of quotes and of the
+    expressions interpolated in them, like '{getResourceProp('ResourceRegion', ...)}'.
+
+    Args:
+        arguments_str (str): Text between the parentheses of the predicate.
+
+    Returns:
+        List[str]: The stripped arguments.
+    """
+    arguments, current = [], ""
+    quote, depth = None, 0
+    for char in arguments_str:
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+        elif depth == 0 and char in "'\"":
+            if quote is None:
+                quote = char
+            elif quote == char:
+                quote = None
+        elif depth == 0 and quote is None and char == ",":
+            arguments.append(current.strip())
+            current = ""
+            continue
+        current += char
+    arguments.append(current.strip())
+    return arguments
+
+
+def is_variable(argument: str) -> bool:
+    return argument.isidentifier()
+
+
+def compile_argument(argument: str) -> Optional[str]:
+    """
+    Compile a constant argument of a predicate to a Python expression.
+
+    Strings interpolating a single expression, as inserted for values resolved at
+    runtime, compile to the expression itself so its value keeps its type. Other
+    strings with interpolations compile to a concatenation of their parts, as the
+    interpolated expressions use the same quotes as the string.
+
+    Args:
+        argument (str): A string or number literal.
+
+    Returns:
+        Optional[str]: The Python expression, or None if the argument is not a literal.
+    """
+    if argument[:1] in ("'", '"') and argument[-1:] == argument[0]:
+        parts, expressions, current, depth = [], [], "", 0
+        for char in argument[1:-1]:
+            if char == "{" and depth == 0:
+                if current:
+                    parts.append(repr(current))
+                current, depth = "", 1
+                continue
+            if char == "}" and depth == 1:
+                parts.append(f"str({current})")
+                expressions.append(current)
+                current, depth = "", 0
+                continue
+            depth += {"{": 1, "}": -1}.get(char, 0) if depth else 0
+            current += char
+        if current:
+            parts.append(repr(current))
+        if not expressions:
+            return argument
+        if len(parts) == 1:
+            return expressions[0]
+        return f"({' + '.join(parts)})"
+    try:
+        float(argument)
+    except ValueError:
+        return None
+    return argument
+
+
+def load_offline_rules(cloud_provider: str = "AWS"):
+    """
+    Load the pyDatalog rules of the Growlithe runtime library, to check policies
+    offline with the same predicates as at runtime.
+
+    Args:
+        cloud_provider (str, optional): Cloud provider of the application.
+
+    Returns:
+        The pyDatalog module, with the rules loaded.
+    """
+    if cloud_provider == "GCP":
+        from growlithe.enforcement.policy.platform_predicates.growlithe_utils_gcp import (
+            load_pydatalog,
+        )
+    else:
+        from growlithe.enforcement.policy.platform_predicates.growlithe_utils_aws import (
+            load_pydatalog,
+        )
+    return load_pydatalog()
+
+
+def is_constant(expression: str) -> bool:
+    try:
+        ast.literal_eval(expression)
+    except (ValueError, SyntaxError):
+        return False
+    return True
+
+
+def compile_predicate_sets(predicate_sets: List[PredicateSet]) -> str:
+    """
+    Compile the conjunction of independent predicate sets to a Python expression.
+
+    Predicate sets folding to True are left out of the expression.
+
+    Args:
+        predicate_sets (List[PredicateSet]): Predicate sets checked at runtime.
+
+    Returns:
+        str: Python expression that is true if all predicate sets are satisfied,
+        "True" or "False" if it is known offline.
+    """
+    checks = []
+    for predicate_set in predicate_sets:
+        check = predicate_set.compile()
+        if check is None:
+            logger.debug(f"Falling back to pyDatalog for {predicate_set.query}")
+            check = f'pyDatalog.ask(f"{predicate_set.query}") != None'
+        if check == "False":
+            return "False"
+        if check != "True":
+            checks.append(check)
+    return " and ".join(checks) or "True"
+
 
 class PolicyPredicate:
     """AND separated policy predicate in a DNF policy clause"""
@@ -29,7 +189,7 @@ class PolicyPredicate:
         match = re.match(r"(\w+)\s*\((.*)\)$", self.predicate_str)
         if match:
             name = match.group(1)
-            args = [arg.strip() for arg in match.group(2).split(",")]
+            args = split_arguments(match.group(2))
             return name, args
         else:
             logger.error(
@@ -45,6 +205,59 @@ class PolicyPredicate:
                 variables.add(arg)
         return variables
 
+    def binds(self, variable: str) -> bool:
+        """Whether the predicate equates the variable to a constant."""
+        return (
+            self.predicate_name == "eq"
+            and len(self.arguments) == 2
+            and variable in self.arguments
+            and not all(is_variable(arg) for arg in self.arguments)
+        )
+
+    def bound_value(self, variable: str) -> Optional[str]:
+        """Python expression of the constant a binding predicate equates the variable to."""
+        first, second = self.arguments
+        return compile_argument(second if first == variable else first)
+
+    def compile(self, values: Dict[str, str]) -> Optional[str]:
+        """
+        Compile the predicate to a Python expression.
+
+        Args:
+            values (Dict[str, str]): Python expression of the value of each variable.
+
+        Returns:
+            Optional[str]: The Python expression, or None if the predicate cannot be
+            checked without unification.
+        """
+        args = []
+        for arg in self.arguments:
+            value = values.get(arg) if is_variable(arg) else compile_argument(arg)
+            if value is None:
+                return None
+            args.append(value)
+        if len(args) != 2:
+            return None
+        if self.predicate_name in COMPARISON_OPERATORS:
+            if is_constant(args[0]) and is_constant(args[1]):
+                # Fold comparisons of values resolved offline
+                try:
+                    return str(
+                        COMPARISON_FUNCTIONS[self.predicate_name](
+                            ast.literal_eval(args[0]), ast.literal_eval(args[1])
+                        )
+                    )
+                except TypeError:
+                    pass
+            return f"{args[0]} {COMPARISON_OPERATORS[self.predicate_name]} {args[1]}"
+        if self.predicate_name in STRING_METHODS:
+            return f"str({args[0]}).{STRING_METHODS[self.predicate_name]}({args[1]})"
+        if self.predicate_name == "hasSubstr":
+            return f"{args[1]} in str({args[0]})"
+        if self.predicate_name in RUNTIME_FUNCTIONS:
+            return f"{RUNTIME_FUNCTIONS[self.predicate_name]}({args[0]}, {args[1]})"
+        return None
+
 
 class PredicateSet:
     def __init__(self, predicates: Set[PolicyPredicate]):
@@ -83,6 +296,69 @@ class PredicateSet:
     def query(self) -> str:
         return " & ".join([f"{pred.predicate_str}" for pred in self.predicates])
 
+    def compile(self) -> Optional[str]:
+        """
+        Compile the predicate set to a Python expression, in place of asking pyDatalog.
+
+        Each variable is bound by one of its eq predicates, preferring values resolved
+        at runtime, and the other predicates become checks on it. Variables bound to
+        constants are substituted, others are bound once as parameters of a lambda so
+        their value is resolved a single time.
+
+        Returns:
+            Optional[str]: The Python expression, or None if a variable is not bound
+            to a constant or a predicate needs unification.
+        """
+        predicates = sorted(self.predicates, key=lambda pred: pred.predicate_str)
+        bindings: Dict[str, PolicyPredicate] = {}
+        values: Dict[str, str] = {}
+        for var in sorted(self.variables):
+            candidates = [pred for pred in predicates if pred.binds(var)]
+            candidate_values = [pred.bound_value(var) for pred in candidates]
+            if not candidates or None in candidate_values:
+                return None
+            position = next(
+                (
+                    i
+                    for i, value in enumerate(candidate_values)
+                    if not is_constant(value)
+                ),
+                0,
+            )
+            bindings[var] = candidates[position]
+            values[var] = candidate_values[position]
+
+        parameters = {
+            var: value for var, value in values.items() if not is_constant(value)
+        }
+        names = {
+            var: var if var in parameters else value for var, value in values.items()
+        }
+        checks = []
+        for pred in predicates:
+            if any(pred is binding for binding in bindings.values()):
+                continue
+            check = pred.compile(names)
+            if check is None:
+                return None
+            if check == "False":
+                return "False"
+            if check != "True":
+                checks.append(check)
+
+        body = " and ".join(checks) or "True"
+        if not parameters:
+            return body
+        return f"(lambda {', '.join(parameters)}: {body})({', '.join(parameters.values())})"
+
+    @staticmethod
+    def ancestors_match(node: Node, label: str) -> bool:
+        """Whether any ancestor node or function of node may match a taint label."""
+        return any(
+            offline_match(label, ancestor)
+            for ancestor in chain(node.ancestor_nodes, node.ancestor_functions)
+        )
+
     def deferred_query(self, node: Node) -> str:
         logger.debug(f"Checking offline for {self.query}")
         taint_predicates = self.taint_predicates
@@ -91,10 +367,7 @@ class PredicateSet:
                 if taint_pred.predicate_name == "taintSetIncludes":
                     # If no possible matches for arg2 exist for ancestors of node in arg1,
                     # generate error, else defer
-                    possible_match = False
-                    for ancestor in node.ancestor_nodes.union(node.ancestor_functions):
-                        if offline_match(taint_pred.arguments[1], ancestor):
-                            possible_match = True
+                    possible_match = self.ancestors_match(node, taint_pred.arguments[1])
                     if not possible_match:
                         logger.error(
                             f"OFFLINE POLICY ERROR: Partial policy failed offline check: {taint_pred.predicate_str}, but no upstream path can satisfy this"
@@ -102,10 +375,7 @@ class PredicateSet:
                 elif taint_pred.predicate_name == "taintSetExcludes":
                     # If no possible matches for arg2 exist for ancestors of node in arg1,\
                     # mark this pred as successful and do not defer, else defer
-                    possible_match = False
-                    for ancestor in node.ancestor_nodes.union(node.ancestor_functions):
-                        if offline_match(taint_pred.arguments[1], ancestor):
-                            possible_match = True
+                    possible_match = self.ancestors_match(node, taint_pred.arguments[1])
                     if not possible_match:
                         logger.info(
                             f"OFFLINE POLICY Optimized: No upstream path can satisfy this, removing predicate: {taint_pred.predicate_str}"
@@ -115,7 +385,8 @@ class PredicateSet:
         if self.contains_session_variables or self.contains_taint_predicates:
             return self.query
         try:
-            if pyDatalog.ask(self.query) == None:
+            datalog = load_offline_rules(get_config().cloud_provider)
+            if datalog.ask(self.query) == None:
                 logger.error(
                     f"OFFLINE POLICY ERROR: Partial policy failed offline check: {self.query}"
                 )
@@ -242,13 +513,17 @@ class PolicyClause:
                         )
                     )
 
+    def deferred_predicate_sets(self, node) -> List[PredicateSet]:
+        """Predicate sets that could not be resolved offline, to check at runtime."""
+        return [
+            disj
+            for disj in self.disjoint_predicates
+            if disj.deferred_query(node) is not None
+        ]
+
     def deferred_query(self, node) -> str:
         return " & ".join(
-            [
-                f"{disj.deferred_query(node)}"
-                for disj in self.disjoint_predicates
-                if disj.deferred_query(node) is not None
-            ]
+            [f"{disj.query}" for disj in self.deferred_predicate_sets(node)]
         )
 
     @property
@@ -309,10 +584,26 @@ class Policy:
         logger.info(f"Policy: {self.policy_str}")
         for clause in self.policy_clauses:
             if HYBRID_ENFORCEMENT_MODE:
-                query = clause.deferred_query(self.node)
+                predicate_sets = clause.deferred_predicate_sets(self.node)
+                query = " & ".join([f"{disj.query}" for disj in predicate_sets])
             else:
+                predicate_sets = clause.disjoint_predicates
                 query = clause.query
-            if query != "":
+            if query == "":
+                continue
+            if COMPILE_POLICIES:
+                check = compile_predicate_sets(predicate_sets)
+                if check == "True":
+                    # Clauses are alternatives, the policy holds if any does
+                    logger.info(f"OFFLINE POLICY Optimized: Clause holds: {query}")
+                    return ""
+                if check == "False":
+                    logger.error(
+                        f"OFFLINE POLICY ERROR: Partial policy failed offline check: {query}"
+                    )
+                    continue
+                valid_queries.append(check)
+            else:
                 valid_queries.append(f'pyDatalog.ask(f"{query}") != None')
 
         if not valid_queries:
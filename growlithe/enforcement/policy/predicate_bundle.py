@@ -0,0 +1,154 @@
+"""
+Module for generating the Growlithe runtime library shipped with each function.
+
+Instead of copying the whole platform predicates library next to every function,
+only the top-level definitions referenced by the instrumented code of the functions
+are kept, along with the definitions they reference in turn. The source of each kept
+definition is copied verbatim from the library.
+"""
+
+import ast
+import functools
+import os
+from typing import Iterable, List, Set, Tuple
+
+from growlithe.graph.adg.instrumentation_plan import get_referenced_names
+
+
+def get_defined_names(statement: ast.stmt) -> Set[str]:
+    """
+    Get the names a top-level statement of the library defines.
+
+    Args:
+        statement (ast.stmt): Top-level statement.
+
+    Returns:
+        Set[str]: Names of functions, classes, variables or modules it binds.
+    """
+    if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        return {statement.name}
+    if isinstance(statement, (ast.Import, ast.ImportFrom)):
+        return {alias.asname or alias.name.split(".")[0] for alias in statement.names}
+    if isinstance(statement, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+        targets = (
+            statement.targets
+            if isinstance(statement, ast.Assign)
+            else [statement.target]
+        )
+        return {
+            node.id
+            for target in targets
+            for node in ast.walk(target)
+            if isinstance(node, ast.Name)
+        }
+    return set()
+
+
+@functools.lru_cache(maxsize=None)
+def parse_library(library_path: str) -> List[Tuple[ast.stmt, str, Set[str], Set[str]]]:
+    """
+    Parse the top-level statements of a library.
+
+    Args:
+        library_path (str): Path of the Python library.
+
+    Returns:
+        list: (statement, source, defined names, referenced names) of each top-level
+        statement, in order.
+    """
+    with open(library_path, "r") as f:
+        source = f.read()
+    lines = source.splitlines()
+    statements = []
+    for statement in ast.parse(source).body:
+        decorators = getattr(statement, "decorator_list", [])
+        start = min([statement.lineno] + [decorator.lineno for decorator in decorators])
+        statements.append(
+            (
+                statement,
+                "\n".join(lines[start - 1 : statement.end_lineno]),
+                get_defined_names(statement),
+                get_referenced_names(statement),
+            )
+        )
+    return statements
+
+
+def get_required_statements(library_path: str, names: Iterable[str]) -> Set[int]:
+    """
+    Get the top-level statements of a library needed for names.
+
+    Statements that do not define any name are always needed.
+
+    Args:
+        library_path (str): Path of the Python library.
+        names (Iterable[str]): Names referenced by the code importing the library.
+
+    Returns:
+        Set[int]: Positions of the needed statements.
+    """
+    statements = parse_library(library_path)
+    definitions = {}
+    for position, (_, _, defined_names, _) in enumerate(statements):
+        for name in defined_names:
+            definitions.setdefault(name, []).append(position)
+
+    kept = {
+        position
+        for position, (_, _, defined_names, _) in enumerate(statements)
+        if not defined_names
+    }
+    pending = list(names)
+    for position in kept:
+        pending.extend(statements[position][3])
+    while pending:
+        for position in definitions.get(pending.pop(), []):
+            if position not in kept:
+                kept.add(position)
+                pending.extend(statements[position][3])
+    return kept
+
+
+def get_required_names(library_path: str, names: Iterable[str]) -> Set[str]:
+    """
+    Get the names a library needs to define for names.
+
+    Args:
+        library_path (str): Path of the Python library.
+        names (Iterable[str]): Names referenced by the code importing the library.
+
+    Returns:
+        Set[str]: Names defined by the needed statements.
+    """
+    statements = parse_library(library_path)
+    return {
+        name
+        for position in get_required_statements(library_path, names)
+        for name in statements[position][2]
+    }
+
+
+def bundle_library(library_path: str, names: Iterable[str]) -> str:
+    """
+    Generate the source of a library keeping only the definitions needed for names.
+
+    Args:
+        library_path (str): Path of the Python library.
+        names (Iterable[str]): Names referenced by the code importing the library.
+
+    Returns:
+        str: Source of the reduced library.
+    """
+    statements = parse_library(library_path)
+    kept = get_required_statements(library_path, names)
+    blocks = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+    code = f"# Generated by Growlithe from {os.path.basename(library_path)}\n"
+    previous = None
+    for position, (statement, source, defined_names, _) in enumerate(statements):
+        if position not in kept:
+            continue
+        if isinstance(statement, blocks) or isinstance(previous, blocks):
+            code += "\n\n"
+        code += source + "\n"
+        previous = statement
+    return code
@@ -37,8 +37,8 @@ class TaintTracker:
                 self.track_indirect_taints(edge)
 
     def add_preamble(self, function: Function):
-        function.code_tree.body.insert(
-            0, ast.parse("from growlithe_predicates import *")
+        function.instrumentation_plan.insert_at_start(
+            function.code_tree.body, ["from growlithe_predicates import *"]
         )
 
     def track_indirect_taints(self, edge: Edge):
@@ -54,201 +54,128 @@ class TaintTracker:
             raise NotImplementedError
         if source_node.object_type == "S3_BUCKET":
             self.add_s3_indirect_source_taint_to_line(
-                source_node.object_fn.code_tree,
-                source_node,
-                edge.source.object_code_location,
+                source_node, edge.source.object_code_location
             )
 
-    def add_s3_indirect_source_taint_to_line(
-        self, tree, source_node: Node, code_path: dict
-    ):
+    def add_s3_indirect_source_taint_to_line(self, source_node: Node, code_path: dict):
         if not code_path:
             logger.warn(f"code_path not found for node {source_node}")
-        start_line = code_path["physicalLocation"]["region"]["startLine"]
-        end_line = code_path["physicalLocation"]["region"].get("endLine", start_line)
-        if getattr(tree, "body", None):
-            for i, ast_node in enumerate(tree.body):
-                if (
-                    getattr(ast_node, "lineno", None) == start_line
-                    and getattr(ast_node, "end_lineno", None) == end_line
-                ):
-                    tree.body.insert(
-                        i,
-                        ast.parse(
-                            f"growlithe_save_s3_taint(f'{online_taint_label(source_node)}', bucket, {source_node.object.reference_name})"
-                        ),
-                    )
-                    tree.body.insert(
-                        i,
-                        ast.parse(
-                            f"growlithe_add_self_taint(f'{online_taint_label(source_node)}')"
-                        ),
-                    )
-                    return
-                self.add_s3_indirect_source_taint_to_line(
-                    ast_node, source_node, code_path
-                )
+        source_node.object_fn.instrumentation_plan.insert_at(
+            code_path,
+            [
+                f"growlithe_add_self_taint(f'{online_taint_label(source_node)}')",
+                f"growlithe_save_s3_taint(f'{online_taint_label(source_node)}', bucket, {source_node.object.reference_name})",
+            ],
+        )
 
     def track_direct_taints(self, edge: Edge):
         self.add_source_taint(edge.source, edge.source.object_code_location)
         self.add_sink_taint(edge.sink, edge.source, edge.sink.object_code_location)
 
     def add_source_taint(self, source_node: Node, code_path):
-        tree = source_node.object_fn.code_tree
-        self.add_source_taint_to_line(tree, source_node, code_path)
+        self.add_source_taint_to_line(source_node, code_path)
 
-    def add_source_taint_to_line(self, tree, source_node: Node, code_path):
+    def add_source_taint_to_line(self, source_node: Node, code_path):
         if not code_path:
             logger.warn(f"code_path not found for node {source_node}")
-        start_line = code_path["physicalLocation"]["region"]["startLine"]
-        end_line = code_path["physicalLocation"]["region"].get("endLine", start_line)
-        if getattr(tree, "body", None):
-            for i, ast_node in enumerate(tree.body):
-                if (
-                    getattr(ast_node, "lineno", None) == start_line
-                    and getattr(ast_node, "end_lineno", None) == end_line
-                ):
-                    if source_node.object_type == "S3_BUCKET":
-                        tree.body.insert(
-                            i,
-                            ast.parse(
-                                f"growlithe_add_s3_object_taint(f'{online_taint_label(source_node)}', bucket, {source_node.object.reference_name})"
-                            ),
-                        )
-                    if source_node.object_type == "LOCAL_FILE":
-                        tree.body.insert(
-                            i,
-                            ast.parse(
-                                f"growlithe_add_file_taint(f'{online_taint_label(source_node)}', {source_node.object.reference_name})"
-                            ),
-                        )
-                    tree.body.insert(
-                        i,
-                        ast.parse(
-                            f"growlithe_add_self_taint(f'{online_taint_label(source_node)}')"
-                        ),
-                    )
-                    return
-                self.add_source_taint_to_line(ast_node, source_node, code_path)
+        snippets = [f"growlithe_add_self_taint(f'{online_taint_label(source_node)}')"]
+        if source_node.object_type == "S3_BUCKET":
+            snippets.append(
+                f"growlithe_add_s3_object_taint(f'{online_taint_label(source_node)}', bucket, {source_node.object.reference_name})"
+            )
+        if source_node.object_type == "LOCAL_FILE":
+            snippets.append(
+                f"growlithe_add_file_taint(f'{online_taint_label(source_node)}', {source_node.object.reference_name})"
+            )
+        source_node.object_fn.instrumentation_plan.insert_at(code_path, snippets)
 
     def add_sink_taint(self, sink_node, source_node, code_path):
-        tree = sink_node.object_fn.code_tree
-        self.add_sink_taint_to_line(tree, sink_node, source_node, code_path)
+        self.add_sink_taint_to_line(sink_node, source_node, code_path)
 
-    def add_sink_taint_to_line(
-        self, tree, sink_node: Node, source_node: Node, code_path
-    ):
-        start_line = code_path["physicalLocation"]["region"]["startLine"]
-        end_line = code_path["physicalLocation"]["region"].get("endLine", start_line)
-        if getattr(tree, "body", None):
-            for i, ast_node in enumerate(tree.body):
-                if (
-                    getattr(ast_node, "lineno", None) == start_line
-                    and getattr(ast_node, "end_lineno", None) == end_line
-                ):
-                    if sink_node.object_type == "S3_BUCKET":
-                        # add taint to the metadata of the s3 object.
-                        tree.body[i].value.keywords.append(
-                            ast.keyword(
-                                arg="ExtraArgs",
-                                value=ast.Dict(
-                                    keys=[ast.Str(s="Metadata")],
+    def add_sink_taint_to_line(self, sink_node: Node, source_node: Node, code_path):
+        ast_node = sink_node.object_fn.statement_index.get_statement(code_path)
+        if ast_node:
+            snippets = [
+                f"growlithe_add_source_taint(f'{online_taint_label(sink_node)}', f'{online_taint_label(source_node)}')",
+                f"growlithe_add_self_taint(f'{online_taint_label(sink_node)}')",
+            ]
+            if sink_node.object_type == "S3_BUCKET":
+                # add taint to the metadata of the s3 object.
+                ast_node.value.keywords.append(
+                    ast.keyword(
+                        arg="ExtraArgs",
+                        value=ast.Dict(
+                            keys=[ast.Str(s="Metadata")],
+                            values=[
+                                ast.Dict(
+                                    keys=[ast.Str(s="growlithe_taints")],
                                     values=[
-                                        ast.Dict(
-                                            keys=[ast.Str(s="growlithe_taints")],
-                                            values=[
-                                                ast.Call(
-                                                    func=ast.Attribute(
-                                                        value=ast.Str(s=","),
-                                                        attr="join",
-                                                        ctx=ast.Load(),
-                                                    ),
-                                                    args=[
-                                                        ast.Name(
-                                                            id=f"GROWLITHE_TAINTS[f'{online_taint_label(sink_node)}']",
-                                                            ctx=ast.Load(),
-                                                        )
-                                                    ],
-                                                    keywords=[],
+                                        ast.Call(
+                                            func=ast.Attribute(
+                                                value=ast.Str(s=","),
+                                                attr="join",
+                                                ctx=ast.Load(),
+                                            ),
+                                            args=[
+                                                ast.Name(
+                                                    id=f"GROWLITHE_TAINTS[f'{online_taint_label(sink_node)}']",
+                                                    ctx=ast.Load(),
                                                 )
                                             ],
+                                            keywords=[],
                                         )
                                     ],
+                                )
+                            ],
+                        ),
+                    )
+                )
+            elif sink_node.object_type == "LOCAL_FILE":
+                snippets.append(
+                    f"growlithe_update_file_taint({source_node.object.reference_name}, f'{online_taint_label(sink_node)}')"
+                )
+            elif sink_node.object_type == "RETURN":
+                # modify return statement to return GROWLITHE_TAINTS: {','.join(GROWLITHE_TAINTS[sink_node.id])}
+                if isinstance(ast_node, ast.Return):
+                    if isinstance(ast_node.value, ast.Dict):
+                        # Add new field to existing dictionary
+                        ast_node.value.keys.append(
+                            ast.Constant(value="GROWLITHE_TAINTS")
+                        )
+                        ast_node.value.values.append(
+                            ast.Call(
+                                func=ast.Attribute(
+                                    value=ast.Str(s=","),
+                                    attr="join",
+                                    ctx=ast.Load(),
                                 ),
+                                args=[
+                                    ast.Name(
+                                        id=f"GROWLITHE_TAINTS[f'{online_taint_label(sink_node)}']",
+                                        ctx=ast.Load(),
+                                    )
+                                ],
+                                keywords=[],
                             )
                         )
-                    elif sink_node.object_type == "LOCAL_FILE":
-                        tree.body.insert(
-                            i,
-                            ast.parse(
-                                f"growlithe_update_file_taint({source_node.object.reference_name}, f'{online_taint_label(sink_node)}')"
-                            ),
+                    if isinstance(ast_node.value, ast.Name):
+                        # if the return is a dict variable
+                        snippets.append(
+                            f"{ast_node.value.id}['GROWLITHE_TAINTS'] = ','.join(GROWLITHE_TAINTS[f'{online_taint_label(sink_node)}'])"
                         )
-                    elif sink_node.object_type == "RETURN":
-                        # modify return statement to return GROWLITHE_TAINTS: {','.join(GROWLITHE_TAINTS[sink_node.id])}
-                        if isinstance(ast_node, ast.Return):
-                            if isinstance(ast_node.value, ast.Dict):
-                                # Add new field to existing dictionary
-                                ast_node.value.keys.append(
-                                    ast.Constant(value="GROWLITHE_TAINTS")
-                                )
-                                ast_node.value.values.append(
-                                    ast.Call(
-                                        func=ast.Attribute(
-                                            value=ast.Str(s=","),
-                                            attr="join",
-                                            ctx=ast.Load(),
-                                        ),
-                                        args=[
-                                            ast.Name(
-                                                id=f"GROWLITHE_TAINTS[f'{online_taint_label(sink_node)}']",
-                                                ctx=ast.Load(),
-                                            )
-                                        ],
-                                        keywords=[],
-                                    )
-                                )
-                            if isinstance(ast_node.value, ast.Name):
-                                # if the return is a dict variable
-                                tree.body.insert(
-                                    i,
-                                    ast.parse(
-                                        f"{ast_node.value.id}['GROWLITHE_TAINTS'] = ','.join(GROWLITHE_TAINTS[f'{online_taint_label(sink_node)}'])"
-                                    ),
-                                )
-                    tree.body.insert(
-                        i,
-                        ast.parse(
-                            f"growlithe_add_self_taint(f'{online_taint_label(sink_node)}')"
-                        ),
-                    )
-                    tree.body.insert(
-                        i,
-                        ast.parse(
-                            f"growlithe_add_source_taint(f'{online_taint_label(sink_node)}', f'{online_taint_label(source_node)}')"
-                        ),
-                    )
-                    return
-                self.add_sink_taint_to_line(ast_node, sink_node, source_node, code_path)
+            sink_node.object_fn.instrumentation_plan.insert_at(code_path, snippets)
 
     def add_param_taint_extraction(self, function: Function):
         node = function.get_event_node()
         param_line = function.get_event_node().object_code_location["physicalLocation"][
             "region"
         ]["startLine"]
-        for tree_node in ast.walk(function.code_tree):
-            if isinstance(tree_node, ast.FunctionDef):
-                if getattr(tree_node, "lineno", None) == param_line:
-                    tree_node.body.insert(
-                        0,
-                        ast.parse(
-                            f"growlithe_add_self_taint(f'{online_taint_label(node)}')"
-                        ),
-                    )
-                    tree_node.body.insert(
-                        0,
-                        ast.parse(
-                            f"growlithe_extract_param_taint(f'{online_taint_label(node)}', event)"
-                        ),
-                    )
-                    break
+        tree_node = function.statement_index.get_function_def(param_line)
+        if tree_node:
+            function.instrumentation_plan.insert_at_start(
+                tree_node.body,
+                [
+                    f"growlithe_extract_param_taint(f'{online_taint_label(node)}', event)",
+                    f"growlithe_add_self_taint(f'{online_taint_label(node)}')",
+                ],
+            )
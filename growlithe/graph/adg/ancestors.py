@@ -0,0 +1,147 @@
+"""
+Module for compact ancestor sets of nodes in an Application Dependency Graph (ADG).
+
+Ancestor sets are stored as Python int bitsets over dense ids assigned to the nodes
+and functions of a graph. Taking the union of a parent's ancestors is a single int
+OR, and each set costs one bit per node instead of a hash table entry. Cycles are
+handled by condensing strongly connected components, whose members share ancestors.
+"""
+
+from collections.abc import Set
+from typing import Dict, Iterable, Iterator, List
+
+
+def strongly_connected_components(adjacency: List[List[int]]) -> List[List[int]]:
+    """
+    Compute strongly connected components with an iterative version of Tarjan's
+    algorithm, so deep graphs do not hit the recursion limit.
+
+    Args:
+        adjacency (list): adjacency[v] lists the successors of vertex v.
+
+    Returns:
+        list: Components as lists of vertices, in reverse topological order, i.e. a
+        component is listed before every component that has an edge into it.
+    """
+    num_vertices = len(adjacency)
+    index = [-1] * num_vertices
+    low = [0] * num_vertices
+    on_stack = [False] * num_vertices
+    stack: List[int] = []
+    components: List[List[int]] = []
+    counter = 0
+    for root in range(num_vertices):
+        if index[root] != -1:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        # Each frame is (vertex, position of the next successor to visit)
+        frames = [(root, 0)]
+        while frames:
+            vertex, position = frames[-1]
+            successors = adjacency[vertex]
+            if position < len(successors):
+                frames[-1] = (vertex, position + 1)
+                successor = successors[position]
+                if index[successor] == -1:
+                    index[successor] = low[successor] = counter
+                    counter += 1
+                    stack.append(successor)
+                    on_stack[successor] = True
+                    frames.append((successor, 0))
+                elif on_stack[successor]:
+                    low[vertex] = min(low[vertex], index[successor])
+                continue
+            frames.pop()
+            if frames:
+                parent = frames[-1][0]
+                low[parent] = min(low[parent], low[vertex])
+            if low[vertex] == index[vertex]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component.append(member)
+                    if member == vertex:
+                        break
+                components.append(component)
+    return components
+
+
+class DenseIds:
+    """
+    Assigns consecutive integer ids to objects, by identity.
+    """
+
+    def __init__(self, items: Iterable = ()):
+        """
+        Initialize the ids, numbering the given items in order.
+
+        Args:
+            items (Iterable, optional): Objects to number first.
+        """
+        self.items: List = []
+        self.ids: Dict[int, int] = {}
+        for item in items:
+            self.get_id(item)
+
+    def __len__(self):
+        return len(self.items)
+
+    def get_id(self, item) -> int:
+        """
+        Get the id of an object, assigning the next id if it has none.
+
+        Args:
+            item: Any object.
+
+        Returns:
+            int: Dense id of the object.
+        """
+        dense_id = self.ids.get(id(item))
+        if dense_id is None:
+            dense_id = len(self.items)
+            self.ids[id(item)] = dense_id
+            self.items.append(item)
+        return dense_id
+
+
+class AncestorSet(Set):
+    """
+    Read-only set view over a bitset of dense ids.
+
+    Supports membership, iteration, len and the set operators of collections.abc.Set,
+    so it can be used wherever the previous Python sets of ancestors were read.
+    """
+
+    __slots__ = ("bits", "universe")
+
+    def __init__(self, bits: int = 0, universe: DenseIds = None):
+        """
+        Initialize the view.
+
+        Args:
+            bits (int, optional): Bitset with bit i set if universe item i is a member.
+            universe (DenseIds, optional): Ids of the objects the bits refer to.
+        """
+        self.bits = bits
+        self.universe = universe if universe is not None else DenseIds()
+
+    def __contains__(self, item) -> bool:
+        dense_id = self.universe.ids.get(id(item))
+        return dense_id is not None and (self.bits >> dense_id) & 1 == 1
+
+    def __iter__(self) -> Iterator:
+        bits = self.bits
+        while bits:
+            lowest = bits & -bits
+            yield self.universe.items[lowest.bit_length() - 1]
+            bits ^= lowest
+
+    def __len__(self) -> int:
+        return self.bits.bit_count()
+
+    def __repr__(self) -> str:
+        return f"AncestorSet({list(self)})"
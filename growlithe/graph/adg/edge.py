@@ -54,11 +54,14 @@ class Edge:
         """
         Return True if the two edges are equal.
         """
-        return (
-            self.source == edge2.source
-            and self.sink == edge2.sink
-            and self.edge_type == edge2.edge_type
-        )
+        return self.key == edge2.key
+
+    @property
+    def key(self):
+        """
+        Canonical structural key of the edge, used to deduplicate edges in the graph.
+        """
+        return (self.source.key, self.sink.key, self.edge_type)
 
     def to_policy_json(self):
         if self.edge_type == EdgeType.DATA:
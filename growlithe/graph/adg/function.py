@@ -11,7 +11,12 @@ import json
 import subprocess
 
 from growlithe.common.logger import logger
+from growlithe.graph.adg.instrumentation_plan import (
+    InstrumentationPlan,
+    get_referenced_names,
+)
 from growlithe.graph.adg.resource import Resource
+from growlithe.graph.adg.statement_index import StatementIndex
 
 
 class Function(Resource):
@@ -57,32 +62,15 @@ class Function(Resource):
         self.nodes = []  # List of nodes in the function
         self.edges = []  # List of edges in the function
         self.iam_policies = []  # List of IAM policies associated with the function
-        self.code_tree = None  # AST of the function's code
-
-        if self.function_path:
-            if "python" in self.runtime:
-                with open(function_path, "r") as f:
-                    code = f.read()
-                    tree = ast.parse(code)
-                    self.code_tree = tree
-            elif "nodejs" in self.runtime:
-                subprocess.run(
-                    [
-                        "node",
-                        "growlithe/graph/adg/js/file2ast.js",
-                        self.function_path,
-                    ],
-                    check=True,
-                )
-                with open("tmp.json", encoding="utf-8") as f:
-                    self.code_tree = json.load(f)
-                os.remove("tmp.json")
-                # raise NotImplementedError
-            else:
-                raise NotImplementedError
-        else:
+        self._code_tree = None  # AST of the function's code, parsed on first use
+        self._statement_index = None  # Index of statements in the code tree by lines
+        self._instrumentation_plan = None  # Pending insertions into the code tree
+
+        if not self.function_path:
             logger.error("Path for function %s is empty.", self.name)
             raise FileNotFoundError
+        if "python" not in self.runtime and "nodejs" not in self.runtime:
+            raise NotImplementedError
 
     def __str__(self):
         """
@@ -102,6 +90,89 @@ class Function(Resource):
         """
         return f"{self.name} ({self.function_path})"
 
+    @property
+    def code_tree(self):
+        """
+        Get the AST of the function's code, reading it from source on first use.
+
+        Returns:
+            The Python AST, or the ESTree JSON for nodejs functions.
+        """
+        if self._code_tree is None:
+            self._code_tree = self.load_code_tree()
+        return self._code_tree
+
+    @code_tree.setter
+    def code_tree(self, code_tree):
+        self._code_tree = code_tree
+
+    def load_code_tree(self):
+        """
+        Parse the function's source code into an AST.
+
+        Returns:
+            The Python AST, or the ESTree JSON for nodejs functions.
+        """
+        if "python" in self.runtime:
+            with open(self.function_path, "r") as f:
+                return ast.parse(f.read())
+        subprocess.run(
+            [
+                "node",
+                "growlithe/graph/adg/js/file2ast.js",
+                self.function_path,
+            ],
+            check=True,
+        )
+        with open("tmp.json", encoding="utf-8") as f:
+            code_tree = json.load(f)
+        os.remove("tmp.json")
+        return code_tree
+
+    @property
+    def statement_index(self) -> StatementIndex:
+        """
+        Get the index of statements in the function's code tree, building it on first use.
+
+        Returns:
+            StatementIndex: Index from line ranges to statements in the code tree.
+        """
+        if getattr(self, "_statement_index", None) is None:
+            self._statement_index = StatementIndex(self.code_tree)
+        return self._statement_index
+
+    @property
+    def instrumentation_plan(self) -> InstrumentationPlan:
+        """
+        Get the plan of snippets to insert into the function's code tree.
+
+        Returns:
+            InstrumentationPlan: Pending insertions, applied by apply_instrumentation.
+        """
+        if getattr(self, "_instrumentation_plan", None) is None:
+            self._instrumentation_plan = InstrumentationPlan(self.statement_index)
+        return self._instrumentation_plan
+
+    def apply_instrumentation(self):
+        """
+        Insert all planned snippets into the function's code tree in a single pass.
+        """
+        if getattr(self, "_instrumentation_plan", None) is not None:
+            self._instrumentation_plan.apply()
+
+    def get_referenced_names(self):
+        """
+        Get the names referenced by the Python code of the function, including the
+        snippets planned to be inserted but not applied yet.
+
+        Returns:
+            set: The referenced names.
+        """
+        names = get_referenced_names(self.code_tree)
+        if getattr(self, "_instrumentation_plan", None) is not None:
+            names |= self._instrumentation_plan.get_referenced_names()
+        return names
+
     def add_node(self, node):
         """
         Add a node to the function's list of nodes.
@@ -6,12 +6,18 @@ representing the relationships between nodes, edges, functions, and resources
 in an application.
 """
 
-import json
 import ast
-from collections import deque
-from typing import List
+import json
+from typing import Dict, List
+from growlithe.common.dev_config import PREWARM_RESOURCE_PROPS
 from growlithe.common.logger import logger
+from growlithe.common.tracer import tracer
 from growlithe.common.utils import profiler_decorator
+from growlithe.graph.adg.ancestors import (
+    AncestorSet,
+    DenseIds,
+    strongly_connected_components,
+)
 from growlithe.graph.adg.node import Node
 from growlithe.graph.adg.edge import Edge, EdgeType
 from growlithe.graph.adg.function import Function
@@ -37,6 +43,10 @@ class Graph:
         self.functions: List[Function] = []  # List of functions in the graph
         self.resources: List[Resource] = []  # List of resources in the graph
 
+        # Indexes from structural keys to nodes/edges for O(1) deduplication
+        self.node_index: Dict[tuple, Node] = {}
+        self.edge_index: Dict[tuple, Edge] = {}
+
     def add_node(self, new_node: Node):
         """
         Add a new node to the graph if it doesn't already exist.
@@ -48,10 +58,11 @@ class Graph:
             Node: The added node or an existing equivalent node.
         """
         # Check if a node with the same properties already exists in the graph
-        for existing_node in self.nodes:
-            if existing_node == new_node:
-                # logger.info('Using existing node for metadata')
-                return existing_node
+        key = new_node.key
+        existing_node = self.node_index.get(key)
+        if existing_node is not None:
+            return existing_node
+        self.node_index[key] = new_node
         self.nodes.append(new_node)
         if new_node.object_fn:
             new_node.object_fn.add_node(new_node)
@@ -73,9 +84,11 @@ class Graph:
         Returns:
             Edge: The added edge or an existing equivalent edge.
         """
-        for existing_edge in self.edges:
-            if existing_edge == edge:
-                return existing_edge
+        key = edge.key
+        existing_edge = self.edge_index.get(key)
+        if existing_edge is not None:
+            return existing_edge
+        self.edge_index[key] = edge
         if edge.edge_type == EdgeType.METADATA:
             self.metadata_edges.append(edge)
         else:
@@ -190,97 +203,137 @@ class Graph:
             if edge.edge_id == edge_id:
                 edge.update_policy(policy_edge)
 
-    def insert_assertion(self, node: Node, assertion, code_path=None, tree=None):
+    def insert_assertion(self, node: Node, assertion, code_path=None):
         """
-        Insert an assertion into the AST of a function.
+        Plan the insertion of an assertion into the AST of a function.
 
         Args:
             node (Node): The node where the assertion should be inserted.
             assertion (str): The assertion to be inserted.
             code_path (dict, optional): The code location information.
-            tree (ast.AST, optional): The AST to modify.
         """
-        if tree is None:
-            tree = node.object_fn.code_tree
         if code_path is None:
             code_path = node.object_code_location
-        start_line = code_path["physicalLocation"]["region"]["startLine"]
-        end_line = code_path["physicalLocation"]["region"].get("endLine", start_line)
-        if getattr(tree, "body", None):
-            for i, ast_node in enumerate(tree.body):
-                if (
-                    getattr(ast_node, "lineno", None) == start_line
-                    and getattr(ast_node, "end_lineno", None) == end_line
-                ):
-                    tree.body.insert(i, ast.parse(assertion))
-                    return
-                self.insert_assertion(node, assertion, code_path, ast_node)
+        if not node.object_fn.instrumentation_plan.insert_at(code_path, [assertion]):
+            logger.warning(f"Could not find statement to insert assertion for {node}")
+
+    @profiler_decorator
+    def apply_instrumentation(self):
+        """
+        Rewrite the code of each function with its planned taint tracking and assertions.
+        """
+        for function in self.functions:
+            with tracer.span("apply_instrumentation.function", function=function.name):
+                function.apply_instrumentation()
 
     @profiler_decorator
     def enforce_policy(self):
         """
-        Enforce policies by inserting assertions into the code.
+        Enforce policies by planning assertions to be inserted into the code.
         """
-        self.populate_ancestors()
-        for edge in self.edges:
-            # TODO: Add to the instrumented code
-            read_assertion = edge.read_policy.generate_assertion(edge.function.runtime)
-            if read_assertion:
-                logger.debug(
-                    f"Adding assertion in {edge.function.function_path}:\n {read_assertion}"
+        with tracer.span("populate_ancestors", nodes=len(self.nodes)):
+            self.populate_ancestors()
+        with tracer.span("generate_assertions", edges=len(self.edges)):
+            for edge in self.edges:
+                # TODO: Add to the instrumented code
+                read_assertion = edge.read_policy.generate_assertion(
+                    edge.function.runtime
+                )
+                if read_assertion:
+                    logger.debug(
+                        f"Adding assertion in {edge.function.function_path}:\n {read_assertion}"
+                    )
+                    self.insert_assertion(edge.source, read_assertion)
+
+                write_assertion = edge.write_policy.generate_assertion(
+                    edge.function.runtime
                 )
-                self.insert_assertion(edge.source, read_assertion)
+                if write_assertion:
+                    logger.debug(
+                        f"Adding assertion in {edge.function.function_path}:\n {write_assertion}"
+                    )
+                    self.insert_assertion(edge.sink, write_assertion)
+        if PREWARM_RESOURCE_PROPS:
+            self.prewarm_resource_props()
+
+    def prewarm_resource_props(self):
+        """
+        Plan the resolution of resource properties at the start of each function.
 
-            write_assertion = edge.write_policy.generate_assertion(
-                edge.function.runtime
-            )
-            if write_assertion:
-                logger.debug(
-                    f"Adding assertion in {edge.function.function_path}:\n {write_assertion}"
+        Only getResourceProp calls with constant arguments in the planned assertions,
+        i.e. on statically known resources, are resolved when the function is loaded.
+        """
+        for function in self.functions:
+            if not function.runtime.startswith("python"):
+                continue
+            resources = set()
+            for statement in function.instrumentation_plan.get_statements():
+                for node in ast.walk(statement):
+                    if (
+                        isinstance(node, ast.Call)
+                        and isinstance(node.func, ast.Name)
+                        and node.func.id == "getResourceProp"
+                        and all(isinstance(arg, ast.Constant) for arg in node.args)
+                    ):
+                        resources.add(tuple(arg.value for arg in node.args))
+            if resources:
+                # After the import of the predicates library, at the start
+                function.instrumentation_plan.insert_at_start(
+                    function.code_tree.body,
+                    [f"growlithe_prewarm_resource_props({sorted(resources)!r})"],
                 )
-                self.insert_assertion(edge.sink, write_assertion)
 
     def populate_ancestors(self):
         """
         Populate ancestor information for each node in the graph.
 
-        This method performs a topological sort to determine the ancestor
-        relationships between nodes and functions in the graph.
+        Nodes and functions get dense ids and ancestors are accumulated as int
+        bitsets, exposed on each node as AncestorSet views. The graph is condensed
+        into its strongly connected components, which are processed in topological
+        order. Nodes in a cycle are ancestors of every node in the cycle, including
+        themselves, and share one ancestor bitset.
 
-        Time Complexity: O(V + E), where V is the number of nodes and E is the number of edges.
+        Time Complexity: O(V + E) bitset unions, each taking O(V / 64) words.
         """
-        # Calculate in-degree for each node, i.e. number of incoming edges for each sink node
-        in_degree = {node: 0 for node in self.nodes}
-        for edge in self.edges:
-            in_degree[edge.sink] += 1
-
-        # Initialize queue with nodes having in-degree 0
-        queue = deque([node for node in self.nodes if in_degree[node] == 0])
-
-        # Process nodes in topological order, i.e. increasing order of in-degree
-        while queue:
-            current_node = queue.popleft()
-
-            # Add current node's function to its ancestor_functions
-            current_node.ancestor_functions.add(current_node.object_fn)
-
-            # Process outgoing edges
-            for edge in current_node.outgoing_edges:
-                child_node = edge.sink
-
-                # Add current node and its ancestors to child's ancestors
-                child_node.ancestor_nodes.add(current_node)
-                child_node.ancestor_nodes.update(current_node.ancestor_nodes)
-
-                # Add current node's function and ancestor functions to child's ancestor functions
-                child_node.ancestor_functions.add(current_node.object_fn)
-                child_node.ancestor_functions.update(current_node.ancestor_functions)
-
-                # Decrease in-degree of child node
-                in_degree[child_node] -= 1
-                if in_degree[child_node] == 0:
-                    queue.append(child_node)
+        node_ids = DenseIds(self.nodes)
+        function_ids = DenseIds(self.functions)
+        successors = [
+            [node_ids.ids[id(edge.sink)] for edge in node.outgoing_edges]
+            for node in self.nodes
+        ]
+        components = strongly_connected_components(successors)
+        component_of = [0] * len(self.nodes)
+        for c, component in enumerate(components):
+            for member in component:
+                component_of[member] = c
+
+        # Ancestors of each component, pushed to successor components in topological order
+        node_bits = [0] * len(components)
+        function_bits = [0] * len(components)
+        num_cycles = 0
+        for c in reversed(range(len(components))):
+            component = components[c]
+            member_bits = 0
+            for member in component:
+                member_bits |= 1 << member
+                function_bits[c] |= 1 << function_ids.get_id(
+                    self.nodes[member].object_fn
+                )
+            if len(component) > 1 or component[0] in successors[component[0]]:
+                node_bits[c] |= member_bits
+                num_cycles += 1
+            for member in component:
+                for child in successors[member]:
+                    child_component = component_of[child]
+                    if child_component != c:
+                        node_bits[child_component] |= node_bits[c] | member_bits
+                        function_bits[child_component] |= function_bits[c]
+
+        for i, node in enumerate(self.nodes):
+            node.ancestor_nodes = AncestorSet(node_bits[component_of[i]], node_ids)
+            node.ancestor_functions = AncestorSet(
+                function_bits[component_of[i]], function_ids
+            )
 
-        # Check for cycles
-        if sum(in_degree.values()) > 0:
-            logger.warning("ADG contains possible cycles.")
+        if num_cycles:
+            logger.info(f"ADG contains {num_cycles} cycles, condensed for ancestors.")
@@ -0,0 +1,186 @@
+"""
+Module for planning and applying code instrumentation to a function's AST.
+
+This module defines the InstrumentationPlan class. Taint tracking and policy
+enforcement record the snippets to insert as (location, position, snippet) entries
+instead of mutating the AST directly, and the plan rewrites every affected statement
+list in a single pass once all entries are recorded.
+"""
+
+import ast
+from enum import Enum
+from typing import Dict, List, Optional, Set, Tuple
+
+from growlithe.graph.adg.statement_index import StatementIndex
+
+
+def get_referenced_names(tree: ast.AST) -> Set[str]:
+    """
+    Get the names a code tree reads, writes or declares global.
+
+    Args:
+        tree (ast.AST): The code tree.
+
+    Returns:
+        Set[str]: The referenced names.
+    """
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            names.add(node.id)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            names.update(node.names)
+    return names
+
+
+class InsertPosition(Enum):
+    BEFORE = "before"
+    AFTER = "after"
+
+
+class InstrumentationPlan:
+    """
+    Records code snippets to be inserted around statements of a function.
+
+    Snippets anchored to the same statement and position are emitted in the order they
+    were recorded, which keeps the instrumented code deterministic for a given order of
+    edges in the graph. Entries reference the anchors directly rather than by id, so a
+    plan pickled together with its code tree can be applied in another process.
+    """
+
+    def __init__(self, statement_index: StatementIndex):
+        """
+        Initialize an empty plan.
+
+        Args:
+            statement_index (StatementIndex): Index used to resolve code locations.
+        """
+        self.statement_index = statement_index
+        # id(statement list) -> (statement list, [(anchor, position, snippets)])
+        self.insertions: Dict[
+            int,
+            Tuple[
+                List[ast.stmt],
+                List[Tuple[Optional[ast.stmt], InsertPosition, List[str]]],
+            ],
+        ] = {}
+
+    def __len__(self):
+        return sum(
+            len(snippets)
+            for _, entries in self.insertions.values()
+            for _, _, snippets in entries
+        )
+
+    def add(
+        self,
+        statements: List[ast.stmt],
+        anchor: Optional[ast.stmt],
+        snippets: List[str],
+        position: InsertPosition = InsertPosition.BEFORE,
+    ):
+        """
+        Record snippets to be inserted next to a statement.
+
+        Args:
+            statements (list): The statement list containing the anchor.
+            anchor (ast.stmt): The statement to insert next to. If None, the snippets
+                are appended to the end of the statement list.
+            snippets (list): Python source snippets, in the order they should appear.
+            position (InsertPosition, optional): Insert before or after the anchor.
+        """
+        _, entries = self.insertions.setdefault(id(statements), (statements, []))
+        entries.append((anchor, position, list(snippets)))
+
+    def insert_at(
+        self,
+        code_path: dict,
+        snippets: List[str],
+        position: InsertPosition = InsertPosition.BEFORE,
+    ) -> bool:
+        """
+        Record snippets to be inserted next to the statement at a code location.
+
+        Args:
+            code_path (dict): SARIF location with physicalLocation.region.
+            snippets (list): Python source snippets, in the order they should appear.
+            position (InsertPosition, optional): Insert before or after the statement.
+
+        Returns:
+            bool: True if a statement was found at the code location.
+        """
+        location = self.statement_index.get_location(code_path)
+        if location is None:
+            return False
+        statements, _, statement = location
+        self.add(statements, statement, snippets, position)
+        return True
+
+    def get_statements(self) -> List[ast.stmt]:
+        """
+        Parse the recorded snippets, without inserting them.
+
+        Returns:
+            List[ast.stmt]: The statements of all recorded snippets.
+        """
+        return [
+            statement
+            for _, entries in self.insertions.values()
+            for _, _, snippets in entries
+            for statement in self.parse(snippets)
+        ]
+
+    def get_referenced_names(self) -> Set[str]:
+        """
+        Get the names referenced by the recorded snippets.
+
+        Returns:
+            Set[str]: The referenced names.
+        """
+        names = set()
+        for statement in self.get_statements():
+            names.update(get_referenced_names(statement))
+        return names
+
+    def insert_at_start(self, statements: List[ast.stmt], snippets: List[str]):
+        """
+        Record snippets to be inserted at the start of a statement list.
+
+        Args:
+            statements (list): A body of a module or compound statement.
+            snippets (list): Python source snippets, in the order they should appear.
+        """
+        self.add(statements, statements[0] if statements else None, snippets)
+
+    def apply(self):
+        """
+        Rewrite each affected statement list once, inserting all recorded snippets.
+
+        Statement lists are updated in place so references held by the statement
+        index stay valid. The plan is empty afterwards.
+        """
+        for statements, entries in self.insertions.values():
+            anchored: Dict[Tuple[Optional[int], InsertPosition], List[str]] = {}
+            for anchor, position, snippets in entries:
+                key = (id(anchor) if anchor is not None else None, position)
+                anchored.setdefault(key, []).extend(snippets)
+            rewritten = []
+            for statement in statements:
+                rewritten.extend(
+                    self.parse(anchored.get((id(statement), InsertPosition.BEFORE)))
+                )
+                rewritten.append(statement)
+                rewritten.extend(
+                    self.parse(anchored.get((id(statement), InsertPosition.AFTER)))
+                )
+            for position in InsertPosition:
+                rewritten.extend(self.parse(anchored.get((None, position))))
+            statements[:] = rewritten
+        self.insertions.clear()
+
+    @staticmethod
+    def parse(snippets: Optional[List[str]]) -> List[ast.stmt]:
+        statements = []
+        for snippet in snippets or []:
+            statements.extend(ast.parse(snippet).body)
+        return statements
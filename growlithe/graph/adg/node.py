@@ -6,6 +6,7 @@ in the graph structure of an application.
 """
 
 from itertools import count
+from growlithe.graph.adg.ancestors import AncestorSet
 
 from growlithe.graph.adg.resource import Resource
 from growlithe.graph.adg.types import Reference, ReferenceType, Scope, TaintLabelMatch
@@ -68,8 +69,8 @@ class Node:
 
         # Upstream nodes and functions in the ADG for a given node
         # Function of the current node will be included in the list
-        self.ancestor_nodes = set()  # Set of ancestor nodes
-        self.ancestor_functions = set()  # Set of ancestor functions
+        self.ancestor_nodes = AncestorSet()  # Set of ancestor nodes
+        self.ancestor_functions = AncestorSet()  # Set of ancestor functions
 
     def __hash__(self):
         """
@@ -111,12 +112,24 @@ class Node:
         """
         if type(node2) == str:
             return self.__repr__() == node2
+        return self.key == node2.key
+
+    @property
+    def key(self):
+        """
+        Canonical structural key of the node, used to deduplicate nodes in the graph.
+
+        Two nodes are equal iff their keys are equal.
+
+        Returns:
+            tuple: Hashable key of (resource, object_type, object, function, scope).
+        """
         return (
-            self.resource == node2.resource
-            and self.object_type == node2.object_type
-            and self.object == node2.object
-            and self.object_fn == node2.object_fn
-            and self.scope == node2.scope
+            self.resource.key,
+            self.object_type,
+            self.object.key,
+            self.object_fn,
+            self.scope,
         )
 
     def to_json(self):
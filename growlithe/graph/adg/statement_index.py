@@ -0,0 +1,139 @@
+"""
+Module for resolving SARIF code locations to statements in a function's AST.
+
+This module defines the StatementIndex class, which is built once per function and
+maps the line range of every statement to the statement list containing it, so that
+instrumentation passes do not need to walk the AST for every edge.
+"""
+
+import ast
+from typing import Dict, List, Optional, Tuple
+
+# Attributes of AST nodes that hold lists of statements
+STATEMENT_LIST_FIELDS = ("body", "orelse", "finalbody", "handlers", "cases")
+
+
+class StatementIndex:
+    """
+    Index from (start_line, end_line) of a statement to its location in the AST.
+
+    Each location is stored as the statement list containing the statement, the
+    position of the statement in that list when the index was built, and the
+    statement itself. Instrumentation only inserts new statements before existing
+    ones, so the current position is found by scanning forward from the stored one.
+    """
+
+    def __init__(self, tree):
+        """
+        Build the index by iteratively traversing all statement lists of the tree.
+
+        Args:
+            tree (ast.AST): The AST of the function's code.
+        """
+        self.locations: Dict[Tuple[int, int], Tuple[List[ast.stmt], int, ast.stmt]] = {}
+        self.function_defs: Dict[int, ast.FunctionDef] = {}
+        if isinstance(tree, ast.AST):
+            self.build(tree)
+
+    def build(self, tree: ast.AST):
+        """
+        Index statements in pre-order, so the outermost statement wins for a line range.
+
+        Args:
+            tree (ast.AST): The AST of the function's code.
+        """
+        stack = [iter(self.get_statement_lists(tree))]
+        while stack:
+            item = next(stack[-1], None)
+            if item is None:
+                stack.pop()
+                continue
+            statements, position = item
+            statement = statements[position]
+            key = (
+                getattr(statement, "lineno", None),
+                getattr(statement, "end_lineno", None),
+            )
+            self.locations.setdefault(key, (statements, position, statement))
+            if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                self.function_defs.setdefault(statement.lineno, statement)
+            stack.append(iter(self.get_statement_lists(statement)))
+
+    @staticmethod
+    def get_statement_lists(node: ast.AST):
+        """
+        Yield (statement list, position) for each statement directly nested in node.
+
+        Args:
+            node (ast.AST): A module, statement, exception handler or match case.
+        """
+        for field in STATEMENT_LIST_FIELDS:
+            children = getattr(node, field, None)
+            if not isinstance(children, list):
+                continue
+            for position, child in enumerate(children):
+                if isinstance(child, ast.stmt):
+                    yield children, position
+                elif isinstance(child, (ast.excepthandler, ast.match_case)):
+                    # Handlers and cases are not statements, index their bodies
+                    yield from StatementIndex.get_statement_lists(child)
+
+    def get_location(
+        self, code_path: dict
+    ) -> Optional[Tuple[List[ast.stmt], int, ast.stmt]]:
+        """
+        Find the indexed location of the statement at a code location.
+
+        Args:
+            code_path (dict): SARIF location with physicalLocation.region.
+
+        Returns:
+            tuple: (statement list, indexed position, statement), or None if no
+            statement matches.
+        """
+        region = code_path["physicalLocation"]["region"]
+        start_line = region["startLine"]
+        return self.locations.get((start_line, region.get("endLine", start_line)))
+
+    def locate(self, code_path: dict) -> Optional[Tuple[List[ast.stmt], int]]:
+        """
+        Find the statement list and current position of the statement at a code location.
+
+        Args:
+            code_path (dict): SARIF location with physicalLocation.region.
+
+        Returns:
+            tuple: (statement list, position), or None if no statement matches.
+        """
+        location = self.get_location(code_path)
+        if location is None:
+            return None
+        statements, position, statement = location
+        while statements[position] is not statement:
+            position += 1
+        return statements, position
+
+    def get_statement(self, code_path: dict) -> Optional[ast.stmt]:
+        """
+        Find the statement at a code location.
+
+        Args:
+            code_path (dict): SARIF location with physicalLocation.region.
+
+        Returns:
+            ast.stmt: The matching statement, or None if no statement matches.
+        """
+        location = self.get_location(code_path)
+        return location[2] if location else None
+
+    def get_function_def(self, lineno: int) -> Optional[ast.FunctionDef]:
+        """
+        Find the function definition starting at a given line.
+
+        Args:
+            lineno (int): Line number of the function definition.
+
+        Returns:
+            ast.FunctionDef: The function definition, or None if not found.
+        """
+        return self.function_defs.get(lineno)
@@ -98,6 +98,16 @@ class Reference:
             and self.reference_name == other.reference_name
         )
 
+    @property
+    def key(self) -> tuple:
+        """
+        Hashable key identifying the reference.
+
+        Returns:
+            tuple: Tuple of the reference type and reference name.
+        """
+        return (self.reference_type, self.reference_name)
+
 
 class TaintLabelMatch(Enum):
     """
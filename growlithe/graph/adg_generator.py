@@ -1,5 +1,6 @@
 import os
-from typing import List
+from collections import defaultdict
+from typing import Dict, List, Tuple
 from growlithe.graph.adg.edge import Edge, EdgeType
 from growlithe.graph.adg.graph import Graph
 from growlithe.graph.adg.node import Node
@@ -23,13 +24,7 @@ class GraphGenerator:
             os.path.join(self.config.growlithe_path, f"dataflows_{language}.sarif"),
             self.config,
         )
-        for function in functions:
-            function_dataflows = sarif_parser.get_results_for_function(function)
-            function.add_sarif_results(function_dataflows)
-            for result in function_dataflows:
-                sarif_parser.parse_sarif_result(
-                    result, self.graph, function, EdgeType.DATA
-                )
+        sarif_parser.parse_sarif_results(self.graph, functions, EdgeType.DATA)
 
     def add_inter_function_edges(self, resources: List[Resource]):
         function_pairs = []
@@ -49,8 +44,9 @@ class GraphGenerator:
                     logger.error(
                         f"{source.name}:{source.type} -> {target.name}:{target.type} is not supported."
                     )
+        global_nodes = self.index_global_nodes()
         for source, target in function_pairs:
-            self.add_potential_indirect_flows(source, target)
+            self.add_potential_indirect_flows(source, target, global_nodes)
         self.add_potential_resources(resources)
 
     def add_potential_resources(self, resources):
@@ -105,11 +101,7 @@ class GraphGenerator:
         ):
             edge_type = EdgeType.DATA
 
-        for function in functions:
-            function_metadataflows = sarif_parser.get_results_for_function(function)
-            # function.add_sarif_results(function_metadataflows)
-            for result in function_metadataflows:
-                sarif_parser.parse_sarif_result(result, self.graph, function, edge_type)
+        sarif_parser.parse_sarif_results(self.graph, functions, edge_type)
 
     def connect_functions(self, source: Function, target: Function):
         source_ret: Node = source.get_return_node()
@@ -143,39 +135,58 @@ class GraphGenerator:
                 else:
                     node.resource_attrs["potential_resources"] = [resource]
 
-    def add_potential_indirect_flows(self, source: Function, target: Function):
+    def index_global_nodes(self):
+        """
+        Index GLOBAL sink nodes by function, and GLOBAL source nodes by function and
+        potential resource, to join them in add_potential_indirect_flows.
+
+        Returns:
+            tuple: (sinks, sources) where sinks maps a function to its GLOBAL sink nodes
+            and sources maps (function, resource) to (position, node) of GLOBAL source
+            nodes, both in graph order.
+        """
+        sinks: Dict[Function, List[Node]] = defaultdict(list)
+        sources: Dict[Tuple[Function, Resource], List[Tuple[int, Node]]] = defaultdict(
+            list
+        )
+        for position, node in enumerate(self.graph.nodes):
+            if node.scope != Scope.GLOBAL:
+                continue
+            if node.is_sink:
+                sinks[node.object_fn].append(node)
+            if node.is_source:
+                # A resource may be listed more than once, index the node only once
+                for resource in dict.fromkeys(
+                    node.resource_attrs.get("potential_resources", [])
+                ):
+                    sources[(node.object_fn, resource)].append((position, node))
+        return sinks, sources
+
+    def add_potential_indirect_flows(
+        self, source: Function, target: Function, global_nodes=None
+    ):
         """
         Add indirect edges from all the nodes in the source function to all the nodes in the sink function that share potential resources.
         :param source: source function
         :param target: target function
+        :param global_nodes: index from index_global_nodes, built if not given
         """
-        for node1 in self.graph.nodes:
-            if (
-                node1.object_fn == source
-                and node1.scope == Scope.GLOBAL
-                and node1.is_sink
-            ):
-                for node2 in self.graph.nodes:
-                    if (
-                        node2.object_fn == target
-                        and node2.scope == Scope.GLOBAL
-                        and node2.is_source
-                    ):
-                        if (
-                            "potential_resources" in node1.resource_attrs
-                            and "potential_resources" in node2.resource_attrs
-                        ):
-                            for resource in node1.resource_attrs["potential_resources"]:
-                                if (
-                                    resource
-                                    in node2.resource_attrs["potential_resources"]
-                                ):
-                                    edge = Edge(
-                                        u=node1,
-                                        v=node2,
-                                        source_code_path=node1.object_code_location,
-                                        sink_code_path=node2.object_code_location,
-                                        function=source,
-                                        edge_type=EdgeType.INDIRECT,
-                                    )
-                                    self.graph.add_edge(edge)
+        sinks, sources = global_nodes or self.index_global_nodes()
+        for node1 in sinks.get(source, []):
+            if "potential_resources" not in node1.resource_attrs:
+                continue
+            # Hash join on the shared resource, deduplicating nodes matched by
+            # several resources and keeping the graph order of the source nodes
+            matches = {}
+            for resource in node1.resource_attrs["potential_resources"]:
+                matches.update(sources.get((target, resource), []))
+            for _, node2 in sorted(matches.items(), key=lambda match: match[0]):
+                edge = Edge(
+                    u=node1,
+                    v=node2,
+                    source_code_path=node1.object_code_location,
+                    sink_code_path=node2.object_code_location,
+                    function=source,
+                    edge_type=EdgeType.INDIRECT,
+                )
+                self.graph.add_edge(edge)
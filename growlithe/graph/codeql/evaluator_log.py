@@ -0,0 +1,159 @@
+"""
+Module for summarizing CodeQL evaluator logs into the Growlithe profiler log.
+
+CodeQL writes a structured log of the evaluation of every predicate when run with
+--evaluator-log. `codeql generate log-summary` condenses it to one JSON object per
+evaluated predicate, with its name, the query that caused its evaluation and its
+evaluation time, which is aggregated here per query and per QL module.
+"""
+
+import json
+import os
+import re
+import subprocess
+from collections import defaultdict
+from typing import Dict, Iterator
+
+from growlithe.common.logger import logger, profiler_logger
+
+# Predicate positions look like "/path/to/TaintAnalysis.qll:12,3-20,4"
+POSITION_PATTERN = re.compile(r"^(.*?\.qll?):\d")
+
+
+def summarize_evaluator_log(evaluator_log_path, summary_path):
+    """
+    Generate the per-predicate summary of a CodeQL evaluator log.
+
+    Args:
+        evaluator_log_path (str): Path of the log written with --evaluator-log.
+        summary_path (str): Path to write the summary to.
+
+    Returns:
+        bool: True if the summary was generated.
+    """
+    try:
+        process = subprocess.run(
+            [
+                "codeql",
+                "generate",
+                "log-summary",
+                "-q",
+                "--minify-output",
+                evaluator_log_path,
+                summary_path,
+            ],
+            stdout=subprocess.DEVNULL,
+        )
+    except Exception as e:
+        logger.warning(f"Could not summarize CodeQL evaluator log: {e}")
+        return False
+    if process.returncode != 0:
+        logger.warning(
+            f"Summarizing {evaluator_log_path} failed with exit code {process.returncode}"
+        )
+        return False
+    return True
+
+
+def iter_log_events(path) -> Iterator[dict]:
+    """
+    Iterate over the JSON objects of a log, minified one per line or pretty printed.
+
+    Args:
+        path (str): Path of the log.
+
+    Yields:
+        dict: Each logged object.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    position = 0
+    while True:
+        while position < len(content) and content[position].isspace():
+            position += 1
+        if position >= len(content):
+            return
+        event, position = decoder.raw_decode(content, position)
+        yield event
+
+
+def get_predicate_module(event) -> str:
+    """
+    Get the QL module a predicate was defined in.
+
+    Args:
+        event (dict): Summary of the evaluation of a predicate.
+
+    Returns:
+        str: Name of the module, from the file of the predicate without its extension,
+        or else from the first qualifier of the predicate name.
+    """
+    match = POSITION_PATTERN.match(event.get("position") or "")
+    if match:
+        return os.path.splitext(os.path.basename(match.group(1)))[0]
+    predicate_name = event.get("predicateName", "")
+    if "::" in predicate_name:
+        return predicate_name.split("::", 1)[0]
+    return "<unknown>"
+
+
+def aggregate_evaluator_summary(summary_path):
+    """
+    Aggregate the evaluation time of predicates per query and per module.
+
+    Args:
+        summary_path (str): Path of the summary from summarize_evaluator_log.
+
+    Returns:
+        dict: Maps each query file name to {"predicates": [(millis, name, result
+        size)] sorted by decreasing time, "modules": {module: millis}}.
+    """
+    queries: Dict[str, dict] = defaultdict(
+        lambda: {"predicates": [], "modules": defaultdict(int)}
+    )
+    for event in iter_log_events(summary_path):
+        millis = event.get("millis")
+        if millis is None or "predicateName" not in event:
+            continue
+        query = os.path.basename(event.get("queryCausingWork") or "<unknown>")
+        queries[query]["predicates"].append(
+            (millis, event["predicateName"], event.get("resultSize"))
+        )
+        queries[query]["modules"][get_predicate_module(event)] += millis
+    for query in queries.values():
+        query["predicates"].sort(key=lambda predicate: -predicate[0])
+    return queries
+
+
+def log_evaluator_summary(summary_path, top_predicates=10):
+    """
+    Write the most expensive modules and predicates of each query to the profiler log.
+
+    Args:
+        summary_path (str): Path of the summary from summarize_evaluator_log.
+        top_predicates (int, optional): Number of predicates logged per query.
+
+    Returns:
+        list: The logged lines.
+    """
+    lines = []
+    for query, summary in sorted(aggregate_evaluator_summary(summary_path).items()):
+        total = sum(summary["modules"].values())
+        lines.append(f"CodeQL query {query} evaluated in {total / 1000:.3f} seconds")
+        for module, millis in sorted(
+            summary["modules"].items(), key=lambda module: -module[1]
+        ):
+            lines.append(
+                f"CodeQL query {query} module {module}: {millis / 1000:.3f} seconds"
+            )
+        for millis, predicate_name, result_size in summary["predicates"][
+            :top_predicates
+        ]:
+            lines.append(
+                f"CodeQL query {query} predicate {predicate_name}: "
+                f"{millis / 1000:.3f} seconds, {result_size} tuples"
+            )
+    for line in lines:
+        profiler_logger.info(line)
+    return lines
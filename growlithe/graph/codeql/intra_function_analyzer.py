@@ -5,17 +5,51 @@ This module provides functionality to create CodeQL databases and run CodeQL que
 on application code.
 """
 
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import json
+import shutil
 import subprocess
 import pathlib
 import re
 import os
+import queue
+import tempfile
+import threading
+import yaml
+from itertools import groupby
 
 from growlithe.common.logger import logger
-from growlithe.common.dev_config import codeql_queries
-from growlithe.common.file_utils import get_language_files
+from growlithe.common.dev_config import (
+    CACHE_CODEQL_RESULTS,
+    CODEQL_MEMORY_BUDGET,
+    CODEQL_PARALLEL_SHARDS,
+    CODEQL_SHARD_SIZE,
+    CODEQL_THREAD_BUDGET,
+    CODEQL_BACKEND,
+    CODEQL_RESULT_CACHE_SIZE,
+    COMBINE_CODEQL_QUERIES,
+    KEEP_CODEQL_DISK_CACHE,
+    PROFILE_CODEQL_EVALUATION,
+    PROFILE_CODEQL_TOP_PREDICATES,
+    codeql_queries,
+)
+from growlithe.common.file_utils import get_language_files, hash_files
 from growlithe.common.utils import profiler_decorator
+from growlithe.graph.codeql.evaluator_log import (
+    log_evaluator_summary,
+    summarize_evaluator_log,
+)
+from growlithe.graph.codeql.query_server import get_query_server, get_query_servers
+from growlithe.graph.parsers.sarif_reader import SarifResultReader
 from growlithe.config import Config
 
+# Guards the result cache, shared by the analyzers of all languages and shards
+result_cache_lock = threading.Lock()
+
+# Version of the cached SARIF outputs, changed when their content changes
+RESULT_CACHE_FORMAT = 2
+
 
 class Analyzer:
     """
@@ -25,14 +59,21 @@ class Analyzer:
     for specific programming languages.
     """
 
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, memory=2048, threads=0, used_cache_paths=None):
         """
         Initialize the Analyzer with a configuration object.
 
         Args:
             config (Config): Configuration object containing analysis settings.
+            memory (int, optional): Memory in MB for each CodeQL process.
+            threads (int, optional): Threads for each CodeQL process, 0 for all CPUs.
+            used_cache_paths (set, optional): Result cache entries used by this run,
+                shared with the analyzer running it.
         """
         self.config = config
+        self.memory = memory
+        self.threads = threads
+        self.used_cache_paths = set() if used_cache_paths is None else used_cache_paths
 
     @profiler_decorator
     def create_codeql_database(self, language):
@@ -42,22 +83,116 @@ class Analyzer:
         Args:
             language (str): The programming language of the application.
 
+        The database is only recreated when the content of the source files differs
+        from the manifest saved when it was last created.
+
         Raises:
             Exception: If there's an error during database creation.
         """
+        manifest = self.get_source_manifest(language)
+        manifest_path = self.get_database_manifest_path(language)
+        if self.is_database_up_to_date(language, manifest):
+            logger.info(
+                f"Sources unchanged since codeql_ir_{language} was created, skipping database creation"
+            )
+            return
+
         logger.info(f"Creating CodeQL database in {self.config.growlithe_path}")
+        # Remove the stale manifest first, so an interrupted run is never reused
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+        if CODEQL_BACKEND == "query-server":
+            for query_server in get_query_servers():
+                query_server.deregister_database(self.get_database_path(language))
         try:
             # CodeQL database creation command
-            subprocess.run(
-                f"(cd {self.config.growlithe_path} && codeql database create codeql_ir_{language} --language={language} --overwrite -j=0 -M=2048 -s={self.config.app_path})",
+            process = subprocess.run(
+                f"(cd {self.config.growlithe_path} && codeql database create codeql_ir_{language} --language={language} --overwrite -j={self.threads} -M={self.memory} -s={self.config.app_path})",
                 shell=True,
                 stdout=subprocess.DEVNULL,
             )
         except Exception as e:
             logger.error(f"Error while creating CodeQL database: {e}")
             raise Exception(f"Error while creating CodeQL database: {e}")
+        if process.returncode != 0:
+            logger.error(
+                f"CodeQL database creation failed with exit code {process.returncode}"
+            )
+            return
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f, indent=2)
         logger.info(f"CodeQL database created: codeql_ir_{language}")
 
+    def get_database_path(self, language):
+        return os.path.join(self.config.growlithe_path, f"codeql_ir_{language}")
+
+    def copy_database(self, language, copy):
+        """
+        Copy the CodeQL database, along with its disk cache, for a concurrent analysis.
+
+        Args:
+            language (str): The programming language of the application.
+            copy (int): Index of the copy.
+
+        Returns:
+            str: Path of the copy.
+        """
+        copy_path = f"{self.get_database_path(language)}_copy{copy}"
+        if os.path.exists(copy_path):
+            shutil.rmtree(copy_path)
+        shutil.copytree(self.get_database_path(language), copy_path, symlinks=True)
+        return copy_path
+
+    def get_database_manifest_path(self, language):
+        return os.path.join(
+            self.config.growlithe_path, f"codeql_ir_{language}.manifest.json"
+        )
+
+    def get_source_manifest(self, language):
+        """
+        Describe the inputs of the CodeQL database for a language.
+
+        Args:
+            language (str): The programming language of the application.
+
+        Returns:
+            dict: Language, source root and content hash of each source file.
+        """
+        files = get_language_files(
+            root=self.config.app_path,
+            language=language,
+            src_dir=self.config.src_dir,
+            growlithe_path=self.config.growlithe_path,
+        )
+        return {
+            "language": language,
+            "source_root": self.config.app_path,
+            "files": hash_files(self.config.app_path, files),
+        }
+
+    def is_database_up_to_date(self, language, manifest):
+        """
+        Check if the CodeQL database was created from the same sources.
+
+        Args:
+            language (str): The programming language of the application.
+            manifest (dict): Manifest of the current sources.
+
+        Returns:
+            bool: True if the database exists and its manifest matches.
+        """
+        manifest_path = self.get_database_manifest_path(language)
+        if not os.path.isdir(self.get_database_path(language)) or not os.path.exists(
+            manifest_path
+        ):
+            return False
+        try:
+            with open(manifest_path, "r") as f:
+                return json.load(f) == manifest
+        except (OSError, ValueError):
+            logger.warning(f"Ignoring unreadable CodeQL manifest {manifest_path}")
+            return False
+
     @profiler_decorator
     def run_codeql_queries(self, language):
         """
@@ -69,7 +204,6 @@ class Analyzer:
         Raises:
             Exception: If there's an error during query execution.
         """
-        current_dir = pathlib.Path(__file__).parent.resolve()
         functions = get_language_files(
             root=self.config.app_path,
             language=language,
@@ -80,67 +214,843 @@ class Analyzer:
             f"Running CodeQL queries for {language} in {self.config.app_name}: {', '.join(codeql_queries)}"
         )
         logger.info(f"Analyzing functions for: {', '.join(functions)}")
-        update_query_config(current_dir, language, functions)
+        shards = partition_functions(functions, CODEQL_SHARD_SIZE)
+        if len(shards) > 1:
+            self.run_sharded_queries(language, shards)
+        else:
+            self.run_queries(language, functions)
+        logger.info(
+            f"CodeQL queries run successfully for {language} in {self.config.app_name}"
+        )
 
-        for query_file in codeql_queries:
-            query_output_path = os.path.join(
-                self.config.growlithe_path, f"{query_file}_{language}.sarif"
+    def run_sharded_queries(self, language, shards):
+        """
+        Run the CodeQL queries separately for each group of functions, in parallel, and
+        merge the SARIF outputs of the shards of each query.
+
+        CodeQL locks the disk cache of a database while evaluating queries on it, so
+        with the CLI backend each shard running at the same time gets its own copy of
+        the database. With the query server backend, all shards go through the one
+        query server, which evaluates them one at a time on the database.
+
+        Args:
+            language (str): The programming language of the application.
+            shards (list): Lists of functions analyzed together.
+        """
+        num_workers = min(len(shards), CODEQL_PARALLEL_SHARDS or os.cpu_count() or 1)
+        database_copies = []
+        if CODEQL_BACKEND == "query-server":
+            memory, threads = self.memory, self.threads
+            database_paths = [self.get_database_path(language)] * num_workers
+        else:
+            memory, threads = split_codeql_budget(
+                num_workers, self.memory, self.threads
             )
+            database_copies = [
+                self.copy_database(language, copy) for copy in range(1, num_workers)
+            ]
+            database_paths = [self.get_database_path(language)] + database_copies
+        shard_analyzer = Analyzer(
+            self.config,
+            memory=memory,
+            threads=threads,
+            used_cache_paths=self.used_cache_paths,
+        )
+        free_database_paths = queue.Queue()
+        for database_path in database_paths:
+            free_database_paths.put(database_path)
+
+        def run_shard(functions, shard):
+            database_path = free_database_paths.get()
             try:
-                # CodeQL query execution command
-                subprocess.run(
-                    [
-                        "codeql",
-                        "database",
-                        "analyze",
-                        "-q",
-                        "--output",
-                        query_output_path,
-                        "--format",
-                        "sarifv2.1.0",
-                        "--rerun",
-                        "-M",
-                        "2048",
-                        "--threads",
-                        "0",
-                        "--max-disk-cache",
-                        "0",
-                        os.path.join(
-                            self.config.growlithe_path,
-                            f"codeql_ir_{language}",
-                        ),
-                        os.path.join(
-                            current_dir, language, "queries", f"{query_file}.ql"
-                        ),
-                        "--warnings",
-                        "hide",
-                    ],
-                    stdout=subprocess.DEVNULL,
+                return shard_analyzer.run_queries(
+                    language, functions, shard, database_path
+                )
+            finally:
+                free_database_paths.put(database_path)
+
+        logger.info(
+            f"Running CodeQL queries for {language} in {len(shards)} shards, {num_workers} at a time"
+        )
+        try:
+            with ThreadPoolExecutor(max_workers=num_workers) as executor:
+                completed_shards = list(
+                    executor.map(run_shard, shards, range(len(shards)))
+                )
+        finally:
+            for database_copy in database_copies:
+                shutil.rmtree(database_copy, ignore_errors=True)
+
+        for query_file in codeql_queries:
+            if not all(query_file in completed for completed in completed_shards):
+                if any(query_file in completed for completed in completed_shards):
+                    logger.error(
+                        f"CodeQL query {query_file} failed for some shards, not merging its results"
+                    )
+                continue
+            query_output_path = self.get_query_output_path(language, query_file)
+            merge_sarif_results(
+                [
+                    self.get_query_output_path(language, query_file, shard)
+                    for shard in range(len(shards))
+                ],
+                query_output_path,
+            )
+            logger.info(
+                f"Merged CodeQL query output of {len(shards)} shards for {query_file} to {query_output_path}"
+            )
+
+    def run_queries(self, language, functions, shard=None, database_path=None):
+        """
+        Run the CodeQL queries for a list of functions, reusing cached results.
+
+        Args:
+            language (str): The programming language of the application.
+            functions (list): List of functions to be analyzed.
+            shard (int, optional): Index of the shard of functions, if sharded.
+            database_path (str, optional): Copy of the CodeQL database to evaluate the
+                queries on with the CLI backend, instead of the database itself.
+
+        Returns:
+            list: Names of the queries whose SARIF output was saved.
+        """
+        query_pack_path = self.prepare_query_pack(language, functions, shard)
+
+        query_pack_hash = hash_query_pack(query_pack_path)
+        completed_queries = []
+        pending_queries = []
+        for query_file in codeql_queries:
+            query_path = os.path.join(query_pack_path, "queries", f"{query_file}.ql")
+            if not os.path.exists(query_path):
+                logger.warning(f"No {query_file} query for {language}, skipping")
+                continue
+            query_output_path = self.get_query_output_path(language, query_file, shard)
+            cache_path = self.get_cached_results_path(
+                language, query_file, query_pack_hash, functions
+            )
+            if cache_path and self.load_cached_results(cache_path, query_output_path):
+                logger.info(
+                    f"Reused cached CodeQL query output for {query_file} from {cache_path}"
+                )
+                completed_queries.append(query_file)
+                continue
+            pending_queries.append((query_file, query_path, cache_path))
+
+        if not pending_queries:
+            return completed_queries
+        if CODEQL_BACKEND == "query-server":
+            # The query server keeps shared predicates cached between queries
+            evaluated_queries = [
+                (query_file, query_path, cache_path)
+                for query_file, query_path, cache_path in pending_queries
+                if self.evaluate_with_query_server(
+                    language, query_file, query_path, shard
                 )
-            except Exception as e:
-                logger.error(f"Error while running CodeQL queries: {e}")
-                raise Exception(f"Error while running CodeQL queries: {e}")
+            ]
+        elif COMBINE_CODEQL_QUERIES and len(pending_queries) > 1:
+            # Evaluate all queries together so their shared predicates are evaluated once
+            combined_output_path = self.get_query_output_path(
+                language, "queries", shard
+            )
+            if not self.analyze_database(
+                language,
+                [query_path for _, query_path, _ in pending_queries],
+                combined_output_path,
+                database_path,
+            ):
+                return completed_queries
+            split_sarif_results(
+                combined_output_path,
+                {
+                    get_query_id(query_path): self.get_query_output_path(
+                        language, query_file, shard
+                    )
+                    for query_file, query_path, _ in pending_queries
+                },
+            )
+            evaluated_queries = pending_queries
+        else:
+            evaluated_queries = [
+                (query_file, query_path, cache_path)
+                for query_file, query_path, cache_path in pending_queries
+                if self.analyze_database(
+                    language,
+                    [query_path],
+                    self.get_query_output_path(language, query_file, shard),
+                    database_path,
+                )
+            ]
+
+        for query_file, _, cache_path in evaluated_queries:
+            query_output_path = self.get_query_output_path(language, query_file, shard)
+            if shard is None:
+                # Merged shards are in this order, so nodes and edges get the same ids
+                sort_sarif_results(query_output_path)
+            if cache_path:
+                self.store_cached_results(query_output_path, cache_path)
             logger.info(
                 f"Saved CodeQL query output for {query_file} to {query_output_path}"
             )
-        logger.info(
-            f"CodeQL queries run successfully for {language} in {self.config.app_name}"
+            completed_queries.append(query_file)
+        return completed_queries
+
+    def prepare_query_pack(self, language, functions, shard=None):
+        """
+        Generate the query pack of this analysis in growlithe_path.
+
+        The installed query pack of the language is copied, with Config.qll listing the
+        functions to analyze, so concurrent analyses of different apps never write to
+        the installed package.
+
+        Args:
+            language (str): The programming language of the application.
+            functions (list): List of functions to be analyzed.
+            shard (int, optional): Index of the shard of functions, if sharded.
+
+        Returns:
+            str: Path of the generated query pack.
+        """
+        query_pack_path = self.get_query_pack_path(language, shard)
+        if os.path.exists(query_pack_path):
+            shutil.rmtree(query_pack_path)
+        shutil.copytree(
+            os.path.join(pathlib.Path(__file__).parent.resolve(), language),
+            query_pack_path,
+            ignore=shutil.ignore_patterns("__pycache__"),
+        )
+        update_query_config(query_pack_path, functions)
+        return query_pack_path
+
+    def get_query_pack_path(self, language, shard=None):
+        return os.path.join(
+            self.config.growlithe_path,
+            f"codeql_queries_{language}{get_shard_suffix(shard)}",
+        )
+
+    def analyze_database(self, language, query_paths, output_path, database_path=None):
+        """
+        Evaluate queries on the CodeQL database in a single codeql invocation.
+
+        Args:
+            language (str): The programming language of the application.
+            query_paths (list): Paths of the .ql files to evaluate.
+            output_path (str): Path of the SARIF output with the results of all queries.
+            database_path (str, optional): Copy of the CodeQL database to evaluate the
+                queries on, instead of the database itself.
+
+        Returns:
+            bool: True if CodeQL succeeded.
+
+        Raises:
+            Exception: If CodeQL can not be run.
+        """
+        evaluator_log_options = []
+        if PROFILE_CODEQL_EVALUATION:
+            evaluator_log_path = (
+                f"{os.path.splitext(output_path)[0]}.evaluator-log.json"
+            )
+            evaluator_log_options = ["--evaluator-log", evaluator_log_path]
+        try:
+            # CodeQL query execution command
+            process = subprocess.run(
+                [
+                    "codeql",
+                    "database",
+                    "analyze",
+                    "-q",
+                    "--output",
+                    output_path,
+                    "--format",
+                    "sarifv2.1.0",
+                    *get_cache_options(),
+                    "-M",
+                    str(self.memory),
+                    "--threads",
+                    str(self.threads),
+                    *evaluator_log_options,
+                    database_path or self.get_database_path(language),
+                    *query_paths,
+                    "--warnings",
+                    "hide",
+                ],
+                stdout=subprocess.DEVNULL,
+            )
+        except Exception as e:
+            logger.error(f"Error while running CodeQL queries: {e}")
+            raise Exception(f"Error while running CodeQL queries: {e}")
+        if process.returncode != 0:
+            logger.error(
+                f"CodeQL queries {', '.join(query_paths)} failed with exit code {process.returncode}"
+            )
+            return False
+        if PROFILE_CODEQL_EVALUATION:
+            summary_path = f"{os.path.splitext(evaluator_log_path)[0]}.summary.json"
+            if summarize_evaluator_log(evaluator_log_path, summary_path):
+                log_evaluator_summary(summary_path, PROFILE_CODEQL_TOP_PREDICATES)
+        return True
+
+    def evaluate_with_query_server(self, language, query_file, query_path, shard=None):
+        """
+        Evaluate a query with the shared CodeQL query server and interpret its results.
+
+        Args:
+            language (str): The programming language of the application.
+            query_file (str): Name of the query.
+            query_path (str): Path of the .ql file.
+            shard (int, optional): Index of the shard of functions, if sharded.
+
+        Returns:
+            bool: True if the SARIF output of the query was written.
+        """
+        bqrs_path = os.path.join(
+            self.config.growlithe_path,
+            f"{query_file}_{language}{get_shard_suffix(shard)}.bqrs",
+        )
+        query_pack_path = str(pathlib.Path(query_path).parents[1])
+        if not get_query_server(self.memory, self.threads).run_query(
+            self.get_database_path(language),
+            query_path,
+            bqrs_path,
+            [query_pack_path],
+        ):
+            return False
+        metadata = get_query_metadata(query_path)
+        try:
+            process = subprocess.run(
+                [
+                    "codeql",
+                    "bqrs",
+                    "interpret",
+                    "-q",
+                    "--format",
+                    "sarifv2.1.0",
+                    "--output",
+                    self.get_query_output_path(language, query_file, shard),
+                    *[f"-t={key}={value}" for key, value in metadata.items()],
+                    # Relative URIs, as database analyze reports them
+                    f"--source-archive={self.get_source_archive_path(language)}",
+                    f"--source-location-prefix={self.get_source_location_prefix(language)}",
+                    bqrs_path,
+                ],
+                stdout=subprocess.DEVNULL,
+            )
+        except Exception as e:
+            logger.error(f"Error while interpreting CodeQL results: {e}")
+            raise Exception(f"Error while interpreting CodeQL results: {e}")
+        if process.returncode != 0:
+            logger.error(
+                f"Interpreting {bqrs_path} failed with exit code {process.returncode}"
+            )
+            return False
+        return True
+
+    def get_source_archive_path(self, language):
+        database_path = self.get_database_path(language)
+        source_archive_path = os.path.join(database_path, "src.zip")
+        if os.path.exists(source_archive_path):
+            return source_archive_path
+        return os.path.join(database_path, "src")
+
+    def get_source_location_prefix(self, language):
+        """
+        Source root the database was created from, which SARIF URIs are relative to.
+
+        Args:
+            language (str): The programming language of the application.
+
+        Returns:
+            str: The sourceLocationPrefix of the database, or the app path if the
+            database metadata can not be read.
+        """
+        metadata_path = os.path.join(
+            self.get_database_path(language), "codeql-database.yml"
+        )
+        try:
+            with open(metadata_path, "r") as f:
+                return yaml.safe_load(f)["sourceLocationPrefix"]
+        except (OSError, KeyError, TypeError, yaml.YAMLError):
+            logger.warning(
+                f"Could not read sourceLocationPrefix from {metadata_path}, using the app path"
+            )
+            return self.config.app_path
+
+    def get_query_output_path(self, language, query_file, shard=None):
+        return os.path.join(
+            self.config.growlithe_path,
+            f"{query_file}_{language}{get_shard_suffix(shard)}.sarif",
+        )
+
+    def get_result_cache_dir(self):
+        return os.path.join(self.config.growlithe_path, "codeql_result_cache")
+
+    def get_database_fingerprint(self, language):
+        """
+        Fingerprint of the CodeQL database, from the manifest saved when it was created.
+
+        Args:
+            language (str): The programming language of the application.
+
+        Returns:
+            str: Hex digest of the manifest, or None if the database has no manifest.
+        """
+        manifest_path = self.get_database_manifest_path(language)
+        if not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def get_cached_results_path(self, language, query_file, query_pack_hash, functions):
+        """
+        Path of the cached SARIF output of a query, keyed on everything that affects it.
+
+        Args:
+            language (str): The programming language of the application.
+            query_file (str): Name of the query.
+            query_pack_hash (str): Hash of the query pack, from hash_query_pack.
+            functions (list): Functions the queries are restricted to.
+
+        Returns:
+            str: Path of the cache entry, or None if results can not be cached.
+        """
+        if not CACHE_CODEQL_RESULTS:
+            return None
+        database_fingerprint = self.get_database_fingerprint(language)
+        if database_fingerprint is None:
+            logger.info(
+                f"No manifest for codeql_ir_{language}, CodeQL results will not be cached"
+            )
+            return None
+        key = hashlib.sha256(
+            json.dumps(
+                [
+                    RESULT_CACHE_FORMAT,
+                    database_fingerprint,
+                    query_pack_hash,
+                    query_file,
+                    sorted(functions),
+                ]
+            ).encode("utf-8")
+        ).hexdigest()
+        return os.path.join(
+            self.get_result_cache_dir(), f"{query_file}_{language}_{key}.sarif"
         )
 
+    def load_cached_results(self, cache_path, query_output_path):
+        """
+        Copy a cache entry to the SARIF output of a query, marking it recently used.
+
+        Args:
+            cache_path (str): Path of the cache entry.
+            query_output_path (str): Path of the SARIF output of the query.
+
+        Returns:
+            bool: True if the entry was in the cache.
+        """
+        with result_cache_lock:
+            try:
+                shutil.copyfile(cache_path, query_output_path)
+                os.utime(cache_path)
+            except FileNotFoundError:
+                # Not cached, or evicted by another process
+                return False
+            self.used_cache_paths.add(cache_path)
+        return True
+
+    def store_cached_results(self, query_output_path, cache_path):
+        """
+        Copy a SARIF output into the result cache, evicting the least recently used
+        entries. Entries used by this run are kept, and not counted in
+        CODEQL_RESULT_CACHE_SIZE, so a run never evicts its own results.
+
+        Args:
+            query_output_path (str): Path of the SARIF output produced by CodeQL.
+            cache_path (str): Path of the cache entry.
+        """
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        # Copy then rename, so a partially written entry is never read
+        tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        shutil.copyfile(query_output_path, tmp_path)
+        with result_cache_lock:
+            os.replace(tmp_path, cache_path)
+            self.used_cache_paths.add(cache_path)
+            entries = []
+            for entry in os.scandir(self.get_result_cache_dir()):
+                if entry.name.endswith(".tmp") or entry.path in self.used_cache_paths:
+                    continue
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:
+                    continue
+            entries.sort()
+            for _, path in entries[: max(0, len(entries) - CODEQL_RESULT_CACHE_SIZE)]:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    # Evicted by another process
+                    pass
+
+
+def split_codeql_budget(num_pipelines, memory=None, threads=None):
+    """
+    Split the CodeQL memory and thread budgets between concurrent pipelines.
+
+    Args:
+        num_pipelines (int): Number of CodeQL pipelines running at the same time.
+        memory (int, optional): Memory budget in MB, CODEQL_MEMORY_BUDGET by default.
+        threads (int, optional): Thread budget, CODEQL_THREAD_BUDGET by default.
+
+    Returns:
+        tuple: Memory in MB and threads for each pipeline, 0 threads for all CPUs.
+    """
+    num_pipelines = max(1, num_pipelines)
+    memory = (CODEQL_MEMORY_BUDGET if memory is None else memory) // num_pipelines
+    threads = CODEQL_THREAD_BUDGET if threads is None else threads
+    if num_pipelines > 1:
+        threads = max(1, (threads or os.cpu_count() or 1) // num_pipelines)
+    return memory, threads
+
+
+def get_shard_suffix(shard):
+    return "" if shard is None else f"_shard{shard}"
+
+
+def partition_functions(functions, shard_size):
+    """
+    Partition the functions to analyze into consecutive groups.
+
+    Args:
+        functions (list): List of functions to be analyzed.
+        shard_size (int): Maximum number of functions per group, 0 for a single group.
+
+    Returns:
+        list: Lists of functions.
+    """
+    if shard_size <= 0 or len(functions) <= shard_size:
+        return [functions]
+    return [
+        functions[start : start + shard_size]
+        for start in range(0, len(functions), shard_size)
+    ]
+
+
+def get_query_metadata(query_path):
+    """
+    Read the metadata tags (@kind, @id, ...) from the leading comment of a query.
+
+    Args:
+        query_path (str): Path of the .ql file.
+
+    Returns:
+        dict: Maps each tag name, without @, to its value.
+    """
+    with open(query_path, "r") as f:
+        match = re.match(r"\s*/\*\*(.*?)\*/", f.read(), re.DOTALL)
+    if not match:
+        return {}
+    return dict(re.findall(r"@([\w-]+)\s+([^\n]*?)\s*$", match.group(1), re.MULTILINE))
+
+
+def get_query_id(query_path):
+    """
+    Read the @id metadata of a query, which CodeQL reports as the ruleId of its results.
+
+    Args:
+        query_path (str): Path of the .ql file.
+
+    Returns:
+        str: The query id.
+
+    Raises:
+        Exception: If the query has no @id metadata.
+    """
+    query_id = get_query_metadata(query_path).get("id")
+    if not query_id:
+        logger.error(f"Could not find @id in {query_path}")
+        raise Exception(f"Could not find @id in {query_path}")
+    return query_id
+
+
+class SpooledResults:
+    """
+    SARIF results kept in a temporary file, so only one is in memory at a time.
+    """
+
+    def __init__(self):
+        self.file = tempfile.TemporaryFile()
+        self.entries = []  # Sort key and offset of each result
+
+    def append(self, result, sort_key=None):
+        self.entries.append((sort_key, self.file.tell()))
+        self.file.write(json.dumps(result).encode("utf-8") + b"\n")
+
+    def sort(self, tie_breaker=None):
+        """
+        Sort the results by their sort keys.
+
+        Args:
+            tie_breaker (callable, optional): Key of the results with equal sort keys,
+                only computed for them, reading them back from the file.
+        """
+        self.entries.sort(key=lambda entry: entry[0])
+        if tie_breaker is None:
+            return
+        entries = []
+        for _, group in groupby(self.entries, key=lambda entry: entry[0]):
+            group = list(group)
+            if len(group) > 1:
+                group.sort(key=lambda entry: tie_breaker(self.read(entry[1])))
+            entries.extend(group)
+        self.entries = entries
+
+    def read(self, offset):
+        self.file.seek(offset)
+        return json.loads(self.file.readline())
+
+    def __iter__(self):
+        for _, offset in self.entries:
+            yield self.read(offset)
+
+    def close(self):
+        self.file.close()
+
+
+def write_sarif(output_path, metadata, runs, run_results):
+    """
+    Write a SARIF output, one result at a time.
+
+    Args:
+        output_path (str): Path of the SARIF output.
+        metadata (dict): Top-level values of the output, except runs.
+        runs (list): Values of each run, except results.
+        run_results (list): Iterable over the results of each run.
+    """
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write("{")
+        for key, value in metadata.items():
+            f.write(f"{json.dumps(key)}: {json.dumps(value)}, ")
+        f.write('"runs": [')
+        for run_index, (run, results) in enumerate(zip(runs, run_results)):
+            f.write(", {" if run_index else "{")
+            for key, value in run.items():
+                f.write(f"{json.dumps(key)}: {json.dumps(value)}, ")
+            f.write('"results": [')
+            for result_index, result in enumerate(results):
+                if result_index:
+                    f.write(", ")
+                json.dump(result, f)
+            f.write("]}")
+        f.write("]}")
+
+
+def split_sarif_results(sarif_path, output_paths):
+    """
+    Split a SARIF output of several queries into one SARIF output per query.
+
+    Each output keeps the runs of the combined output, with only the results and
+    rules of its query. Results are streamed to a temporary file per output and run,
+    so the combined output is never loaded whole.
+
+    Args:
+        sarif_path (str): Path of the combined SARIF output.
+        output_paths (dict): Maps each query id to the path of its SARIF output.
+    """
+    reader = SarifResultReader(sarif_path, keep_metadata=True)
+    spools = {query_id: [] for query_id in output_paths}
+    try:
+        for result in reader:
+            query_id = result.get("ruleId", result.get("rule", {}).get("id"))
+            if query_id not in spools:
+                continue
+            while len(spools[query_id]) <= reader.run_index:
+                spools[query_id].append(SpooledResults())
+            # Rule indices of the results refer to the rules of the combined run
+            result.get("rule", {}).pop("index", None)
+            result.pop("ruleIndex", None)
+            spools[query_id][reader.run_index].append(result)
+
+        for query_id, output_path in output_paths.items():
+            runs = []
+            for run in reader.runs:
+                driver = run.get("tool", {}).get("driver")
+                if driver and "rules" in driver:
+                    rules = [
+                        rule for rule in driver["rules"] if rule.get("id") == query_id
+                    ]
+                    run = {
+                        **run,
+                        "tool": {**run["tool"], "driver": {**driver, "rules": rules}},
+                    }
+                runs.append(run)
+            run_results = spools[query_id]
+            run_results += [[]] * (len(runs) - len(run_results))
+            write_sarif(output_path, reader.metadata, runs, run_results)
+    finally:
+        for query_spools in spools.values():
+            for spool in query_spools:
+                spool.close()
+
+
+def merge_sarif_results(sarif_paths, output_path):
+    """
+    Merge the SARIF outputs of a query evaluated on different shards of functions.
+
+    The runs of the shards are merged by position. Artifacts are deduplicated by URI
+    and the artifact indices of the results are renumbered accordingly. Results are
+    deduplicated and sorted by location and message, so the merged output does not
+    depend on how the functions were sharded. Results are streamed from the shards
+    to a temporary file per run, and only their locations and digests are kept in
+    memory. Messages are only read back for results at the same location.
+
+    Args:
+        sarif_paths (list): Paths of the SARIF outputs of the shards.
+        output_path (str): Path of the merged SARIF output.
+    """
+    metadata, merged_runs, spools = None, [], []
+    try:
+        for sarif_path in sarif_paths:
+            # Artifacts may follow the results, so the values of the runs are read first
+            metadata_reader = SarifResultReader(sarif_path, keep_metadata=True)
+            for _ in metadata_reader:
+                pass
+            runs = metadata_reader.runs
+            if metadata is None:
+                metadata = metadata_reader.metadata
+                merged_runs = [{**run, "artifacts": []} for run in runs]
+                artifact_indices = [{} for _ in merged_runs]
+                seen_results = [set() for _ in merged_runs]
+                spools = [SpooledResults() for _ in merged_runs]
+            for merged_run, run, indices in zip(merged_runs, runs, artifact_indices):
+                for artifact in run.get("artifacts", []):
+                    uri = artifact.get("location", {}).get("uri")
+                    if uri not in indices:
+                        indices[uri] = len(merged_run["artifacts"])
+                        merged_run["artifacts"].append(artifact)
+
+            reader = SarifResultReader(sarif_path)
+            for result in reader:
+                if reader.run_index >= len(spools):
+                    continue
+                reindex_artifacts(
+                    result,
+                    runs[reader.run_index].get("artifacts", []),
+                    artifact_indices[reader.run_index],
+                )
+                key = hashlib.sha256(
+                    json.dumps(result, sort_keys=True).encode("utf-8")
+                ).digest()
+                if key not in seen_results[reader.run_index]:
+                    seen_results[reader.run_index].add(key)
+                    spools[reader.run_index].append(result, get_result_location(result))
+        for merged_run, spool in zip(merged_runs, spools):
+            spool.sort(
+                tie_breaker=lambda result: result.get("message", {}).get("text", "")
+            )
+            if not merged_run["artifacts"]:
+                del merged_run["artifacts"]
+        write_sarif(output_path, metadata or {}, merged_runs, spools)
+    finally:
+        for spool in spools:
+            spool.close()
+
+
+def sort_sarif_results(sarif_path):
+    """
+    Put the results of a SARIF output in the order merge_sarif_results gives them.
+
+    Args:
+        sarif_path (str): Path of the SARIF output, replaced by the sorted output.
+    """
+    sorted_path = f"{sarif_path}.sorted.tmp"
+    merge_sarif_results([sarif_path], sorted_path)
+    os.replace(sorted_path, sarif_path)
+
+
+def reindex_artifacts(value, artifacts, indices):
+    """
+    Renumber the artifact indices of artifactLocation objects nested in a value.
+
+    Args:
+        value: Part of a SARIF result.
+        artifacts (list): Artifacts of the run the result comes from.
+        indices (dict): Maps artifact URIs to their index in the merged run.
+    """
+    if isinstance(value, list):
+        for item in value:
+            reindex_artifacts(item, artifacts, indices)
+    elif isinstance(value, dict):
+        location = value.get("artifactLocation")
+        if isinstance(location, dict) and "index" in location:
+            index = location["index"]
+            uri = location.get("uri")
+            if uri is None and 0 <= index < len(artifacts):
+                uri = artifacts[index].get("location", {}).get("uri")
+            if uri in indices:
+                location["index"] = indices[uri]
+            else:
+                del location["index"]
+        for item in value.values():
+            reindex_artifacts(item, artifacts, indices)
+
+
+def get_result_location(result):
+    location = result.get("locations", [{}])[0].get("physicalLocation", {})
+    region = location.get("region", {})
+    return (
+        location.get("artifactLocation", {}).get("uri", ""),
+        region.get("startLine", 0),
+        region.get("startColumn", 0),
+    )
+
+
+def get_cache_options():
+    """
+    CodeQL options controlling its evaluation cache.
+
+    Returns:
+        list: Options forcing a fresh evaluation, unless KEEP_CODEQL_DISK_CACHE is set.
+    """
+    if KEEP_CODEQL_DISK_CACHE:
+        return []
+    return ["--rerun", "--max-disk-cache", "0"]
+
+
+def hash_query_pack(query_pack_path):
+    """
+    Hash the content of all query and library files of a query pack.
+
+    Args:
+        query_pack_path (str): Directory containing qlpack.yml for a language.
+
+    Returns:
+        str: Hex digest over the relative paths and contents of .ql/.qll files.
+    """
+    digest = hashlib.sha256()
+    for dir_path, dir_names, files in os.walk(query_pack_path):
+        dir_names.sort()
+        for file in sorted(files):
+            if not file.endswith((".ql", ".qll")):
+                continue
+            path = os.path.join(dir_path, file)
+            relative_path = os.path.relpath(path, query_pack_path).replace(os.sep, "/")
+            digest.update(relative_path.encode("utf-8") + b"\0")
+            with open(path, "rb") as f:
+                digest.update(f.read())
+            digest.update(b"\0")
+    return digest.hexdigest()
+
 
-def update_query_config(current_dir, language, functions):
+def update_query_config(query_pack_path, functions):
     """
     Update the CodeQL query configuration file with the list of functions to analyze.
 
     Args:
-        current_dir (str): The current directory path.
-        language (str): The programming language of the application.
+        query_pack_path (str): Directory of the query pack containing queries/Config.qll.
         functions (list): List of functions to be analyzed.
 
     Raises:
         Exception: If the result variable is not found in the Config.qll file.
     """
-    codeql_config_path = os.path.join(current_dir, language, "queries", "Config.qll")
+    codeql_config_path = os.path.join(query_pack_path, "queries", "Config.qll")
     with open(codeql_config_path, "r") as file:
         config_template = file.read()
 
@@ -0,0 +1,254 @@
+"""
+Module for evaluating CodeQL queries through a long-lived CodeQL query server.
+
+The query server (codeql execute query-server2) keeps its JVM, the registered
+databases and its evaluation cache in memory between queries, so repeated analyses
+of the same database do not pay for them on every query. It speaks JSON-RPC over
+stdin/stdout, with each message preceded by a Content-Length header.
+"""
+
+import atexit
+import json
+import subprocess
+import threading
+
+from growlithe.common.logger import logger
+
+QUERY_SERVER_COMMAND = ["codeql", "execute", "query-server2"]
+
+# resultType of a successful evaluation/runQuery request
+QUERY_RESULT_SUCCESS = 0
+
+# Query servers of this process, by memory and thread budget
+_query_servers = {}
+_query_servers_lock = threading.Lock()
+
+
+class QueryServer:
+    """
+    Client for a CodeQL query server process, started on the first request.
+    """
+
+    def __init__(self, command=None, memory=2048, threads=0):
+        """
+        Initialize the client.
+
+        Args:
+            command (list, optional): Command starting the query server, overriding
+                QUERY_SERVER_COMMAND with the budget options.
+            memory (int, optional): Memory in MB of the query server.
+            threads (int, optional): Threads of the query server, 0 for all CPUs.
+        """
+        self.command = command or [
+            *QUERY_SERVER_COMMAND,
+            "--threads",
+            str(threads),
+            "-M",
+            str(memory),
+        ]
+        self.process = None
+        self.next_request_id = 0
+        self.databases = set()
+        # Serializes requests of concurrent analyses, the server handles one at a time
+        self.lock = threading.RLock()
+
+    def start(self):
+        if self.process is not None and self.process.poll() is None:
+            return
+        logger.info(f"Starting CodeQL query server: {' '.join(self.command)}")
+        self.process = subprocess.Popen(
+            self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        self.databases = set()
+
+    def close(self):
+        """
+        Stop the query server process, if it is running.
+        """
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            self.process.stdin.close()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.process = None
+        self.databases = set()
+
+    def send_message(self, message):
+        body = json.dumps(message).encode("utf-8")
+        self.process.stdin.write(f"Content-Length: {len(body)}\r\n\r\n".encode("ascii"))
+        self.process.stdin.write(body)
+        self.process.stdin.flush()
+
+    def read_message(self):
+        content_length = None
+        while True:
+            line = self.process.stdout.readline()
+            if not line:
+                raise EOFError("CodeQL query server exited")
+            line = line.strip()
+            if not line:
+                break
+            name, _, value = line.decode("ascii").partition(":")
+            if name.lower() == "content-length":
+                content_length = int(value)
+        return json.loads(self.process.stdout.read(content_length))
+
+    def request(self, method, body):
+        """
+        Send a request to the query server and wait for its response.
+
+        Args:
+            method (str): JSON-RPC method name.
+            body (dict): Parameters of the request.
+
+        Returns:
+            The result of the request.
+
+        Raises:
+            Exception: If the query server fails or returns an error.
+        """
+        with self.lock:
+            return self.send_request(method, body)
+
+    def send_request(self, method, body):
+        self.start()
+        self.next_request_id += 1
+        request_id = self.next_request_id
+        try:
+            self.send_message(
+                {
+                    "jsonrpc": "2.0",
+                    "id": request_id,
+                    "method": method,
+                    "params": {"body": body, "progressId": request_id},
+                }
+            )
+            while True:
+                message = self.read_message()
+                if message.get("id") == request_id and "method" not in message:
+                    break
+                if "method" in message and "id" in message:
+                    # The client does not serve any requests from the server
+                    self.send_message(
+                        {
+                            "jsonrpc": "2.0",
+                            "id": message["id"],
+                            "error": {"code": -32601, "message": "Method not found"},
+                        }
+                    )
+        except (OSError, EOFError, ValueError) as e:
+            # The server state is unknown, the next request starts a new one
+            self.close()
+            logger.error(f"Error while communicating with CodeQL query server: {e}")
+            raise Exception(f"Error while communicating with CodeQL query server: {e}")
+        if "error" in message:
+            logger.error(f"CodeQL query server {method} failed: {message['error']}")
+            raise Exception(f"CodeQL query server {method} failed: {message['error']}")
+        return message.get("result")
+
+    def register_database(self, database_path):
+        """
+        Register a database with the query server, if it is not registered yet.
+
+        Args:
+            database_path (str): Path of the CodeQL database.
+        """
+        with self.lock:
+            self.start()
+            if database_path in self.databases:
+                return
+            self.request(
+                "evaluation/registerDatabases",
+                {"databases": [{"dbDir": database_path, "workingSet": "default"}]},
+            )
+            self.databases.add(database_path)
+
+    def deregister_database(self, database_path):
+        """
+        Deregister a database, so it can be recreated while the server runs.
+
+        Args:
+            database_path (str): Path of the CodeQL database.
+        """
+        with self.lock:
+            if database_path not in self.databases:
+                return
+            self.request(
+                "evaluation/deregisterDatabases",
+                {"databases": [{"dbDir": database_path, "workingSet": "default"}]},
+            )
+            self.databases.discard(database_path)
+
+    def run_query(self, database_path, query_path, output_path, additional_packs):
+        """
+        Evaluate a query on a database.
+
+        Args:
+            database_path (str): Path of the CodeQL database.
+            query_path (str): Path of the .ql file.
+            output_path (str): Path of the BQRS file to write the results to.
+            additional_packs (list): Directories searched for the query pack.
+
+        Returns:
+            bool: True if the query was evaluated successfully.
+        """
+        self.register_database(database_path)
+        result = self.request(
+            "evaluation/runQuery",
+            {
+                "db": database_path,
+                "queryPath": query_path,
+                "outputPath": output_path,
+                "additionalPacks": additional_packs,
+                "externalInputs": {},
+                "singletonExternalInputs": {},
+                "target": {"query": {}},
+            },
+        )
+        if result.get("resultType") != QUERY_RESULT_SUCCESS:
+            logger.error(
+                f"CodeQL query server failed to run {query_path}: {result.get('message')}"
+            )
+            return False
+        logger.info(
+            f"CodeQL query server evaluated {query_path} in {result.get('evaluationTime')} ms"
+        )
+        return True
+
+
+def get_query_server(memory=2048, threads=0):
+    """
+    Get the query server shared by the analyses of this process with the same CodeQL
+    budget, as split between concurrent pipelines by split_codeql_budget.
+
+    Args:
+        memory (int, optional): Memory in MB of the query server.
+        threads (int, optional): Threads of the query server, 0 for all CPUs.
+
+    Returns:
+        QueryServer: The shared query server client.
+    """
+    with _query_servers_lock:
+        if (memory, threads) not in _query_servers:
+            query_server = QueryServer(memory=memory, threads=threads)
+            atexit.register(query_server.close)
+            _query_servers[(memory, threads)] = query_server
+        return _query_servers[(memory, threads)]
+
+
+def get_query_servers():
+    """
+    Get the query servers of this process, whatever their budget.
+
+    Returns:
+        list: The query server clients.
+    """
+    with _query_servers_lock:
+        return list(_query_servers.values())
@@ -0,0 +1,512 @@
+"""
+Module for persisting Application Dependency Graphs (ADG) between analyze and apply.
+
+The graph is stored as a zip archive with one compact JSON document per section
+(manifest, resources, functions, nodes, edges and app_config). Each table section is
+stored column-wise, references between objects are stored as row indices, and
+sections are only decoded when read. Function ASTs are not stored, they are re-read
+from the function sources on first use, and the application config parser is
+rebuilt from the application template.
+"""
+
+import json
+import zipfile
+from itertools import count
+from typing import Dict, List, Optional
+
+from growlithe.common.logger import logger
+from growlithe.common.utils import profiler_decorator
+from growlithe.config import Config
+from growlithe.enforcement.policy.policy_enforcer import Policy
+from growlithe.graph.adg.edge import Edge, EdgeType
+from growlithe.graph.adg.function import Function
+from growlithe.graph.adg.graph import Graph
+from growlithe.graph.adg.node import Node
+from growlithe.graph.adg.resource import Resource, ResourceType
+from growlithe.graph.adg.types import Reference, ReferenceType, Scope
+from growlithe.graph.parsers.sam import SAMParser
+from growlithe.graph.parsers.terraform import TerraformParser
+
+FORMAT_NAME = "growlithe-graph"
+FORMAT_VERSION = 1
+
+# Marker for references to resources inside free-form attributes of nodes
+RESOURCE_REF = "$resource"
+
+
+def to_columns(rows: List[dict], columns: List[str]) -> Dict[str, list]:
+    """Convert a list of row dicts to a dict of columns."""
+    return {column: [row[column] for row in rows] for column in columns}
+
+
+def find_unencodable(value, path: str = "") -> Optional[tuple]:
+    """
+    Find a value of a section that can not be stored in a graph store.
+
+    Args:
+        value: Section or part of a section to search.
+        path (str, optional): Path of value within the section.
+
+    Returns:
+        tuple: Path and value of the first unencodable value, None if there is none.
+    """
+    if isinstance(value, dict):
+        items = ((f"{path}.{key}" if path else str(key), v) for key, v in value.items())
+    elif isinstance(value, (list, tuple, set)):
+        items = ((f"{path}[{i}]", v) for i, v in enumerate(value))
+    elif isinstance(value, (str, int, float, bool, Resource)) or value is None:
+        return None
+    else:
+        return path, value
+    for item_path, item in items:
+        found = find_unencodable(item, item_path)
+        if found:
+            return found
+    return None
+
+
+def to_rows(table: Dict[str, list]) -> List[dict]:
+    """Convert a dict of columns back to a list of row dicts."""
+    columns = list(table.keys())
+    return [dict(zip(columns, values)) for values in zip(*table.values())]
+
+
+class GraphStoreWriter:
+    """
+    Encodes a graph into the sections of a graph store.
+    """
+
+    def __init__(self, graph: Graph):
+        self.graph = graph
+        self.resources: List[Resource] = []
+        self.resource_ids: Dict[int, int] = {}
+        self.node_ids: Dict[int, int] = {
+            id(node): i for i, node in enumerate(graph.nodes)
+        }
+        for resource in graph.resources:
+            self.resource_id(resource)
+        for function in graph.functions:
+            self.resource_id(function)
+
+    def resource_id(self, resource: Optional[Resource]) -> Optional[int]:
+        """Row of a resource in the resources section, adding it if not seen yet."""
+        if resource is None:
+            return None
+        if id(resource) not in self.resource_ids:
+            self.resource_ids[id(resource)] = len(self.resources)
+            self.resources.append(resource)
+        return self.resource_ids[id(resource)]
+
+    def encode_attrs(self, value):
+        """JSON default hook for node attributes, which may reference resources."""
+        if isinstance(value, Resource):
+            return {RESOURCE_REF: self.resource_id(value)}
+        if isinstance(value, set):
+            return sorted(value)
+        raise TypeError(
+            f"Object of type {type(value).__name__} is not JSON serializable"
+        )
+
+    def dumps(self, section) -> bytes:
+        """
+        Encode a section of the store.
+
+        Raises:
+            TypeError: If an attribute can not be stored, naming the attribute.
+        """
+        try:
+            return json.dumps(
+                section, separators=(",", ":"), default=self.encode_attrs
+            ).encode("utf-8")
+        except TypeError as e:
+            found = find_unencodable(section)
+            if found is None:
+                raise
+            path, value = found
+            raise TypeError(
+                f"Attribute {path} of type {type(value).__name__} "
+                "can not be stored in the graph store"
+            ) from e
+
+    def encode_nodes(self) -> Dict[str, list]:
+        rows = [
+            {
+                "node_id": node.node_id,
+                "resource": [
+                    node.resource.reference_type.value,
+                    node.resource.reference_name,
+                ],
+                "object": [
+                    node.object.reference_type.value,
+                    node.object.reference_name,
+                ],
+                "object_type": node.object_type,
+                "object_handler": node.object_handler,
+                "object_code_location": node.object_code_location,
+                "function": self.resource_id(node.object_fn),
+                "object_attrs": node.object_attrs,
+                "resource_attrs": node.resource_attrs,
+                "scope": node.scope.value,
+                "mapped_resource": self.resource_id(node.mapped_resource),
+            }
+            for node in self.graph.nodes
+        ]
+        return to_columns(
+            rows,
+            [
+                "node_id",
+                "resource",
+                "object",
+                "object_type",
+                "object_handler",
+                "object_code_location",
+                "function",
+                "object_attrs",
+                "resource_attrs",
+                "scope",
+                "mapped_resource",
+            ],
+        )
+
+    def encode_edges(self) -> Dict[str, list]:
+        rows = [
+            {
+                "edge_id": edge.edge_id,
+                "source": self.node_ids[id(edge.source)],
+                "sink": self.node_ids[id(edge.sink)],
+                "source_code_path": edge.source_code_path,
+                "sink_code_path": edge.sink_code_path,
+                "function": self.resource_id(edge.function),
+                "edge_type": edge.edge_type.value,
+                # Policies are stored as text, and whether they are bound to the node
+                "read_policy": [
+                    str(edge.read_policy),
+                    edge.read_policy.node is not None,
+                ],
+                "write_policy": [
+                    str(edge.write_policy),
+                    edge.write_policy.node is not None,
+                ],
+            }
+            for edge in self.graph.edges + self.graph.metadata_edges
+        ]
+        return to_columns(
+            rows,
+            [
+                "edge_id",
+                "source",
+                "sink",
+                "source_code_path",
+                "sink_code_path",
+                "function",
+                "edge_type",
+                "read_policy",
+                "write_policy",
+            ],
+        )
+
+    def encode_functions(self) -> Dict[str, list]:
+        rows = [
+            {
+                "resource": self.resource_id(function),
+                "runtime": function.runtime,
+                "function_path": function.function_path,
+                "growlithe_function_path": function.growlithe_function_path,
+                "iam_policies": function.iam_policies,
+            }
+            for function in self.resources
+            if isinstance(function, Function)
+        ]
+        return to_columns(
+            rows,
+            [
+                "resource",
+                "runtime",
+                "function_path",
+                "growlithe_function_path",
+                "iam_policies",
+            ],
+        )
+
+    def encode_resources(self) -> Dict[str, list]:
+        rows = []
+        # Dependencies may add resources that are not in the graph, so iterate by index
+        i = 0
+        while i < len(self.resources):
+            resource = self.resources[i]
+            rows.append(
+                {
+                    "name": resource.name,
+                    "type": resource.type.value if resource.type else None,
+                    "metadata": resource.metadata,
+                    "dependencies": [
+                        self.resource_id(dependency)
+                        for dependency in resource.dependencies
+                    ],
+                    "trigger": self.resource_id(resource.trigger),
+                    "trigger_type": (
+                        resource.trigger_type.value if resource.trigger_type else None
+                    ),
+                    "policy_actions": sorted(resource.policy_actions),
+                    "deployed_region": resource.deployed_region,
+                }
+            )
+            i += 1
+        return to_columns(
+            rows,
+            [
+                "name",
+                "type",
+                "metadata",
+                "dependencies",
+                "trigger",
+                "trigger_type",
+                "policy_actions",
+                "deployed_region",
+            ],
+        )
+
+    def encode(self, app_config: Optional[dict]) -> Dict[str, bytes]:
+        """
+        Encode all sections of the store.
+
+        Args:
+            app_config (dict, optional): Type and path of the application template.
+
+        Returns:
+            dict: Section name to encoded JSON document.
+        """
+        # Nodes and edges first, as they may reference resources outside the graph
+        nodes = self.dumps(self.encode_nodes())
+        edges = self.dumps(self.encode_edges())
+        resources = self.dumps(self.encode_resources())
+        functions = self.dumps(self.encode_functions())
+        graph = {
+            "name": self.graph.name,
+            "resources": [self.resource_id(r) for r in self.graph.resources],
+            "functions": [self.resource_id(f) for f in self.graph.functions],
+        }
+        manifest = {
+            "format": FORMAT_NAME,
+            "version": FORMAT_VERSION,
+            "graph": graph,
+            "app_config": app_config,
+        }
+        return {
+            "manifest": self.dumps(manifest),
+            "resources": resources,
+            "functions": functions,
+            "nodes": nodes,
+            "edges": edges,
+        }
+
+
+@profiler_decorator
+def dump_graph(graph: Graph, store_path: str, app_config_parser=None):
+    """
+    Write a graph and a reference to its application template to a graph store.
+
+    Args:
+        graph (Graph): The graph to store.
+        store_path (str): Path of the graph store archive.
+        app_config_parser (optional): SAMParser or TerraformParser of the application.
+    """
+    app_config = None
+    if app_config_parser is not None:
+        app_config = {
+            "type": type(app_config_parser).__name__,
+            "path": app_config_parser.sam_file,
+        }
+    sections = GraphStoreWriter(graph).encode(app_config)
+    with zipfile.ZipFile(store_path, "w", compression=zipfile.ZIP_DEFLATED) as store:
+        for name, data in sections.items():
+            store.writestr(f"{name}.json", data)
+    logger.info("Saved graph store to %s", store_path)
+
+
+class GraphStore:
+    """
+    Reader for a graph store, decoding each section only when it is first needed.
+    """
+
+    def __init__(self, store_path: str):
+        """
+        Open a graph store and validate its format version.
+
+        Args:
+            store_path (str): Path of the graph store archive.
+
+        Raises:
+            ValueError: If the file is not a graph store of a supported version.
+        """
+        self.store_path = store_path
+        self.sections: Dict[str, object] = {}
+        self.resources: Optional[List[Resource]] = None
+        self.nodes: Optional[List[Node]] = None
+        if not zipfile.is_zipfile(store_path):
+            self.raise_error("not a graph store, run growlithe analyze again")
+        manifest = self.read_section("manifest")
+        if manifest.get("format") != FORMAT_NAME:
+            self.raise_error("not a graph store, run growlithe analyze again")
+        if manifest.get("version") != FORMAT_VERSION:
+            self.raise_error(
+                f"unsupported version {manifest.get('version')}, "
+                "run growlithe analyze again"
+            )
+        self.manifest = manifest
+
+    def raise_error(self, message: str):
+        logger.error(f"Invalid graph store {self.store_path}: {message}")
+        raise ValueError(f"Invalid graph store {self.store_path}: {message}")
+
+    def read_section(self, name: str, object_hook=None):
+        """
+        Read and decode a section of the store, caching the result.
+
+        Args:
+            name (str): Name of the section.
+            object_hook (callable, optional): Hook passed to json.loads.
+
+        Returns:
+            The decoded section.
+        """
+        if name not in self.sections:
+            with zipfile.ZipFile(self.store_path) as store:
+                data = store.read(f"{name}.json")
+            self.sections[name] = json.loads(data, object_hook=object_hook)
+        return self.sections[name]
+
+    def load_resources(self) -> List[Resource]:
+        """
+        Load all resources and functions. Function ASTs are read lazily from source.
+
+        Returns:
+            list: Resources, in the order of the resources section.
+        """
+        if self.resources is not None:
+            return self.resources
+        rows = to_rows(self.read_section("resources"))
+        functions = {
+            row["resource"]: row for row in to_rows(self.read_section("functions"))
+        }
+        resources = []
+        for i, row in enumerate(rows):
+            resource_type = ResourceType(row["type"]) if row["type"] else None
+            if i in functions:
+                function_row = functions[i]
+                resource = Function(
+                    name=row["name"],
+                    type=resource_type,
+                    runtime=function_row["runtime"],
+                    function_path=function_row["function_path"],
+                    growlithe_function_path=function_row["growlithe_function_path"],
+                    metadata=row["metadata"],
+                    deployed_region=row["deployed_region"],
+                )
+                resource.iam_policies = function_row["iam_policies"]
+            else:
+                resource = Resource(
+                    name=row["name"],
+                    type=resource_type,
+                    metadata=row["metadata"],
+                    deployed_region=row["deployed_region"],
+                )
+            resource.policy_actions = set(row["policy_actions"])
+            resources.append(resource)
+        for resource, row in zip(resources, rows):
+            resource.dependencies = [resources[i] for i in row["dependencies"]]
+            if row["trigger"] is not None:
+                resource.trigger = resources[row["trigger"]]
+            if row["trigger_type"] is not None:
+                resource.trigger_type = ResourceType(row["trigger_type"])
+        self.resources = resources
+        return resources
+
+    def decode_attrs(self, value: dict):
+        """JSON object hook restoring references to resources in node attributes."""
+        if len(value) == 1 and RESOURCE_REF in value:
+            return self.resources[value[RESOURCE_REF]]
+        return value
+
+    @profiler_decorator
+    def load_graph(self) -> Graph:
+        """
+        Rebuild the graph, keeping the node and edge ids assigned during analysis.
+
+        Returns:
+            Graph: The stored graph. Ancestors are not stored and are recomputed by
+            Graph.populate_ancestors.
+        """
+        resources = self.load_resources()
+        graph_info = self.manifest["graph"]
+        graph = Graph(graph_info["name"])
+        graph.add_resources([resources[i] for i in graph_info["resources"]])
+        graph.add_functions([resources[i] for i in graph_info["functions"]])
+
+        nodes = []
+        for row in to_rows(self.read_section("nodes", object_hook=self.decode_attrs)):
+            node = Node(
+                Reference(ReferenceType(row["resource"][0]), row["resource"][1]),
+                Reference(ReferenceType(row["object"][0]), row["object"][1]),
+                row["object_type"],
+                row["object_handler"],
+                row["object_code_location"],
+                resources[row["function"]] if row["function"] is not None else None,
+                row["object_attrs"],
+                row["resource_attrs"],
+                Scope(row["scope"]),
+            )
+            node.node_id = row["node_id"]
+            if row["mapped_resource"] is not None:
+                node.mapped_resource = resources[row["mapped_resource"]]
+            nodes.append(graph.add_node(node))
+
+        edges = []
+        for row in to_rows(self.read_section("edges")):
+            source, sink = nodes[row["source"]], nodes[row["sink"]]
+            edge = Edge(
+                source,
+                sink,
+                row["source_code_path"],
+                row["sink_code_path"],
+                resources[row["function"]] if row["function"] is not None else None,
+                EdgeType(row["edge_type"]),
+            )
+            edge.edge_id = row["edge_id"]
+            read_policy, read_bound = row["read_policy"]
+            write_policy, write_bound = row["write_policy"]
+            edge.read_policy = Policy(
+                "READ", read_policy, source if read_bound else None
+            )
+            edge.write_policy = Policy(
+                "WRITE", write_policy, sink if write_bound else None
+            )
+            edges.append(graph.add_edge(edge))
+
+        # Nodes or edges created after loading must not reuse stored ids
+        Node._id_generator = count(
+            max((node.node_id for node in nodes), default=-1) + 1
+        )
+        Edge._id_generator = count(
+            max((edge.edge_id for edge in edges), default=-1) + 1
+        )
+        self.nodes = nodes
+        return graph
+
+    def load_app_config_parser(self, config: Config):
+        """
+        Rebuild the parser of the application template the graph was generated from.
+
+        Args:
+            config (Config): Current configuration, used for paths of the parser.
+
+        Returns:
+            SAMParser or TerraformParser, or None if no template was stored.
+        """
+        app_config = self.manifest["app_config"]
+        if app_config is None:
+            return None
+        parsers = {"SAMParser": SAMParser, "TerraformParser": TerraformParser}
+        if app_config["type"] not in parsers:
+            self.raise_error(f"unsupported app config parser {app_config['type']}")
+        return parsers[app_config["type"]](app_config["path"], config)
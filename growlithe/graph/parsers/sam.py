@@ -10,6 +10,7 @@ import ast
 
 from typing import List
 from cfn_flip import load_yaml, yaml_dumper
+from growlithe.common.dev_config import MINIMIZE_RUNTIME_LIBRARY
 from growlithe.common.file_utils import get_file_extension
 from growlithe.common.utils import profiler_decorator
 from growlithe.config import Config
@@ -235,7 +236,7 @@ class SAMParser:
 
     def modify_config(self, graph: Graph):
         self.fix_function_names()
-        self.add_lambda_layer()
+        self.add_lambda_layer(graph)
         self.add_iam_roles(graph)
         self.add_resource_policies(graph)
 
@@ -293,8 +294,7 @@ class SAMParser:
     def add_iam_roles(self, graph: Graph):
         for node in graph.nodes:
             if node.scope == Scope.GLOBAL:
-                tree = node.object_fn.code_tree
-                method = self.extract_method(tree=tree, node=node)
+                method = self.extract_method(node=node)
                 iam_policy = self.generate_iam_policy(method, node)
                 node.object_fn.iam_policies.append(iam_policy)
         for function in graph.functions:
@@ -337,44 +337,34 @@ class SAMParser:
                     "Fn::GetAtt": [f"{function.name}Role", "Arn"]
                 }
 
-    def extract_method(self, tree, node: Node, method=None):
+    def extract_method(self, node: Node):
         """
-        Extracts the method name from the given AST tree and node.
+        Extracts the method name called at the statement of the given node.
 
         Args:
-            tree (AST): The AST tree to search for the method.
             node (Node): The node representing the method.
-            method (str, optional): The extracted method name. Defaults to None.
 
         Returns:
             str: The extracted method name.
         """
-        start_line = node.object_code_location["physicalLocation"]["region"][
-            "startLine"
-        ]
-        end_line = node.object_code_location["physicalLocation"]["region"].get(
-            "endLine", start_line
+        method = None
+        ast_node = node.object_fn.statement_index.get_statement(
+            node.object_code_location
         )
-        if getattr(tree, "body", None):
-            for ast_node in tree.body:
-                if (
-                    getattr(ast_node, "lineno", None) == start_line
-                    and getattr(ast_node, "end_lineno", None) == end_line
-                ):
-                    if node.object_type == "S3_BUCKET":
-                        method = ast_node.value.func.attr
-                    elif node.object_type == "DYNAMODB_TABLE":
-                        if isinstance(ast_node.value, ast.Call):
-                            method = ast_node.value.func.attr
-                        elif isinstance(ast_node.value, ast.Subscript):
-                            method = ast_node.value.value.func.attr
-                        else:
-                            raise NotImplementedError
-                    elif node.object_type == "LAMBDA_INVOKE":
-                        method = ast_node.value.func.attr
-                    else:
-                        raise NotImplementedError
-                method = self.extract_method(ast_node, node, method=method)
+        if ast_node is not None:
+            if node.object_type == "S3_BUCKET":
+                method = ast_node.value.func.attr
+            elif node.object_type == "DYNAMODB_TABLE":
+                if isinstance(ast_node.value, ast.Call):
+                    method = ast_node.value.func.attr
+                elif isinstance(ast_node.value, ast.Subscript):
+                    method = ast_node.value.value.func.attr
+                else:
+                    raise NotImplementedError
+            elif node.object_type == "LAMBDA_INVOKE":
+                method = ast_node.value.func.attr
+            else:
+                raise NotImplementedError
         return method
 
     def generate_iam_policy(self, method, node: Node):
@@ -419,16 +409,32 @@ class SAMParser:
             ],
         }
 
-    def add_lambda_layer(self):
+    def add_lambda_layer(self, graph: Graph):
         """
         Adds the pydatalog lambda layer to the parsed YAML.
 
         This method copies the existing layer to the growlithe folder, then adds a new layer to the parsed YAML under the key "GrowlithePyDatalogLayer".
-        Additionally, it adds the "GrowlithePyDatalogLayer" to the "Layers" property of all the lambda function resources.
+        Additionally, it adds the "GrowlithePyDatalogLayer" to the "Layers" property of the lambda function resources asking pyDatalog at runtime,
+        or of all of them if MINIMIZE_RUNTIME_LIBRARY is disabled. No layer is added if no function needs it.
+
+        Parameters:
+            graph (Graph): The graph of the application, with instrumented functions.
 
         Returns:
         - None
         """
+        layer_functions = {
+            function.name
+            for function in graph.functions
+            if not MINIMIZE_RUNTIME_LIBRARY
+            or (
+                function.runtime.startswith("python")
+                and "pyDatalog" in function.get_referenced_names()
+            )
+        }
+        if not layer_functions:
+            logger.info("No function asks pyDatalog at runtime, skipping its layer")
+            return
         self.copy_layer()
         self.parsed_yaml["Resources"]["GrowlithePyDatalogLayer"] = {
             "Type": "AWS::Serverless::LayerVersion",
@@ -440,8 +446,11 @@ class SAMParser:
                 "CompatibleRuntimes": ["python3.10", "python3.9", "python3.8"],
             },
         }
-        for _, resource_details in self.parsed_yaml["Resources"].items():
-            if resource_details["Type"] == "AWS::Serverless::Function":
+        for resource_name, resource_details in self.parsed_yaml["Resources"].items():
+            if (
+                resource_details["Type"] == "AWS::Serverless::Function"
+                and resource_name in layer_functions
+            ):
                 if not "Layers" in resource_details["Properties"].keys():
                     resource_details["Properties"]["Layers"] = []
                 resource_details["Properties"]["Layers"].append(
@@ -463,6 +472,7 @@ class SAMParser:
             shutil.copy(self.config.pydatalog_layer_path, destination)
         else:
             logger.warning(f"No zip found at {self.config.pydatalog_layer_path}")
+
     def save_config(self):
         """
         Save the updated configuration to a YAML file in the growlithe folder.
@@ -1,5 +1,5 @@
-from typing import List
-from sarif import loader
+from collections import defaultdict
+from typing import Dict, Iterator, List
 import os
 import re
 
@@ -10,31 +10,51 @@ from growlithe.graph.adg.graph import Graph
 from growlithe.graph.adg.node import Node
 from growlithe.graph.adg.resource import Resource
 from growlithe.graph.adg.types import InterfaceType, Reference, ReferenceType, Scope
+from growlithe.graph.parsers.sarif_reader import iter_sarif_results
 from growlithe.common.logger import logger
 
 
 class SarifParser:
     def __init__(self, sarif_output_path, config):
         self.sarif_output_path = sarif_output_path
-        self.results = loader.load_sarif_file(sarif_output_path).get_results()
         self.config: Config = config
+        self._uri_paths: Dict[str, str] = {}  # Normalize each artifact URI only once
 
-    def get_results_for_function(self, function: Function):
-        function_path = os.path.abspath(function.function_path)
-
-        return [
-            result
-            for result in self.results
-            if os.path.abspath(
-                os.path.join(
-                    self.config.app_path,
-                    result["locations"][0]["physicalLocation"]["artifactLocation"][
-                        "uri"
-                    ],
-                )
+    def iter_results(self) -> Iterator[dict]:
+        """
+        Lazily iterate over the SARIF results without loading the whole file.
+        """
+        return iter_sarif_results(self.sarif_output_path)
+
+    def get_result_path(self, result) -> str:
+        uri = result["locations"][0]["physicalLocation"]["artifactLocation"]["uri"]
+        if uri not in self._uri_paths:
+            self._uri_paths[uri] = os.path.abspath(
+                os.path.join(self.config.app_path, uri)
             )
-            == function_path
-        ]
+        return self._uri_paths[uri]
+
+    def parse_sarif_results(
+        self, graph: Graph, functions: List[Function], edge_type: EdgeType
+    ):
+        """
+        Stream all SARIF results into the graph, one result at a time.
+
+        Each result is parsed for every function defined in the artifact it was
+        reported in, and is released once parsed.
+
+        Args:
+            graph (Graph): Graph to add the parsed nodes and edges to.
+            functions (List[Function]): Functions to parse results for.
+            edge_type (EdgeType): Type of the edges created from the results.
+        """
+        functions_by_path = defaultdict(list)
+        for function in functions:
+            functions_by_path[os.path.abspath(function.function_path)].append(function)
+
+        for result in self.iter_results():
+            for function in functions_by_path.get(self.get_result_path(result), []):
+                self.parse_sarif_result(result, graph, function, edge_type)
 
     def parse_sarif_result(self, result, graph: Graph, function: Function, edge_type):
         related_locations = result["relatedLocations"]
@@ -0,0 +1,187 @@
+"""
+Incremental reader for SARIF files produced by CodeQL.
+
+SARIF outputs for large applications can be hundreds of MB. Instead of loading the
+whole document, SarifResultReader walks the top-level JSON structure and decodes the
+entries of every runs[*].results array one at a time, so memory usage is bounded by
+the size of a single result rather than the size of the file.
+"""
+
+import json
+from typing import Iterator
+
+from growlithe.common.logger import logger
+
+JSON_WHITESPACE = " \t\n\r"
+NUMBER_DELIMITERS = JSON_WHITESPACE + ",]}"
+
+
+class SarifResultReader:
+    """
+    Generator based reader that yields SARIF results one at a time.
+
+    Only the runs[*].results arrays are streamed, sibling values (tool information,
+    artifacts, etc.) are decoded and discarded one value at a time, unless they are
+    kept as metadata.
+    """
+
+    def __init__(
+        self, sarif_path: str, chunk_size: int = 1 << 20, keep_metadata: bool = False
+    ):
+        """
+        Initialize the reader.
+
+        Args:
+            sarif_path (str): Path to the SARIF file.
+            chunk_size (int, optional): Number of characters read from the file at a time.
+            keep_metadata (bool, optional): Keep the values other than results. Once
+                iterated, they are in metadata for the document and in runs for each
+                run.
+        """
+        self.sarif_path = sarif_path
+        self.chunk_size = chunk_size
+        self.keep_metadata = keep_metadata
+        self.metadata = {}  # Top-level values of the document, except runs
+        self.runs = []  # Values of each run, except results
+        self.run_index = -1  # Index of the run of the last result yielded
+        self.decoder = json.JSONDecoder()
+        self.file = None
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def __iter__(self) -> Iterator[dict]:
+        """
+        Iterate over all results in all runs of the SARIF file.
+
+        Yields:
+            dict: A single SARIF result object.
+        """
+        with open(self.sarif_path, "r", encoding="utf-8") as self.file:
+            self.buffer, self.pos, self.eof = "", 0, False
+            self.metadata, self.runs, self.run_index = {}, [], -1
+            self.expect("{")
+            for key in self.iter_object_keys():
+                if key == "runs":
+                    self.expect("[")
+                    for _ in self.iter_array_items():
+                        self.run_index += 1
+                        self.runs.append({})
+                        yield from self.iter_run_results()
+                else:
+                    self.read_metadata(self.metadata, key)
+
+    def iter_run_results(self) -> Iterator[dict]:
+        self.expect("{")
+        for key in self.iter_object_keys():
+            if key == "results":
+                self.expect("[")
+                for _ in self.iter_array_items():
+                    yield self.decode_value()
+            else:
+                self.read_metadata(self.runs[-1], key)
+
+    def iter_object_keys(self) -> Iterator[str]:
+        """Yield keys of the current object, the caller must consume each value."""
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.decode_value()
+            self.expect(":")
+            yield key
+            separator = self.next_char()
+            if separator == "}":
+                return
+            if separator != ",":
+                self.raise_error(f"Expected ',' or '}}' but found {separator!r}")
+
+    def iter_array_items(self) -> Iterator[None]:
+        """Yield once per item of the current array, the caller must consume each item."""
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield
+            separator = self.next_char()
+            if separator == "]":
+                return
+            if separator != ",":
+                self.raise_error(f"Expected ',' or ']' but found {separator!r}")
+
+    def read_metadata(self, metadata: dict, key: str):
+        value = self.decode_value()
+        if self.keep_metadata:
+            metadata[key] = value
+
+    def decode_value(self):
+        """Decode the next complete JSON value, reading more of the file as needed."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A number cut at the buffer boundary decodes as a shorter number,
+                # so it is only complete once followed by a delimiter
+                if self.eof or (
+                    end < len(self.buffer)
+                    and (
+                        not isinstance(value, (int, float))
+                        or self.buffer[end] in NUMBER_DELIMITERS
+                    )
+                ):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.read_chunk()
+
+    def expect(self, char: str):
+        found = self.next_char()
+        if found != char:
+            self.raise_error(f"Expected {char!r} but found {found!r}")
+
+    def next_char(self) -> str:
+        char = self.peek()
+        self.pos += 1
+        return char
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it."""
+        while True:
+            while (
+                self.pos < len(self.buffer) and self.buffer[self.pos] in JSON_WHITESPACE
+            ):
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if self.eof:
+                self.raise_error("Unexpected end of file")
+            self.read_chunk()
+
+    def read_chunk(self):
+        # Drop the consumed prefix so the buffer only holds the value being decoded
+        self.buffer = self.buffer[self.pos :]
+        self.pos = 0
+        chunk = self.file.read(max(self.chunk_size, len(self.buffer)))
+        if chunk:
+            self.buffer += chunk
+        else:
+            self.eof = True
+
+    def raise_error(self, message: str):
+        logger.error(f"Invalid SARIF file {self.sarif_path}: {message}")
+        raise ValueError(f"Invalid SARIF file {self.sarif_path}: {message}")
+
+
+def iter_sarif_results(sarif_path: str) -> Iterator[dict]:
+    """
+    Lazily iterate over the results of a SARIF file.
+
+    Args:
+        sarif_path (str): Path to the SARIF file.
+
+    Returns:
+        Iterator[dict]: Iterator over SARIF result objects.
+    """
+    return iter(SarifResultReader(sarif_path))
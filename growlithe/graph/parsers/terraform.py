@@ -157,8 +157,7 @@ class TerraformParser:
     def add_iam_roles(self, graph: Graph):
         for node in graph.nodes:
             if node.scope == Scope.GLOBAL:
-                tree = node.object_fn.code_tree
-                method = self.extract_method(tree=tree, node=node)
+                method = self.extract_method(node=node)
                 iam_policy = self.generate_iam_policy(method, node)
                 node.object_fn.iam_policies.append(iam_policy)
         for function in graph.functions:
@@ -203,39 +202,29 @@ class TerraformParser:
                             ] = f"${{google_service_account.{sa_resource_name}.email}}"
                             break
 
-    def extract_method(self, tree, node: Node, method=None):
+    def extract_method(self, node: Node):
         """
-        Extracts the method name from the given AST tree and node.
+        Extracts the method name called at the statement of the given node.
         Args:
-            tree (AST): The AST tree to search for the method.
             node (Node): The node representing the method.
-            method (str, optional): The extracted method name. Defaults to None.
         Returns:
             str: The extracted method name.
         """
-        start_line = node.object_code_location["physicalLocation"]["region"][
-            "startLine"
-        ]
-        end_line = node.object_code_location["physicalLocation"]["region"].get(
-            "endLine", start_line
+        method = None
+        ast_node = node.object_fn.statement_index.get_statement(
+            node.object_code_location
         )
-        if getattr(tree, "body", None):
-            for ast_node in tree.body:
-                if (
-                    getattr(ast_node, "lineno", None) == start_line
-                    and getattr(ast_node, "end_lineno", None) == end_line
-                ):
-                    if node.object_type == "GCS_BUCKET":
-                        method = ast_node.value.func.attr
-                    elif node.object_type == "CLOUD_FUNCTION":
-                        method = ast_node.value.func.attr
-                    elif node.object_type == "FIRESTORE_COLLECTION":
-                        method = ast_node.value.func.attr
-                    else:
-                        raise NotImplementedError(
-                            f"{node.object_type} is Unsupported GCP resource type"
-                        )
-                method = self.extract_method(ast_node, node, method=method)
+        if ast_node is not None:
+            if node.object_type == "GCS_BUCKET":
+                method = ast_node.value.func.attr
+            elif node.object_type == "CLOUD_FUNCTION":
+                method = ast_node.value.func.attr
+            elif node.object_type == "FIRESTORE_COLLECTION":
+                method = ast_node.value.func.attr
+            else:
+                raise NotImplementedError(
+                    f"{node.object_type} is Unsupported GCP resource type"
+                )
         return method
 
     def generate_iam_policy(self, method, node: Node):
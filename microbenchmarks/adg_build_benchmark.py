@@ -0,0 +1,89 @@
+"""
+Offline benchmark for ADG construction time as the number of SARIF flows grows.
+
+Builds a graph from synthetic flows through SarifParser.parse_sarif_flow and
+reports the time per flow, which should stay roughly constant (linear build time).
+
+Usage (from the repository root):
+    python -m microbenchmarks.adg_build_benchmark
+"""
+
+import os
+import tempfile
+import time
+
+from growlithe.graph.adg.edge import EdgeType
+from growlithe.graph.adg.function import Function
+from growlithe.graph.adg.graph import Graph
+from growlithe.graph.adg.resource import ResourceType
+from growlithe.graph.parsers.sarif import SarifParser
+
+FLOW_COUNTS = [1000, 2000, 4000, 8000, 16000]
+# Each distinct flow is reported this many times, as CodeQL does for multiple paths
+DUPLICATION_FACTOR = 2
+
+HANDLER_CODE = """def lambda_handler(event, context):
+    return {"statusCode": 200}
+"""
+
+
+def create_function(code_dir):
+    function_path = os.path.join(code_dir, "handler.py")
+    with open(function_path, "w") as f:
+        f.write(HANDLER_CODE)
+    return Function(
+        name="BenchmarkFunction",
+        type=ResourceType.FUNCTION,
+        runtime="python3.10",
+        function_path=function_path,
+        growlithe_function_path=function_path,
+    )
+
+
+def synthetic_related_locations():
+    region = {"startLine": 2, "endLine": 2}
+    return [
+        {"physicalLocation": {"region": region}, "message": {"text": "SOURCE"}},
+        {"physicalLocation": {"region": region}, "message": {"text": "SINK"}},
+    ]
+
+
+def synthetic_flow(i):
+    return (
+        f"[SOURCE, GLOBAL, S3_BUCKET:STATIC:bucket{i % 50}, DYNAMIC:key{i}](1)"
+        f"==>[SINK, CONTAINER, LOCAL_FILE:STATIC:tempfs, DYNAMIC:file{i}](2)"
+    )
+
+
+def build_graph(num_flows, function):
+    # Flows are fed directly, no SARIF file is read
+    parser = SarifParser(sarif_output_path=None, config=None)
+    graph = Graph("Benchmark")
+    related_locations = synthetic_related_locations()
+    distinct_flows = num_flows // DUPLICATION_FACTOR
+    start = time.perf_counter()
+    for _ in range(DUPLICATION_FACTOR):
+        for i in range(distinct_flows):
+            parser.parse_sarif_flow(
+                synthetic_flow(i), graph, related_locations, function, EdgeType.DATA
+            )
+    return graph, time.perf_counter() - start
+
+
+def main():
+    with tempfile.TemporaryDirectory() as code_dir:
+        function = create_function(code_dir)
+        print(
+            f"{'flows':>8} {'nodes':>8} {'edges':>8} {'time (s)':>10} {'us/flow':>10}"
+        )
+        for num_flows in FLOW_COUNTS:
+            function.nodes = []
+            graph, elapsed = build_graph(num_flows, function)
+            print(
+                f"{num_flows:>8} {len(graph.nodes):>8} {len(graph.edges):>8} "
+                f"{elapsed:>10.4f} {elapsed / num_flows * 1e6:>10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Offline benchmark for Graph.populate_ancestors on layered synthetic graphs.
+
+Each layer of nodes connects to two nodes of the next layer, so ancestor sets grow
+with depth. Reports time and peak traced memory of the bitset implementation and of
+the set based implementation it replaced. The cyclic variant adds a back edge every
+few layers, as when a function writes to the bucket that triggers it, which the set
+based implementation does not support.
+
+Usage (from the repository root):
+    python -m microbenchmarks.ancestors_benchmark
+"""
+
+import time
+import tracemalloc
+from collections import deque
+
+from growlithe.graph.adg.edge import Edge, EdgeType
+from growlithe.graph.adg.function import Function
+from growlithe.graph.adg.graph import Graph
+from growlithe.graph.adg.node import Node
+from growlithe.graph.adg.resource import ResourceType
+from growlithe.graph.adg.types import Reference, ReferenceType, Scope
+
+LAYER_WIDTH = 20
+DEPTHS = [25, 50, 100, 200]
+NUM_FUNCTIONS = 10
+# In the cyclic variant, every this many layers link back to the first of them
+CYCLE_LENGTH = 10
+
+
+def build_layered_graph(depth, cyclic=False):
+    # Function ASTs are parsed lazily, so the handler file does not need to exist
+    functions = [
+        Function(
+            name=f"Function{i}",
+            type=ResourceType.FUNCTION,
+            runtime="python3.10",
+            function_path="handler.py",
+            growlithe_function_path="handler.py",
+        )
+        for i in range(NUM_FUNCTIONS)
+    ]
+    graph = Graph("Layered")
+    graph.add_functions(functions)
+    layers = []
+    for layer in range(depth):
+        layers.append(
+            [
+                graph.add_node(
+                    Node(
+                        Reference(ReferenceType.STATIC, "bucket"),
+                        Reference(ReferenceType.STATIC, f"object{layer}_{i}"),
+                        "S3_BUCKET",
+                        None,
+                        {},
+                        functions[layer % NUM_FUNCTIONS],
+                        {},
+                        {},
+                        Scope.GLOBAL,
+                    )
+                )
+                for i in range(LAYER_WIDTH)
+            ]
+        )
+    for upper, lower in zip(layers, layers[1:]):
+        for i, node in enumerate(upper):
+            for sink in [lower[i], lower[(i + 1) % LAYER_WIDTH]]:
+                graph.add_edge(Edge(node, sink, {}, {}, node.object_fn, EdgeType.DATA))
+    if cyclic:
+        for layer in range(CYCLE_LENGTH - 1, depth, CYCLE_LENGTH):
+            node, sink = layers[layer][0], layers[layer - CYCLE_LENGTH + 1][0]
+            graph.add_edge(Edge(node, sink, {}, {}, node.object_fn, EdgeType.DATA))
+    return graph
+
+
+def populate_ancestor_sets(graph):
+    """The set based implementation replaced by bitsets, for comparison."""
+    ancestor_nodes = {node: set() for node in graph.nodes}
+    ancestor_functions = {node: set() for node in graph.nodes}
+    in_degree = {node: 0 for node in graph.nodes}
+    for edge in graph.edges:
+        in_degree[edge.sink] += 1
+    queue = deque([node for node in graph.nodes if in_degree[node] == 0])
+    while queue:
+        current_node = queue.popleft()
+        ancestor_functions[current_node].add(current_node.object_fn)
+        for edge in current_node.outgoing_edges:
+            child_node = edge.sink
+            ancestor_nodes[child_node].add(current_node)
+            ancestor_nodes[child_node].update(ancestor_nodes[current_node])
+            ancestor_functions[child_node].add(current_node.object_fn)
+            ancestor_functions[child_node].update(ancestor_functions[current_node])
+            in_degree[child_node] -= 1
+            if in_degree[child_node] == 0:
+                queue.append(child_node)
+    return ancestor_nodes, ancestor_functions
+
+
+def measure(populate):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = populate()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 2**20
+
+
+def main():
+    print(
+        f"{'nodes':>8} {'edges':>8} {'bitset (s)':>11} {'bitset (MB)':>12} "
+        f"{'sets (s)':>9} {'sets (MB)':>10}"
+    )
+    for depth in DEPTHS:
+        graph = build_layered_graph(depth)
+        _, bitset_time, bitset_memory = measure(graph.populate_ancestors)
+        (ancestor_nodes, _), set_time, set_memory = measure(
+            lambda: populate_ancestor_sets(graph)
+        )
+        last = graph.nodes[-1]
+        assert set(last.ancestor_nodes) == ancestor_nodes[last]
+        print(
+            f"{len(graph.nodes):>8} {len(graph.edges):>8} {bitset_time:>11.4f} "
+            f"{bitset_memory:>12.2f} {set_time:>9.4f} {set_memory:>10.2f}"
+        )
+
+    print(f"\n{'cyclic':>8} {'edges':>8} {'bitset (s)':>11} {'bitset (MB)':>12}")
+    for depth in DEPTHS:
+        graph = build_layered_graph(depth, cyclic=True)
+        _, bitset_time, bitset_memory = measure(graph.populate_ancestors)
+        print(
+            f"{len(graph.nodes):>8} {len(graph.edges):>8} {bitset_time:>11.4f} "
+            f"{bitset_memory:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Offline benchmark for indirect flow discovery on a synthetic chain of functions.
+
+Builds a chain of functions where each function reads from and writes to a few of a
+pool of buckets, then times GraphGenerator.add_potential_indirect_flows over all
+consecutive function pairs. The nested loop implementation it replaced is timed on
+the same graph for comparison, for chains short enough for it to finish.
+
+Usage (from the repository root):
+    python -m microbenchmarks.indirect_flows_benchmark
+"""
+
+import time
+
+from growlithe.graph.adg.edge import Edge, EdgeType
+from growlithe.graph.adg.function import Function
+from growlithe.graph.adg.graph import Graph
+from growlithe.graph.adg.node import Node
+from growlithe.graph.adg.resource import Resource, ResourceType
+from growlithe.graph.adg.types import Reference, ReferenceType, Scope
+from growlithe.graph.adg_generator import GraphGenerator
+
+CHAIN_LENGTHS = [50, 100, 200, 500]
+# The nested loop implementation is only timed up to this chain length
+NESTED_LOOP_MAX_LENGTH = 500
+NUM_BUCKETS = 8
+NODES_PER_FUNCTION = 20
+RESOURCES_PER_NODE = 2
+
+
+def make_node(function, buckets, index, text):
+    node = Node(
+        Reference(ReferenceType.STATIC, "bucket"),
+        Reference(ReferenceType.DYNAMIC, f"{text.lower()}{index}"),
+        "S3_BUCKET",
+        None,
+        {"physicalLocation": {"region": {"startLine": 1}}, "message": {"text": text}},
+        function,
+        {},
+        {},
+        Scope.GLOBAL,
+    )
+    node.resource_attrs["potential_resources"] = [
+        buckets[(index + i) % len(buckets)] for i in range(RESOURCES_PER_NODE)
+    ]
+    return node
+
+
+def build_chain(length):
+    # Function ASTs are parsed lazily, so the handler file does not need to exist
+    functions = [
+        Function(
+            name=f"Function{i}",
+            type=ResourceType.FUNCTION,
+            runtime="python3.10",
+            function_path="handler.py",
+            growlithe_function_path="handler.py",
+        )
+        for i in range(length)
+    ]
+    buckets = [
+        Resource(f"bucket{i}", ResourceType.S3_BUCKET) for i in range(NUM_BUCKETS)
+    ]
+    graph = Graph("Chain")
+    graph.add_functions(functions)
+    graph.add_resources(functions + buckets)
+    for f, function in enumerate(functions):
+        for i in range(NODES_PER_FUNCTION):
+            text = "SINK" if i % 2 else "SOURCE"
+            graph.add_node(
+                make_node(function, buckets, f * NODES_PER_FUNCTION + i, text)
+            )
+    return graph, list(zip(functions, functions[1:]))
+
+
+def nested_loop_indirect_flows(graph, source, target):
+    for node1 in graph.nodes:
+        if node1.object_fn == source and node1.scope == Scope.GLOBAL and node1.is_sink:
+            for node2 in graph.nodes:
+                if (
+                    node2.object_fn == target
+                    and node2.scope == Scope.GLOBAL
+                    and node2.is_source
+                ):
+                    for resource in node1.resource_attrs["potential_resources"]:
+                        if resource in node2.resource_attrs["potential_resources"]:
+                            graph.add_edge(
+                                Edge(
+                                    node1,
+                                    node2,
+                                    node1.object_code_location,
+                                    node2.object_code_location,
+                                    source,
+                                    EdgeType.INDIRECT,
+                                )
+                            )
+
+
+def time_join(length):
+    graph, pairs = build_chain(length)
+    generator = GraphGenerator(graph, config=None)
+    start = time.perf_counter()
+    global_nodes = generator.index_global_nodes()
+    for source, target in pairs:
+        generator.add_potential_indirect_flows(source, target, global_nodes)
+    return len(graph.edges), time.perf_counter() - start
+
+
+def time_nested_loop(length):
+    graph, pairs = build_chain(length)
+    start = time.perf_counter()
+    for source, target in pairs:
+        nested_loop_indirect_flows(graph, source, target)
+    return len(graph.edges), time.perf_counter() - start
+
+
+def main():
+    print(
+        f"{'functions':>10} {'nodes':>8} {'edges':>8} {'join (s)':>10} {'nested loop (s)':>16}"
+    )
+    for length in CHAIN_LENGTHS:
+        edges, join_time = time_join(length)
+        nested_loop = "-"
+        if length <= NESTED_LOOP_MAX_LENGTH:
+            nested_edges, nested_time = time_nested_loop(length)
+            assert nested_edges == edges
+            nested_loop = f"{nested_time:.4f}"
+        print(
+            f"{length:>10} {length * NODES_PER_FUNCTION:>8} {edges:>8} "
+            f"{join_time:>10.4f} {nested_loop:>16}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Offline benchmark for the runtime cost of a policy check in an instrumented function.
+
+Compares asking pyDatalog the query of a predicate set, as assertions did before
+policies were compiled, with evaluating the Python check it compiles to. Runtime
+properties are stubbed, so only the cost of the check itself is measured.
+
+Usage (from the repository root):
+    python -m microbenchmarks.policy_check_benchmark
+"""
+
+import time
+
+from pyDatalog import pyDatalog
+
+from growlithe.enforcement.policy.policy_enforcer import PolicyPredicate, PredicateSet
+
+ITERATIONS = 2000
+
+# Predicate sets as inserted into assertions, with the implicit predicates binding
+# their variables to the values resolved at runtime first, as pyDatalog needs them
+# bound before they are checked by Python predicates
+POLICIES = {
+    "eq": [
+        "eq(InstRegion, '{getInstProp('InstRegion')}')",
+        "eq(InstRegion, 'us-west-2')",
+    ],
+    "lt": [
+        "eq(InstTime, '{getInstProp('InstTime')}')",
+        "lt(InstTime, 99999999999)",
+    ],
+    "isPrefix": [
+        "eq(SessionEndRegion, '{getSessionProp(event, 'SessionEndRegion')}')",
+        "isPrefix(SessionEndRegion, 'C')",
+    ],
+}
+
+# Rules of the Growlithe runtime library used by the policies
+pyDatalog.load("""
+    eq(X, Y) <= (X == Y)
+    lt(X, Y) <= (X < Y)
+""")
+
+
+@pyDatalog.predicate()
+def isPrefix2(str, pre):
+    if str.id.startswith(pre.id):
+        yield (str, pre)
+
+
+def getInstProp(prop):
+    return {"InstRegion": "us-west-2", "InstTime": 1700000000}[prop]
+
+
+def getSessionProp(event, prop):
+    return "CA"
+
+
+def measure(check):
+    durations = []
+    for _ in range(ITERATIONS):
+        start = time.perf_counter_ns()
+        assert check()
+        durations.append(time.perf_counter_ns() - start)
+    durations.sort()
+    return (
+        durations[len(durations) // 2] / 1000,
+        durations[-len(durations) // 100] / 1000,
+    )
+
+
+def main():
+    namespace = {
+        "pyDatalog": pyDatalog,
+        "getInstProp": getInstProp,
+        "getSessionProp": getSessionProp,
+        "event": {},
+    }
+    print(
+        f"{'policy':>10} {'pyDatalog p50 (us)':>19} {'p99 (us)':>10} "
+        f"{'compiled p50 (us)':>18} {'p99 (us)':>10}"
+    )
+    for name, predicates in POLICIES.items():
+        predicate_set = PredicateSet({PolicyPredicate(pred) for pred in predicates})
+        # pyDatalog compares the interpolated time as a number only if it is unquoted
+        query = " & ".join(predicates).replace(
+            "'{getInstProp('InstTime')}'", "{getInstProp('InstTime')}"
+        )
+        datalog_check = eval(f'lambda: pyDatalog.ask(f"{query}") != None', namespace)
+        compiled_check = eval(f"lambda: {predicate_set.compile()}", namespace)
+        datalog_p50, datalog_p99 = measure(datalog_check)
+        compiled_p50, compiled_p99 = measure(compiled_check)
+        print(
+            f"{name:>10} {datalog_p50:>19.1f} {datalog_p99:>10.1f} "
+            f"{compiled_p50:>18.2f} {compiled_p99:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Cold start benchmark for importing the Growlithe runtime library in a function.
+
+Each measurement runs in a fresh interpreter, as a new Lambda container would, and
+times the `from growlithe_predicates import *` preamble of instrumented functions.
+The lazy library is compared with loading pyDatalog and the boto3 clients up front,
+as the library did at import, and with the first policy check of each kind.
+
+Usage (from the repository root):
+    python -m microbenchmarks.runtime_import_benchmark
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+RUNS = 10
+
+# Statements run after the import in each scenario
+SCENARIOS = {
+    "import": "",
+    "import, eager pyDatalog and clients": (
+        "load_pydatalog(); get_client('s3'); get_client('dynamodb')"
+    ),
+    "import, compiled check": (
+        "assert (lambda InstRegion: InstRegion == 'us-west-2')(getInstProp('InstRegion'))"
+    ),
+    "import, pyDatalog check": (
+        "assert pyDatalog.ask(\"eq(X, 'us-west-2') & isPrefix(X, 'us')\") != None"
+    ),
+}
+
+TIMING_CODE = """
+import time
+start = time.perf_counter()
+from growlithe_utils_aws import *
+{statement}
+print(time.perf_counter() - start)
+"""
+
+
+def measure(statement, lib_dir):
+    env = {
+        **os.environ,
+        "PYTHONPATH": lib_dir,
+        "AWS_REGION": "us-west-2",
+        "AWS_DEFAULT_REGION": "us-west-2",
+        "AWS_LAMBDA_FUNCTION_NAME": "Function",
+    }
+    durations = []
+    for _ in range(RUNS):
+        output = subprocess.run(
+            [sys.executable, "-c", TIMING_CODE.format(statement=statement)],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        durations.append(float(output.strip()))
+    return statistics.median(durations) * 1000
+
+
+def main():
+    lib_dir = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        "growlithe",
+        "enforcement",
+        "policy",
+        "platform_predicates",
+    )
+    print(f"{'scenario':>36} {'median (ms)':>12}")
+    for name, statement in SCENARIOS.items():
+        print(f"{name:>36} {measure(statement, lib_dir):>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
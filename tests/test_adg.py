@@ -0,0 +1,358 @@
+import ast
+import os
+import tempfile
+import unittest
+from growlithe.cli.apply import instrument_and_save_functions
+from growlithe.graph.adg.ancestors import strongly_connected_components
+from growlithe.graph.adg.edge import Edge, EdgeType
+from growlithe.graph.adg.function import Function
+from growlithe.graph.adg.graph import Graph
+from growlithe.graph.adg.instrumentation_plan import InsertPosition, InstrumentationPlan
+from growlithe.graph.adg.node import Node
+from growlithe.graph.adg.resource import Resource, ResourceType
+from growlithe.graph.adg.statement_index import StatementIndex
+from growlithe.graph.adg.types import Reference, ReferenceType, Scope
+from growlithe.graph.adg_generator import GraphGenerator
+from growlithe.graph.graph_store import GraphStore, dump_graph
+
+
+def make_node(function, resource_name, object_name, scope=Scope.GLOBAL):
+    return Node(
+        Reference(ReferenceType.STATIC, resource_name),
+        Reference(ReferenceType.DYNAMIC, object_name),
+        "S3_BUCKET",
+        None,
+        {"physicalLocation": {"region": {"startLine": 1}}, "message": {"text": ""}},
+        function,
+        {},
+        {},
+        scope,
+    )
+
+
+class TestAdg(unittest.TestCase):
+    @classmethod
+    def setUpClass(self):
+        # Get the directory of the current file
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        function_path = os.path.join(current_dir, "sample_app", "src", "function1.py")
+        self.function = Function(
+            name="Function1",
+            type=ResourceType.FUNCTION,
+            runtime="python3.10",
+            function_path=function_path,
+            growlithe_function_path=function_path,
+        )
+
+    def test_node_deduplication(self):
+        graph = Graph()
+        node = graph.add_node(make_node(self.function, "bucket", "key"))
+        duplicate = graph.add_node(make_node(self.function, "bucket", "key"))
+        other = graph.add_node(make_node(self.function, "bucket", "other_key"))
+
+        self.assertIs(node, duplicate)
+        self.assertIsNot(node, other)
+        self.assertEqual(len(graph.nodes), 2)
+
+    def test_edge_deduplication(self):
+        graph = Graph()
+        source = graph.add_node(make_node(self.function, "bucket", "key"))
+        sink = graph.add_node(make_node(self.function, "bucket", "output"))
+        edge = graph.add_edge(Edge(source, sink, {}, {}, self.function, EdgeType.DATA))
+        duplicate = graph.add_edge(
+            Edge(source, sink, {}, {}, self.function, EdgeType.DATA)
+        )
+        graph.add_edge(Edge(source, sink, {}, {}, self.function, EdgeType.METADATA))
+
+        self.assertIs(edge, duplicate)
+        self.assertEqual(len(graph.edges), 1)
+        self.assertEqual(len(graph.metadata_edges), 1)
+        self.assertEqual(len(source.outgoing_edges), 2)
+
+    def test_statement_index(self):
+        code = "\n".join(
+            [
+                "def handler(event, context):",
+                "    if event:",
+                "        x = 1",
+                "    else:",
+                "        y = 2",
+                "    return x",
+            ]
+        )
+        index = StatementIndex(ast.parse(code))
+        code_path = {"physicalLocation": {"region": {"startLine": 5}}}
+
+        statements, position = index.locate(code_path)
+        self.assertIsInstance(statements[position], ast.Assign)
+        self.assertEqual(statements[position].targets[0].id, "y")
+
+        # Locations stay valid after statements are inserted before them
+        statements.insert(position, ast.parse("pass"))
+        statements.insert(0, ast.parse("pass"))
+        statements, new_position = index.locate(code_path)
+        self.assertEqual(new_position, position + 2)
+        self.assertEqual(index.get_function_def(1).name, "handler")
+        self.assertIsNone(
+            index.locate({"physicalLocation": {"region": {"startLine": 42}}})
+        )
+
+    def test_instrumentation_plan(self):
+        code = "\n".join(
+            [
+                "def handler(event, context):",
+                "    x = 1",
+                "    return x",
+            ]
+        )
+        tree = ast.parse(code)
+        index = StatementIndex(tree)
+        plan = InstrumentationPlan(index)
+        function_body = index.get_function_def(1).body
+        return_path = {"physicalLocation": {"region": {"startLine": 3}}}
+
+        plan.insert_at_start(tree.body, ["import os"])
+        plan.insert_at_start(function_body, ["a = 1", "b = 2"])
+        self.assertTrue(plan.insert_at(return_path, ["c = 3"]))
+        self.assertTrue(plan.insert_at(return_path, ["d = 4"]))
+        plan.insert_at(return_path, ["e = 5"], InsertPosition.AFTER)
+        self.assertFalse(
+            plan.insert_at({"physicalLocation": {"region": {"startLine": 42}}}, [""])
+        )
+        self.assertEqual(len(plan), 6)
+
+        plan.apply()
+        self.assertEqual(len(plan), 0)
+        self.assertEqual(
+            ast.unparse(tree).splitlines(),
+            [
+                "import os",
+                "",
+                "def handler(event, context):",
+                "    a = 1",
+                "    b = 2",
+                "    x = 1",
+                "    c = 3",
+                "    d = 4",
+                "    return x",
+                "    e = 5",
+            ],
+        )
+        # The index still resolves statements after the rewrite
+        statements, position = index.locate(return_path)
+        self.assertIsInstance(statements[position], ast.Return)
+
+    def test_parallel_instrumentation(self):
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        growlithe_lib_path = os.path.join(
+            current_dir,
+            "..",
+            "growlithe",
+            "enforcement",
+            "policy",
+            "platform_predicates",
+            "growlithe_utils_aws.py",
+        )
+        snippets = {
+            "function1": ["growlithe_add_self_taint('Function1')"],
+            "function2": [
+                "if ipToCountryHelper(getSessionProp(event, 'SourceIp')) != 'US':",
+                "    raise Exception('Policy violated')",
+            ],
+        }
+
+        def instrument(output_dir, jobs):
+            functions = []
+            for name, snippet in snippets.items():
+                function = Function(
+                    name=name,
+                    type=ResourceType.FUNCTION,
+                    runtime="python3.10",
+                    function_path=os.path.join(
+                        current_dir, "sample_app", "src", f"{name}.py"
+                    ),
+                    growlithe_function_path=os.path.join(output_dir, name, "app.py"),
+                )
+                function.instrumentation_plan.insert_at_start(
+                    function.code_tree.body, ["\n".join(snippet)]
+                )
+                functions.append(function)
+            graph = Graph()
+            graph.add_functions(functions)
+            instrument_and_save_functions(graph, growlithe_lib_path, jobs=jobs)
+            files = {}
+            for dir_path, _, file_names in os.walk(output_dir):
+                for file_name in file_names:
+                    path = os.path.join(dir_path, file_name)
+                    with open(path, "rb") as f:
+                        files[os.path.relpath(path, output_dir)] = f.read()
+            return files
+
+        with tempfile.TemporaryDirectory() as serial_dir:
+            serial = instrument(serial_dir, jobs=1)
+        with tempfile.TemporaryDirectory() as parallel_dir:
+            parallel = instrument(parallel_dir, jobs=2)
+
+        self.assertEqual(
+            sorted(serial),
+            sorted(
+                os.path.join(name, file_name)
+                for name in snippets
+                for file_name in ["app.py", "growlithe_predicates.py"]
+            ),
+        )
+        self.assertEqual(parallel, serial)
+        function1 = serial[os.path.join("function1", "app.py")].decode()
+        self.assertTrue(function1.startswith("growlithe_add_self_taint('Function1')"))
+        # Each bundle only has what its function uses from the runtime library
+        bundle1 = serial[os.path.join("function1", "growlithe_predicates.py")].decode()
+        bundle2 = serial[os.path.join("function2", "growlithe_predicates.py")].decode()
+        self.assertIn("def growlithe_add_self_taint(", bundle1)
+        self.assertNotIn("def ipToCountryHelper(", bundle1)
+        self.assertIn("def ipToCountryHelper(", bundle2)
+        self.assertNotIn("def growlithe_add_self_taint(", bundle2)
+
+    def test_graph_store(self):
+        bucket = Resource("bucket", ResourceType.S3_BUCKET)
+        bucket.add_dependency(self.function)
+        graph = Graph("Store")
+        graph.add_functions([self.function])
+        graph.add_resources([bucket, self.function])
+        source = graph.add_node(make_node(self.function, "bucket", "key"))
+        source.mapped_resource = bucket
+        source.resource_attrs["potential_resources"] = [bucket]
+        sink = graph.add_node(make_node(self.function, "bucket", "output"))
+        graph.add_edge(Edge(source, sink, {}, {}, self.function, EdgeType.DATA))
+        graph.add_edge(Edge(source, sink, {}, {}, self.function, EdgeType.METADATA))
+
+        with tempfile.TemporaryDirectory() as store_dir:
+            store_path = os.path.join(store_dir, "graph_store.zip")
+            dump_graph(graph, store_path)
+            loaded = GraphStore(store_path).load_graph()
+
+        self.assertEqual(
+            [repr(node) for node in loaded.nodes], [repr(node) for node in graph.nodes]
+        )
+        self.assertEqual(
+            [repr(edge) for edge in loaded.edges + loaded.metadata_edges],
+            [repr(edge) for edge in graph.edges + graph.metadata_edges],
+        )
+        loaded_bucket, loaded_function = loaded.resources
+        self.assertEqual(loaded.functions, [loaded_function])
+        self.assertEqual(loaded_bucket.dependencies, [loaded_function])
+        self.assertIs(loaded_function.trigger, loaded_bucket)
+        loaded_source = loaded.nodes[0]
+        self.assertIs(loaded_source.object_fn, loaded_function)
+        self.assertIs(loaded_source.mapped_resource, loaded_bucket)
+        self.assertEqual(
+            loaded_source.resource_attrs["potential_resources"], [loaded_bucket]
+        )
+        self.assertEqual(len(loaded_source.outgoing_edges), 2)
+        # ASTs are re-read from the function source
+        self.assertEqual(
+            ast.dump(loaded_function.code_tree), ast.dump(self.function.code_tree)
+        )
+
+    def test_graph_store_unencodable(self):
+        graph = Graph("Store")
+        graph.add_functions([self.function])
+        node = graph.add_node(make_node(self.function, "bucket", "key"))
+        node.object_attrs["tree"] = self.function.code_tree
+        with tempfile.TemporaryDirectory() as store_dir:
+            store_path = os.path.join(store_dir, "graph_store.zip")
+            with self.assertRaisesRegex(TypeError, r"object_attrs\[0\]\.tree"):
+                dump_graph(graph, store_path)
+
+    def test_graph_store_version(self):
+        with tempfile.TemporaryDirectory() as store_dir:
+            store_path = os.path.join(store_dir, "graph_dump.pkl")
+            with open(store_path, "wb") as f:
+                f.write(b"not a graph store")
+            with self.assertRaises(ValueError):
+                GraphStore(store_path)
+
+    def test_potential_indirect_flows(self):
+        buckets = [Resource(f"b{i}", ResourceType.S3_BUCKET) for i in range(3)]
+        target = Function(
+            name="Function2",
+            type=ResourceType.FUNCTION,
+            runtime="python3.10",
+            function_path=self.function.function_path,
+            growlithe_function_path=self.function.function_path,
+        )
+        graph = Graph()
+        graph.add_functions([self.function, target])
+
+        def add_node(function, name, text, resources):
+            node = make_node(function, "bucket", name)
+            node.object_code_location = {"message": {"text": text}}
+            node.resource_attrs["potential_resources"] = resources
+            return graph.add_node(node)
+
+        sink = add_node(self.function, "out", "SINK", [buckets[0], buckets[1]])
+        source_b1 = add_node(target, "in1", "SOURCE", [buckets[1]])
+        add_node(target, "in2", "SOURCE", [buckets[2]])
+        source_b0_b1 = add_node(target, "in3", "SOURCE", [buckets[0], buckets[1]])
+        add_node(target, "in4", "SINK", [buckets[0]])
+
+        GraphGenerator(graph, config=None).add_potential_indirect_flows(
+            self.function, target
+        )
+
+        self.assertEqual(
+            [(edge.source, edge.sink) for edge in graph.edges],
+            [(sink, source_b1), (sink, source_b0_b1)],
+        )
+        self.assertTrue(
+            all(edge.edge_type == EdgeType.INDIRECT for edge in graph.edges)
+        )
+
+    def test_populate_ancestors(self):
+        graph = Graph()
+        a, b, c, d = [
+            graph.add_node(make_node(self.function, "bucket", name))
+            for name in ["a", "b", "c", "d"]
+        ]
+        for source, sink in [(a, b), (a, c), (b, d), (c, d)]:
+            graph.add_edge(Edge(source, sink, {}, {}, self.function, EdgeType.DATA))
+
+        graph.populate_ancestors()
+
+        self.assertEqual(len(a.ancestor_nodes), 0)
+        self.assertEqual(set(d.ancestor_nodes), {a, b, c})
+        self.assertIn(a, d.ancestor_nodes)
+        self.assertNotIn(d, b.ancestor_nodes)
+        self.assertEqual(list(d.ancestor_functions), [self.function])
+
+    def test_populate_ancestors_with_cycles(self):
+        graph = Graph()
+        a, b, c, d, e = [
+            graph.add_node(make_node(self.function, "bucket", name))
+            for name in ["a", "b", "c", "d", "e"]
+        ]
+        # b and c form a cycle, e writes back to itself
+        for source, sink in [(a, b), (b, c), (c, b), (c, d), (e, e)]:
+            graph.add_edge(Edge(source, sink, {}, {}, self.function, EdgeType.DATA))
+
+        graph.populate_ancestors()
+
+        self.assertEqual(set(a.ancestor_nodes), set())
+        self.assertEqual(set(b.ancestor_nodes), {a, b, c})
+        self.assertEqual(set(c.ancestor_nodes), {a, b, c})
+        self.assertEqual(set(d.ancestor_nodes), {a, b, c})
+        self.assertEqual(set(e.ancestor_nodes), {e})
+        self.assertEqual(list(d.ancestor_functions), [self.function])
+
+    def test_strongly_connected_components(self):
+        # A chain deeper than the recursion limit, closed into one cycle at the end
+        depth = 5000
+        adjacency = [[i + 1] for i in range(depth - 1)] + [[0]]
+        self.assertEqual(len(strongly_connected_components(adjacency)), 1)
+
+        adjacency = [[1], [2], [1, 3], []]
+        components = strongly_connected_components(adjacency)
+        self.assertEqual([sorted(c) for c in components], [[3], [1, 2], [0]])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,48 @@
+import json
+import os
+import tempfile
+import unittest
+from growlithe.bench.synthetic_app import AppShape
+from growlithe.cli.bench import PHASES, bench
+from growlithe.config import get_config
+
+
+class TestBench(unittest.TestCase):
+    @classmethod
+    def setUpClass(self):
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        self.custom_config_path = os.path.join(
+            current_dir, "sample_app", "growlithe_config.yaml"
+        )
+        self.config = get_config(os.path.abspath(self.custom_config_path))
+        self.shape = AppShape(functions=4, flows=2, fanout=2, depth=2)
+
+    def test_shape(self):
+        self.assertEqual(self.shape.get_levels(), [[0, 1], [2, 3]])
+        self.assertEqual(
+            self.shape.get_successors(), {0: [2, 3], 1: [3, 2], 2: [], 3: []}
+        )
+
+    def test_bench(self):
+        app_path = self.config.app_path
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_path = os.path.join(tmp_dir, "bench.json")
+            results = bench(self.config, [self.shape], output_path=output_path)
+            with open(output_path) as f:
+                self.assertEqual(json.load(f), results)
+
+            # The next run is compared to the saved results
+            bench(self.config, [self.shape], baseline_path=output_path)
+
+        # The configuration of the application is restored
+        self.assertEqual(self.config.app_path, app_path)
+        scenario = results["scenarios"][0]
+        self.assertEqual(
+            scenario["shape"], {"functions": 4, "flows": 2, "fanout": 2, "depth": 2}
+        )
+        self.assertEqual(set(scenario["phases"]), set(PHASES))
+        # Each function has a parameter to return flow and 2 flows through a file,
+        # and an indirect edge to each function it invokes
+        self.assertEqual(scenario["edges"], 4 * (1 + 2 * 2) + 4)
+        self.assertGreater(scenario["phases"]["sarif_parsing"], 0)
+        self.assertGreater(scenario["phases"]["policy_compilation"], 0)
@@ -0,0 +1,544 @@
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from types import SimpleNamespace
+from growlithe.common.dev_config import codeql_queries
+from growlithe.graph.codeql.intra_function_analyzer import (
+    Analyzer,
+    get_query_id,
+    hash_query_pack,
+    merge_sarif_results,
+    partition_functions,
+    split_codeql_budget,
+    split_sarif_results,
+)
+from growlithe.graph.codeql.evaluator_log import (
+    aggregate_evaluator_summary,
+    log_evaluator_summary,
+)
+from growlithe.graph.codeql.query_server import QueryServer, get_query_server
+
+# Minimal stand-in for codeql execute query-server2, speaking the same protocol
+FAKE_QUERY_SERVER = """
+import json, sys
+
+def read():
+    length = None
+    while True:
+        line = sys.stdin.buffer.readline()
+        if not line:
+            sys.exit(0)
+        if not line.strip():
+            break
+        length = int(line.split(b":")[1])
+    return json.loads(sys.stdin.buffer.read(length))
+
+def write(message):
+    body = json.dumps(message).encode()
+    sys.stdout.buffer.write(b"Content-Length: %d\\r\\n\\r\\n" % len(body) + body)
+    sys.stdout.buffer.flush()
+
+databases = set()
+while True:
+    request = read()
+    body = request["params"]["body"]
+    write({"jsonrpc": "2.0", "method": "ql/progressUpdated", "params": {}})
+    if request["method"] == "evaluation/registerDatabases":
+        databases.update(db["dbDir"] for db in body["databases"])
+        result = {}
+    elif body["db"] not in databases:
+        result = {"resultType": 1, "message": "unregistered"}
+    else:
+        open(body["outputPath"], "w").write(body["queryPath"])
+        result = {"resultType": 0, "evaluationTime": 1}
+    write({"jsonrpc": "2.0", "id": request["id"], "result": result})
+"""
+
+
+class TestCodeQL(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        app_path = os.path.join(self.tmp_dir.name, "app")
+        self.source_path = os.path.join(app_path, "src", "function.py")
+        os.makedirs(os.path.dirname(self.source_path))
+        with open(self.source_path, "w") as f:
+            f.write("def lambda_handler(event, context):\n    return event\n")
+        self.config = SimpleNamespace(
+            app_name="App",
+            app_path=app_path,
+            src_dir="src",
+            growlithe_path=os.path.join(self.tmp_dir.name, "growlithe_App"),
+        )
+        os.makedirs(self.config.growlithe_path)
+        self.analyzer = Analyzer(self.config)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_database_manifest(self):
+        manifest = self.analyzer.get_source_manifest("python")
+        self.assertEqual(list(manifest["files"].keys()), ["src/function.py"])
+        self.assertFalse(self.analyzer.is_database_up_to_date("python", manifest))
+
+        # Simulate a database created from the current sources
+        os.makedirs(self.analyzer.get_database_path("python"))
+        with open(self.analyzer.get_database_manifest_path("python"), "w") as f:
+            json.dump(manifest, f)
+        self.assertTrue(self.analyzer.is_database_up_to_date("python", manifest))
+
+        with open(self.source_path, "a") as f:
+            f.write("# changed\n")
+        manifest = self.analyzer.get_source_manifest("python")
+        self.assertFalse(self.analyzer.is_database_up_to_date("python", manifest))
+
+    def test_result_cache(self):
+        query_pack_path = os.path.join(self.tmp_dir.name, "queries")
+        os.makedirs(query_pack_path)
+        with open(os.path.join(query_pack_path, "Config.qll"), "w") as f:
+            f.write('string f() { result = ["src/function.py"] }\n')
+        query_pack_hash = hash_query_pack(query_pack_path)
+        functions = ["src/function.py"]
+
+        # Without a database manifest, results are not cached
+        self.assertIsNone(
+            self.analyzer.get_cached_results_path(
+                "python", "dataflows", query_pack_hash, functions
+            )
+        )
+        with open(self.analyzer.get_database_manifest_path("python"), "w") as f:
+            json.dump(self.analyzer.get_source_manifest("python"), f)
+        cache_path = self.analyzer.get_cached_results_path(
+            "python", "dataflows", query_pack_hash, functions
+        )
+        self.assertFalse(os.path.exists(cache_path))
+
+        output_path = os.path.join(self.config.growlithe_path, "dataflows.sarif")
+        with open(output_path, "w") as f:
+            f.write("{}")
+        self.analyzer.store_cached_results(output_path, cache_path)
+        self.assertTrue(os.path.exists(cache_path))
+        self.assertEqual(
+            cache_path,
+            self.analyzer.get_cached_results_path(
+                "python", "dataflows", query_pack_hash, functions
+            ),
+        )
+
+        # Any change to the queries, the functions or the database changes the key
+        with open(os.path.join(query_pack_path, "Config.qll"), "a") as f:
+            f.write("// changed\n")
+        self.assertNotEqual(query_pack_hash, hash_query_pack(query_pack_path))
+        self.assertNotEqual(
+            cache_path,
+            self.analyzer.get_cached_results_path(
+                "python", "dataflows", query_pack_hash, functions + ["src/other.py"]
+            ),
+        )
+        with open(self.source_path, "a") as f:
+            f.write("# changed\n")
+        with open(self.analyzer.get_database_manifest_path("python"), "w") as f:
+            json.dump(self.analyzer.get_source_manifest("python"), f)
+        self.assertNotEqual(
+            cache_path,
+            self.analyzer.get_cached_results_path(
+                "python", "dataflows", query_pack_hash, functions
+            ),
+        )
+
+    @mock.patch(
+        "growlithe.graph.codeql.intra_function_analyzer.CODEQL_RESULT_CACHE_SIZE", 2
+    )
+    def test_result_cache_eviction(self):
+        cache_dir = self.analyzer.get_result_cache_dir()
+        os.makedirs(cache_dir)
+        output_path = os.path.join(self.config.growlithe_path, "dataflows.sarif")
+        with open(output_path, "w") as f:
+            f.write("{}")
+        # Entries of previous runs, oldest first, and another writer's temporary file
+        old_paths = [os.path.join(cache_dir, f"old{i}.sarif") for i in range(3)]
+        for i, path in enumerate(old_paths):
+            with open(path, "w") as f:
+                f.write("{}")
+            os.utime(path, (i, i))
+        tmp_path = os.path.join(cache_dir, "other.sarif.1.1.tmp")
+        with open(tmp_path, "w") as f:
+            f.write("{}")
+
+        # A hit makes the oldest entry the most recently used
+        self.assertTrue(self.analyzer.load_cached_results(old_paths[0], output_path))
+        self.assertFalse(
+            self.analyzer.load_cached_results(
+                os.path.join(cache_dir, "missing.sarif"), output_path
+            )
+        )
+        run_analyzer = Analyzer(self.config)
+        new_paths = [os.path.join(cache_dir, f"new{i}.sarif") for i in range(3)]
+        for path in new_paths:
+            run_analyzer.store_cached_results(output_path, path)
+
+        # Entries of the run are all kept, besides the 2 most recently used others
+        self.assertEqual(
+            sorted(os.listdir(cache_dir)),
+            sorted(
+                [os.path.basename(path) for path in new_paths]
+                + ["old0.sarif", "old2.sarif", os.path.basename(tmp_path)]
+            ),
+        )
+
+    def test_split_sarif_results(self):
+        queries_path = os.path.join(
+            os.path.dirname(__file__), "..", "growlithe", "graph", "codeql", "python"
+        )
+        query_ids = [
+            get_query_id(os.path.join(queries_path, "queries", f"{query}.ql"))
+            for query in ["dataflows", "metadataflows"]
+        ]
+        self.assertEqual(query_ids, ["py/dataFlows", "py/metadataFlows"])
+
+        combined_path = os.path.join(self.tmp_dir.name, "queries.sarif")
+        with open(combined_path, "w") as f:
+            json.dump(
+                {
+                    "version": "2.1.0",
+                    "runs": [
+                        {
+                            "tool": {
+                                "driver": {
+                                    "rules": [
+                                        {"id": query_id} for query_id in query_ids
+                                    ]
+                                }
+                            },
+                            "results": [
+                                {"ruleId": "py/dataFlows", "ruleIndex": 0},
+                                {"ruleId": "py/metadataFlows", "ruleIndex": 1},
+                                {"ruleId": "py/dataFlows", "ruleIndex": 0},
+                            ],
+                            "properties": {"semmle.formatSpecifier": "sarifv2.1.0"},
+                        }
+                    ],
+                },
+                f,
+            )
+        output_paths = {
+            query_id: os.path.join(self.tmp_dir.name, f"{i}.sarif")
+            for i, query_id in enumerate(query_ids)
+        }
+        split_sarif_results(combined_path, output_paths)
+        for query_id, output_path in output_paths.items():
+            with open(output_path) as f:
+                sarif = json.load(f)
+            self.assertEqual(sarif["version"], "2.1.0")
+            (run,) = sarif["runs"]
+            self.assertEqual(run["tool"]["driver"]["rules"], [{"id": query_id}])
+            self.assertEqual(
+                run["properties"], {"semmle.formatSpecifier": "sarifv2.1.0"}
+            )
+            self.assertEqual(
+                run["results"],
+                [{"ruleId": query_id}] * (2 if query_id == "py/dataFlows" else 1),
+            )
+
+    def test_query_server(self):
+        query_server = QueryServer([sys.executable, "-c", FAKE_QUERY_SERVER])
+        database_path = self.analyzer.get_database_path("python")
+        try:
+            for query in ["dataflows", "metadataflows"]:
+                output_path = os.path.join(self.tmp_dir.name, f"{query}.bqrs")
+                self.assertTrue(
+                    query_server.run_query(
+                        database_path, f"{query}.ql", output_path, []
+                    )
+                )
+                with open(output_path) as f:
+                    self.assertEqual(f.read(), f"{query}.ql")
+            # Both queries are served by the same process, registering the database once
+            self.assertEqual(query_server.next_request_id, 3)
+        finally:
+            query_server.close()
+        self.assertIsNone(query_server.process)
+
+        # Servers get the budget of the pipelines sharing them
+        self.assertEqual(
+            QueryServer(memory=1024, threads=2).command[-4:],
+            ["--threads", "2", "-M", "1024"],
+        )
+        self.assertIs(get_query_server(1024, 2), get_query_server(1024, 2))
+        self.assertIsNot(get_query_server(1024, 2), get_query_server(2048, 0))
+
+    def test_source_location_prefix(self):
+        database_path = self.analyzer.get_database_path("python")
+        # Before the database exists, URIs are relative to the app
+        self.assertEqual(
+            self.analyzer.get_source_location_prefix("python"), self.config.app_path
+        )
+        os.makedirs(database_path)
+        with open(os.path.join(database_path, "codeql-database.yml"), "w") as f:
+            f.write("sourceLocationPrefix: /src/app\nprimaryLanguage: python\n")
+        self.assertEqual(self.analyzer.get_source_location_prefix("python"), "/src/app")
+        self.assertEqual(
+            self.analyzer.get_source_archive_path("python"),
+            os.path.join(database_path, "src"),
+        )
+
+    def test_split_codeql_budget(self):
+        module = "growlithe.graph.codeql.intra_function_analyzer"
+        with mock.patch(f"{module}.CODEQL_MEMORY_BUDGET", 4096), mock.patch(
+            f"{module}.CODEQL_THREAD_BUDGET", 0
+        ), mock.patch("os.cpu_count", return_value=8):
+            self.assertEqual(split_codeql_budget(1), (4096, 0))
+            self.assertEqual(split_codeql_budget(2), (2048, 4))
+            self.assertEqual(split_codeql_budget(16), (256, 1))
+        with mock.patch(f"{module}.CODEQL_THREAD_BUDGET", 6):
+            self.assertEqual(split_codeql_budget(1)[1], 6)
+            self.assertEqual(split_codeql_budget(2)[1], 3)
+
+    def test_query_pack_overlay(self):
+        installed_config_path = os.path.join(
+            os.path.dirname(__file__),
+            "..",
+            "growlithe",
+            "graph",
+            "codeql",
+            "python",
+            "queries",
+            "Config.qll",
+        )
+        with open(installed_config_path) as f:
+            installed_config = f.read()
+
+        query_pack_path = self.analyzer.prepare_query_pack(
+            "python", ["src/function.py", "src/other.py"]
+        )
+        self.assertTrue(query_pack_path.startswith(self.config.growlithe_path))
+        self.assertTrue(
+            os.path.exists(os.path.join(query_pack_path, "queries", "dataflows.ql"))
+        )
+        with open(os.path.join(query_pack_path, "queries", "Config.qll")) as f:
+            self.assertIn('result = ["src/function.py",\n\t\t"src/other.py"]', f.read())
+        with open(installed_config_path) as f:
+            self.assertEqual(f.read(), installed_config)
+
+        # A new run replaces the previous list of functions
+        self.analyzer.prepare_query_pack("python", ["src/function.py"])
+        with open(os.path.join(query_pack_path, "queries", "Config.qll")) as f:
+            self.assertNotIn("src/other.py", f.read())
+
+    def test_sharded_results(self):
+        functions = [f"src/function{i}.py" for i in range(5)]
+        self.assertEqual(partition_functions(functions, 0), [functions])
+        self.assertEqual(
+            partition_functions(functions, 2),
+            [functions[0:2], functions[2:4], functions[4:]],
+        )
+
+        def write_sarif(name, uris):
+            # One result per file, with artifact indices local to this output
+            path = os.path.join(self.tmp_dir.name, f"{name}.sarif")
+            results = [
+                {
+                    "ruleId": "py/dataFlows",
+                    "message": {"text": f"flow in {uri}"},
+                    "locations": [
+                        {
+                            "physicalLocation": {
+                                "artifactLocation": {"uri": uri, "index": index},
+                                "region": {"startLine": 1},
+                            }
+                        }
+                    ],
+                }
+                for index, uri in enumerate(uris)
+            ]
+            with open(path, "w") as f:
+                json.dump(
+                    {
+                        "version": "2.1.0",
+                        "runs": [
+                            {
+                                "results": results,
+                                # After the results they index, which streaming allows
+                                "artifacts": [
+                                    {"location": {"uri": uri}} for uri in uris
+                                ],
+                            }
+                        ],
+                    },
+                    f,
+                )
+            return path
+
+        sharded_path = os.path.join(self.tmp_dir.name, "sharded_merged.sarif")
+        merge_sarif_results(
+            [
+                write_sarif(f"shard{i}", shard)
+                for i, shard in enumerate(partition_functions(functions, 2))
+            ],
+            sharded_path,
+        )
+        with open(sharded_path) as f:
+            sharded = json.load(f)
+        (run,) = sharded["runs"]
+        self.assertEqual(
+            [result["message"]["text"] for result in run["results"]],
+            [f"flow in {function}" for function in functions],
+        )
+        for result in run["results"]:
+            location = result["locations"][0]["physicalLocation"]["artifactLocation"]
+            self.assertEqual(
+                run["artifacts"][location["index"]]["location"]["uri"], location["uri"]
+            )
+
+    def test_sharded_analysis(self):
+        module = "growlithe.graph.codeql.intra_function_analyzer"
+        for i in range(1, 5):
+            with open(os.path.join(os.path.dirname(self.source_path), f"f{i}.py"), "w"):
+                pass
+        database_path = self.analyzer.get_database_path("python")
+        cache_path = os.path.join("db-python", "default", "cache")
+        os.makedirs(os.path.join(database_path, cache_path))
+        lock = threading.Lock()
+        running, used, shared = [], set(), []
+        max_running = 0
+
+        def analyze(command, **kwargs):
+            # Stands in for codeql database analyze, with results in CodeQL's order
+            (database,) = [arg for arg in command if arg.startswith(database_path)]
+            query_paths = [arg for arg in command if arg.endswith(".ql")]
+            nonlocal max_running
+            with lock:
+                if database in running:
+                    shared.append(database)
+                running.append(database)
+                used.add(database)
+                max_running = max(max_running, len(running))
+            # Each database keeps its own disk cache
+            self.assertTrue(os.path.isdir(os.path.join(database, cache_path)))
+            time.sleep(0.05)
+            config_path = os.path.join(os.path.dirname(query_paths[0]), "Config.qll")
+            with open(config_path) as f:
+                uris = re.findall(r'"(src/[^"]+\.py)"', f.read())
+            results = [
+                {
+                    "ruleId": get_query_id(query_path),
+                    "message": {"text": f"flow in {uri}"},
+                    "locations": [
+                        {
+                            "physicalLocation": {
+                                "artifactLocation": {"uri": uri, "index": index},
+                                "region": {"startLine": 1},
+                            }
+                        }
+                    ],
+                }
+                for query_path in query_paths
+                for index, uri in reversed(list(enumerate(uris)))
+            ]
+            artifacts = [{"location": {"uri": uri}} for uri in uris]
+            with open(command[command.index("--output") + 1], "w") as f:
+                json.dump({"runs": [{"results": results, "artifacts": artifacts}]}, f)
+            with lock:
+                running.remove(database)
+            return SimpleNamespace(returncode=0)
+
+        def run_queries(shard_size):
+            with mock.patch(f"{module}.CODEQL_SHARD_SIZE", shard_size), mock.patch(
+                f"{module}.CODEQL_PARALLEL_SHARDS", 3
+            ), mock.patch(f"{module}.CODEQL_BACKEND", "cli"), mock.patch(
+                f"{module}.CACHE_CODEQL_RESULTS", False
+            ), mock.patch(
+                f"{module}.subprocess.run", side_effect=analyze
+            ):
+                self.analyzer.run_codeql_queries("python")
+            outputs = {}
+            for query_file in codeql_queries:
+                with open(
+                    self.analyzer.get_query_output_path("python", query_file)
+                ) as f:
+                    outputs[query_file] = json.load(f)
+            return outputs
+
+        unsharded = run_queries(0)
+        self.assertEqual(used, {database_path})
+        sharded = run_queries(2)
+        # Shards running at the same time never share a database, nor its disk cache
+        self.assertGreater(max_running, 1)
+        self.assertEqual(shared, [])
+        self.assertEqual(len(used), 3)
+        # Copies of the database are removed once the shards are done
+        self.assertEqual(
+            [path for path in used if os.path.exists(path)], [database_path]
+        )
+        # Both analyses give the same results in the same order, so the same graph
+        self.assertEqual(sharded, unsharded)
+        (run,) = unsharded["dataflows"]["runs"]
+        self.assertEqual(
+            [result["message"]["text"] for result in run["results"]],
+            sorted(
+                f"flow in {uri}"
+                for uri in self.analyzer.get_source_manifest("python")["files"]
+            ),
+        )
+
+    def test_evaluator_log_summary(self):
+        summary_path = os.path.join(self.tmp_dir.name, "summary.json")
+        events = [
+            {"summaryLogEventType": "LOG_HEADER", "codeqlVersion": "2.17.0"},
+            {
+                "predicateName": "TaintAnalysis::Tracker::isSource#ff",
+                "position": "/queries/modules/growlithe_dfa/TaintAnalysis.qll:10,3-12,4",
+                "queryCausingWork": "/queries/queries/dataflows.ql",
+                "millis": 1500,
+                "resultSize": 12,
+            },
+            {
+                "predicateName": "Sources::s3Source#f",
+                "queryCausingWork": "/queries/queries/dataflows.ql",
+                "millis": 250,
+                "resultSize": 3,
+            },
+            {
+                # Same module as above, whether found from its file or qualifier
+                "predicateName": "Sources::dynamoSource#f",
+                "position": "/queries/modules/growlithe_dfa/Sources.qll:5,1-6,2",
+                "queryCausingWork": "/queries/queries/dataflows.ql",
+                "millis": 100,
+                "resultSize": 2,
+            },
+            {
+                "predicateName": "TaintAnalysis::Tracker::isSink#ff",
+                "position": "/queries/modules/growlithe_dfa/TaintAnalysis.qll:20,3-22,4",
+                "queryCausingWork": "/queries/queries/metadataflows.ql",
+                "millis": 40,
+                "resultSize": 1,
+            },
+        ]
+        with open(summary_path, "w") as f:
+            # Minified and pretty printed objects may both appear
+            f.write(json.dumps(events[0]) + "\n" + json.dumps(events[1], indent=2))
+            f.write("\n\n" + "\n".join(json.dumps(event) for event in events[2:]))
+
+        queries = aggregate_evaluator_summary(summary_path)
+        self.assertEqual(sorted(queries), ["dataflows.ql", "metadataflows.ql"])
+        self.assertEqual(
+            dict(queries["dataflows.ql"]["modules"]),
+            {"TaintAnalysis": 1500, "Sources": 350},
+        )
+        self.assertEqual(
+            queries["dataflows.ql"]["predicates"][0],
+            (1500, "TaintAnalysis::Tracker::isSource#ff", 12),
+        )
+
+        lines = log_evaluator_summary(summary_path, top_predicates=1)
+        self.assertIn("CodeQL query dataflows.ql evaluated in 1.850 seconds", lines)
+        self.assertNotIn("Sources::s3Source#f", "\n".join(lines))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
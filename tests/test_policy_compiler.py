@@ -0,0 +1,211 @@
+import os
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from growlithe.common.logger import logger
+from growlithe.config import get_config
+from growlithe.enforcement.policy import policy_enforcer
+from growlithe.enforcement.policy.policy_enforcer import (
+    Policy,
+    PolicyPredicate,
+    PredicateSet,
+    compile_predicate_sets,
+    load_offline_rules,
+    split_arguments,
+)
+from growlithe.graph.adg.types import ReferenceType
+
+
+def predicate_set(*predicates):
+    return PredicateSet({PolicyPredicate(pred) for pred in predicates})
+
+
+class TestPolicyCompiler(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        self.namespace = {
+            "getInstProp": self.get_inst_prop,
+            "getSessionProp": lambda event, prop: event["country"],
+            "growlithe_taint_set_includes": lambda node_id, label: label
+            in self.taints.get(node_id, set()),
+            "event": {"country": "CA"},
+            "tempFile": "/tmp/image",
+        }
+        self.taints = {}
+
+    def get_inst_prop(self, prop):
+        self.calls.append(prop)
+        return {"InstRegion": "us-west-2", "InstTime": 1700000000}[prop]
+
+    def check(self, predicates):
+        return eval(predicates.compile(), self.namespace)
+
+    def test_split_arguments(self):
+        self.assertEqual(
+            split_arguments(
+                "ResourceRegion, '{getResourceProp('ResourceRegion', 'S3_BUCKET', 'a,b')}'"
+            ),
+            [
+                "ResourceRegion",
+                "'{getResourceProp('ResourceRegion', 'S3_BUCKET', 'a,b')}'",
+            ],
+        )
+        self.assertEqual(split_arguments("X, 'a, b', 3"), ["X", "'a, b'", "3"])
+
+    def test_runtime_values(self):
+        region = predicate_set(
+            "eq(InstRegion, 'us-west-2')",
+            "eq(InstRegion, '{getInstProp('InstRegion')}')",
+            "isPrefix(InstRegion, 'us-')",
+        )
+        self.assertEqual(
+            region.compile(),
+            "(lambda InstRegion: InstRegion == 'us-west-2' and "
+            "str(InstRegion).startswith('us-'))(getInstProp('InstRegion'))",
+        )
+        self.assertTrue(self.check(region))
+        # The value is resolved once for all predicates on it
+        self.assertEqual(self.calls, ["InstRegion"])
+
+        # Values keep their type, so numbers compare as numbers
+        self.assertTrue(
+            self.check(
+                predicate_set(
+                    "lt(InstTime, 99999999999)",
+                    "eq(InstTime, '{getInstProp('InstTime')}')",
+                )
+            )
+        )
+        self.assertFalse(
+            self.check(
+                predicate_set(
+                    "isSuffix(SessionEndRegion, 'US')",
+                    "eq(SessionEndRegion, '{getSessionProp(event, 'SessionEndRegion')}')",
+                )
+            )
+        )
+
+    def test_taint_predicates(self):
+        taint = predicate_set(
+            "taintSetIncludes(PredNode, 'bucket:*')",
+            "eq(PredNode, 'tempfs:{tempFile}')",
+        )
+        self.assertEqual(
+            taint.compile(),
+            "(lambda PredNode: growlithe_taint_set_includes(PredNode, 'bucket:*'))"
+            "(('tempfs:' + str(tempFile)))",
+        )
+        self.assertFalse(self.check(taint))
+        self.taints["tempfs:/tmp/image"] = {"bucket:*"}
+        self.assertTrue(self.check(taint))
+
+    def test_interpolated_arguments(self):
+        # Interpolated expressions quote like the string, so no nested f-string
+        time_key = predicate_set(
+            "eq(Key, '{getInstProp('InstTime')}-{tempFile}.png')",
+            "isSuffix(Key, '.png')",
+        )
+        self.assertEqual(
+            time_key.compile(),
+            "(lambda Key: str(Key).endswith('.png'))"
+            "((str(getInstProp('InstTime')) + '-' + str(tempFile) + '.png'))",
+        )
+        self.assertTrue(self.check(time_key))
+
+    def test_substring(self):
+        datalog = load_offline_rules()
+        for value, substring in [("abc", "b"), ("abc", "a"), ("abc", "d")]:
+            self.namespace["value"] = value
+            compiled = self.check(
+                predicate_set("eq(Text, '{value}')", f"hasSubstr(Text, '{substring}')")
+            )
+            asked = datalog.ask(f"hasSubstr('{value}', '{substring}')") != None
+            self.assertEqual(compiled, substring in value)
+            self.assertEqual(asked, compiled)
+
+    def test_offline_values(self):
+        self.assertEqual(
+            predicate_set(
+                "eq(ResourceRegion, 'us-west-1')", "eq(ResourceRegion, 'us-west-1')"
+            ).compile(),
+            "True",
+        )
+        self.assertEqual(
+            predicate_set(
+                "eq(ResourceRegion, 'us-west-1')", "eq(ResourceRegion, 'us-east-1')"
+            ).compile(),
+            "False",
+        )
+        runtime = predicate_set(
+            "eq(InstRegion, '{getInstProp('InstRegion')}')",
+            "eq(InstRegion, 'us-west-2')",
+        )
+        true = predicate_set("eq(ResourceRegion, 'a')", "eq(ResourceRegion, 'a')")
+        false = predicate_set("eq(ResourceRegion, 'a')", "eq(ResourceRegion, 'b')")
+        # Sets known to hold are left out, and a set known to fail fails them all
+        self.assertEqual(
+            compile_predicate_sets([true, runtime]),
+            compile_predicate_sets([runtime]),
+        )
+        self.assertEqual(compile_predicate_sets([true, true]), "True")
+        self.assertEqual(compile_predicate_sets([runtime, false]), "False")
+
+    def test_unification_fallback(self):
+        arithmetic = predicate_set("add(X, Y, Z)", "eq(Y, 1)", "eq(Z, 2)")
+        self.assertIsNone(arithmetic.compile())
+        region = predicate_set(
+            "eq(InstRegion, '{getInstProp('InstRegion')}')", "eq(InstRegion, 'a')"
+        )
+        check = compile_predicate_sets([region, arithmetic])
+        self.assertTrue(check.startswith("(lambda InstRegion: InstRegion == 'a')"))
+        self.assertTrue(
+            check.endswith(f' and pyDatalog.ask(f"{arithmetic.query}") != None')
+        )
+
+
+class TestOfflinePolicies(unittest.TestCase):
+    @classmethod
+    def setUpClass(self):
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        get_config(os.path.join(current_dir, "sample_app", "growlithe_config.yaml"))
+        # A statically known bucket, whose name is resolved offline
+        self.node = SimpleNamespace(
+            object_type="S3_BUCKET",
+            resource=SimpleNamespace(
+                reference_type=ReferenceType.STATIC, reference_name="bench-bucket"
+            ),
+        )
+
+    def test_satisfied_offline(self):
+        policy = Policy("write", "eq(ResourceName, 'bench-bucket')", self.node)
+        self.assertEqual(policy.generate_python_assertion(), "")
+
+    def test_violated_offline(self):
+        with self.assertLogs(logger, "ERROR") as logs:
+            assertion = Policy(
+                "write", "eq(ResourceName, 'other') & lt(InstTime, 5)", self.node
+            ).generate_python_assertion()
+        self.assertIn("OFFLINE POLICY ERROR", logs.output[0])
+        self.assertIn("eq(ResourceName, 'other')", logs.output[0])
+        self.assertNotIn("ResourceName", assertion)
+
+    @mock.patch.object(policy_enforcer, "HYBRID_ENFORCEMENT_MODE", False)
+    def test_folded_offline(self):
+        # Clauses known to fail are reported, not asserted
+        with self.assertLogs(logger, "ERROR") as logs:
+            assertion = Policy(
+                "read", "eq(X, 'a') & eq(X, 'b') or lt(InstTime, 5)", self.node
+            ).generate_python_assertion()
+        self.assertIn("OFFLINE POLICY ERROR", logs.output[0])
+        self.assertEqual(
+            assertion,
+            "assert (lambda InstTime: InstTime < 5)(getInstProp('InstTime')), "
+            "'Policy evaluated to be false'",
+        )
+        # A clause known to hold satisfies the policy
+        policy = Policy("read", "eq(X, 'a') & eq(X, 'a') or lt(InstTime, 5)", self.node)
+        self.assertEqual(policy.generate_python_assertion(), "")
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
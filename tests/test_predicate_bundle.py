@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from growlithe.common.file_utils import save_predicate_bundles
+from growlithe.enforcement.policy.predicate_bundle import bundle_library
+
+LIB_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "growlithe",
+    "enforcement",
+    "policy",
+    "platform_predicates",
+    "growlithe_utils_aws.py",
+)
+
+
+class TestPredicateBundle(unittest.TestCase):
+    def test_compiled_checks(self):
+        bundle = bundle_library(
+            LIB_PATH, {"getInstProp", "growlithe_taint_set_includes", "node_id"}
+        )
+        self.assertIn("def getInstProp(", bundle)
+        self.assertIn("GROWLITHE_TAINTS = ", bundle)
+        self.assertNotIn("def load_pydatalog(", bundle)
+        self.assertNotIn("def getResourceProp(", bundle)
+
+        namespace = {}
+        exec(bundle, namespace)
+        namespace["GROWLITHE_TAINTS"]["node"] = {"label"}
+        self.assertTrue(namespace["growlithe_taint_set_includes"]("node", "label"))
+
+    def test_session_checks(self):
+        bundle = bundle_library(LIB_PATH, {"getSessionProp"})
+        self.assertIn("class CidrTableResolver", bundle)
+        self.assertIn("def ipToCountryHelper(", bundle)
+        self.assertNotIn("def load_pydatalog(", bundle)
+        exec(bundle, {"__file__": LIB_PATH})
+
+    def test_pydatalog_checks(self):
+        bundle = bundle_library(LIB_PATH, {"pyDatalog"})
+        self.assertIn("class LazyPyDatalog", bundle)
+        self.assertIn("def load_pydatalog(", bundle)
+        # Helpers used by the pyDatalog predicates are kept with them
+        self.assertIn("def ipToCountryHelper(", bundle)
+        self.assertNotIn("def growlithe_save_s3_taint(", bundle)
+
+    def test_geoip_table(self):
+        geoip_database_path = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "fixtures", "geoip.csv"
+        )
+        with tempfile.TemporaryDirectory() as output_dir:
+            functions = [
+                SimpleNamespace(
+                    runtime="python3.10",
+                    growlithe_function_path=os.path.join(output_dir, name, "app.py"),
+                    get_referenced_names=lambda names=names: names,
+                )
+                for name, names in [
+                    ("session", {"getSessionProp"}),
+                    ("instance", {"getInstProp"}),
+                    ("datalog", {"pyDatalog"}),
+                ]
+            ]
+            save_predicate_bundles(functions, LIB_PATH, geoip_database_path)
+
+            # The table is compiled once, for the libraries resolving IP addresses
+            table_paths = [
+                os.path.join(output_dir, name, "growlithe_geoip.bin")
+                for name in ["session", "datalog"]
+            ]
+            with open(table_paths[0], "rb") as f:
+                table = f.read()
+            with open(table_paths[1], "rb") as f:
+                self.assertEqual(f.read(), table)
+            self.assertTrue(table.startswith(b"GRWLGEO1"))
+            self.assertEqual(
+                sorted(os.listdir(os.path.join(output_dir, "instance"))),
+                ["growlithe_predicates.py"],
+            )
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,161 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from growlithe.enforcement.policy.geoip_table import compile_cidr_table
+from growlithe.enforcement.policy.platform_predicates import (
+    growlithe_utils_aws,
+    growlithe_utils_gcp,
+)
+
+GEOIP_FIXTURE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "fixtures", "geoip.csv"
+)
+
+LIB_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "growlithe",
+    "enforcement",
+    "policy",
+    "platform_predicates",
+)
+
+CHECK_CODE = """
+import sys
+from growlithe_utils_aws import *
+
+assert "pyDatalog" not in sys.modules and "boto3" not in sys.modules
+assert (lambda InstRegion: InstRegion == "us-west-2")(getInstProp("InstRegion"))
+assert "pyDatalog" not in sys.modules
+
+# Checks that were not compiled load pyDatalog and its rules on first use
+assert pyDatalog.ask("eq(X, 'us-west-2') & isPrefix(X, 'us')") != None
+assert pyDatalog.ask("eq(X, 4) & lt(X, 3)") == None
+assert "pyDatalog" in sys.modules and "boto3" not in sys.modules
+"""
+
+
+class FakeS3Client:
+    def __init__(self):
+        self.calls = []
+
+    def get_bucket_location(self, Bucket):
+        self.calls.append(Bucket)
+        return {"LocationConstraint": "us-west-1"}
+
+
+class TestRuntimeLibrary(unittest.TestCase):
+    def setUp(self):
+        self.s3 = FakeS3Client()
+        patcher = mock.patch.dict(growlithe_utils_aws._clients, {"s3": self.s3})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        growlithe_utils_aws._resource_props.clear()
+        self.addCleanup(growlithe_utils_aws._resource_props.clear)
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.tmp_dir = tmp_dir.name
+        self.geoip_table_path = os.path.join(self.tmp_dir, "growlithe_geoip.bin")
+        compile_cidr_table(GEOIP_FIXTURE_PATH, self.geoip_table_path)
+
+    def get_region(self, bucket):
+        return growlithe_utils_aws.getResourceProp(
+            "ResourceRegion", "S3_BUCKET", bucket
+        )
+
+    def test_resource_prop_cache(self):
+        # Looked up once across the warm invocations of a container
+        self.assertEqual(self.get_region("a"), "us-west-1")
+        self.assertEqual(self.get_region("a"), "us-west-1")
+        self.assertEqual(self.s3.calls, ["a"])
+
+        # Expired values are looked up again
+        with mock.patch.object(growlithe_utils_aws, "RESOURCE_PROP_TTL", -1):
+            self.get_region("b")
+        self.get_region("b")
+        self.assertEqual(self.s3.calls, ["a", "b", "b"])
+
+        # The least recently used resource is evicted first
+        with mock.patch.object(growlithe_utils_aws, "RESOURCE_PROP_CACHE_SIZE", 2):
+            self.get_region("a")
+            self.get_region("c")
+            self.get_region("a")
+            self.get_region("b")
+        self.assertEqual(self.s3.calls, ["a", "b", "b", "c", "b"])
+
+    def test_prewarm_resource_props(self):
+        growlithe_utils_aws.growlithe_prewarm_resource_props(
+            [("ResourceRegion", "S3_BUCKET", "a"), ("ResourceRegion", "UNKNOWN", "b")]
+        )
+        self.get_region("a")
+        self.assertEqual(self.s3.calls, ["a"])
+
+    def test_lazy_imports(self):
+        # A fresh interpreter, as the library is imported at a function's cold start
+        process = subprocess.run(
+            [sys.executable, "-c", CHECK_CODE],
+            env={
+                **os.environ,
+                "PYTHONPATH": LIB_DIR,
+                "AWS_REGION": "us-west-2",
+                "AWS_LAMBDA_FUNCTION_NAME": "Function",
+            },
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(process.returncode, 0, process.stderr)
+
+    def test_cidr_table_resolver(self):
+        # Fixed-width records after the header: 4 IPv4 and 1 IPv6 ranges
+        self.assertEqual(os.path.getsize(self.geoip_table_path), 16 + 4 * 10 + 34)
+        for library in [growlithe_utils_aws, growlithe_utils_gcp]:
+            resolve = library.CidrTableResolver(self.geoip_table_path)
+            self.assertEqual(resolve("198.51.100.0"), "US")
+            self.assertEqual(resolve("192.0.2.127"), "CA")
+            self.assertEqual(resolve("192.0.2.128"), "FR")
+            self.assertEqual(resolve("203.0.113.255"), "CA")
+            self.assertEqual(resolve("2001:db8::1"), "DE")
+            # Addresses between, before and after the ranges are not resolved
+            self.assertIsNone(resolve("198.51.101.0"))
+            self.assertIsNone(resolve("10.0.0.1"))
+            self.assertIsNone(resolve("255.255.255.255"))
+            self.assertIsNone(resolve("::1"))
+            # CSV tables must be compiled first
+            with self.assertRaises(ValueError):
+                library.CidrTableResolver(GEOIP_FIXTURE_PATH)
+
+    def test_invalid_cidr_table(self):
+        csv_path = os.path.join(self.tmp_dir, "geoip.csv")
+        for rows in [
+            "192.0.2.0/24,CA\n192.0.2.128/25,FR\n",
+            "192.0.2.0/24,Canada\n",
+        ]:
+            with open(csv_path, "w") as f:
+                f.write(rows)
+            with self.assertRaises(ValueError):
+                compile_cidr_table(csv_path, self.geoip_table_path)
+
+    def test_session_end_region(self):
+        calls = []
+        resolve = growlithe_utils_aws.CidrTableResolver(self.geoip_table_path)
+        growlithe_utils_aws.set_ip_resolver(lambda ip: calls.append(ip) or resolve(ip))
+        self.addCleanup(growlithe_utils_aws.set_ip_resolver, None)
+        event = {"requestContext": {"identity": {"sourceIp": "203.0.113.7"}}}
+        for _ in range(2):
+            self.assertEqual(
+                growlithe_utils_aws.getSessionProp(event, "SessionEndRegion"), "CA"
+            )
+        # Resolved addresses are cached
+        self.assertEqual(calls, ["203.0.113.7"])
+        # As well as in checks asking pyDatalog
+        self.assertEqual(
+            growlithe_utils_aws.pyDatalog.ask("ipToCountry('192.0.2.200', X)"),
+            {("FR",)},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,79 @@
+import json
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from growlithe.graph.adg.edge import EdgeType
+from growlithe.graph.parsers.sarif import SarifParser
+from growlithe.graph.parsers.sarif_reader import SarifResultReader
+
+
+def make_result(uri, index):
+    return {
+        "ruleId": "py/dataFlows",
+        "message": {"text": f"flow {index}"},
+        "locations": [{"physicalLocation": {"artifactLocation": {"uri": uri}}}],
+        "relatedLocations": [{"id": 1, "region": {"startLine": index, "x": 1.25}}],
+    }
+
+
+class TestSarif(unittest.TestCase):
+    @classmethod
+    def setUpClass(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.sarif_path = os.path.join(self.tmp_dir.name, "dataflows_python.sarif")
+        self.results = [
+            make_result(f"src/function{i % 2}.py", i) for i in range(1, 101)
+        ]
+        sarif = {
+            "$schema": "https://json.schemastore.org/sarif-2.1.0.json",
+            "version": "2.1.0",
+            "runs": [
+                {"tool": {"driver": {"name": "CodeQL"}}, "results": self.results[:60]},
+                {"results": self.results[60:], "properties": {"semmle.version": 1}},
+            ],
+        }
+        with open(self.sarif_path, "w") as f:
+            json.dump(sarif, f, indent=2)
+
+    @classmethod
+    def tearDownClass(self):
+        self.tmp_dir.cleanup()
+
+    def test_streaming_reader(self):
+        # Small chunks force values to be split across buffer boundaries
+        for chunk_size in [1, 7, 1 << 20]:
+            results = list(SarifResultReader(self.sarif_path, chunk_size=chunk_size))
+            self.assertEqual(results, self.results)
+
+    def test_metadata(self):
+        reader = SarifResultReader(self.sarif_path, keep_metadata=True)
+        run_indices = [reader.run_index for _ in reader]
+        self.assertEqual(run_indices, [0] * 60 + [1] * 40)
+        self.assertEqual(reader.metadata["version"], "2.1.0")
+        self.assertEqual(
+            reader.runs,
+            [
+                {"tool": {"driver": {"name": "CodeQL"}}},
+                {"properties": {"semmle.version": 1}},
+            ],
+        )
+
+    def test_parse_sarif_results(self):
+        config = SimpleNamespace(app_path=self.tmp_dir.name)
+        parser = SarifParser(self.sarif_path, config)
+        function = SimpleNamespace(
+            function_path=os.path.join(self.tmp_dir.name, "src", "function1.py")
+        )
+        with mock.patch.object(SarifParser, "parse_sarif_result") as parse_result:
+            parser.parse_sarif_results(None, [function], EdgeType.DATA)
+        # Results of the function's artifact are parsed in file order
+        self.assertEqual(
+            [call.args for call in parse_result.call_args_list],
+            [(result, None, function, EdgeType.DATA) for result in self.results[0::2]],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,55 @@
+import json
+import os
+import tempfile
+import unittest
+from growlithe.common.tracer import Tracer
+
+
+class TestTracer(unittest.TestCase):
+    def test_nested_spans(self):
+        tracer = Tracer(trace_memory=True)
+        with tracer.span("analyze"):
+            with tracer.span("generate_adg", functions=2):
+                data = [bytearray(1 << 20) for _ in range(4)]
+                del data
+            with tracer.span("dump_graph"):
+                pass
+
+        self.assertEqual(
+            [event["name"] for event in tracer.events],
+            ["generate_adg", "dump_graph", "analyze"],
+        )
+        child, sibling, parent = tracer.events
+        self.assertEqual(child["args"]["functions"], 2)
+        # Children are enclosed by their parent
+        for event in [child, sibling]:
+            self.assertGreaterEqual(event["ts"], parent["ts"])
+            self.assertLessEqual(
+                event["ts"] + event["dur"], parent["ts"] + parent["dur"]
+            )
+        self.assertGreaterEqual(child["args"]["peak_memory_bytes"], 4 << 20)
+        self.assertLess(sibling["args"]["peak_memory_bytes"], 4 << 20)
+        self.assertGreaterEqual(
+            parent["args"]["peak_memory_bytes"], child["args"]["peak_memory_bytes"]
+        )
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            trace_path = os.path.join(tmp_dir, "trace.json")
+            tracer.export_chrome_trace(trace_path)
+            with open(trace_path) as f:
+                trace = json.load(f)
+        self.assertEqual(
+            [event["name"] for event in trace["traceEvents"]],
+            ["analyze", "generate_adg", "dump_graph"],
+        )
+        self.assertTrue(all(event["ph"] == "X" for event in trace["traceEvents"]))
+
+    def test_disabled(self):
+        tracer = Tracer(enabled=False)
+        with tracer.span("analyze") as span:
+            self.assertIsNone(span)
+        self.assertEqual(tracer.events, [])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)